@@ -1,15 +1,54 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr, computed_field
 import json
+import math
+import numpy as np
+import os
+import threading
+import time
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+from datetime import datetime, timedelta
+from market import get_share_price, get_share_prices
+from database import (
+    write_account,
+    read_account,
+    reset_account,
+    write_trade,
+    read_transactions,
+    read_recent_transactions,
+    count_transactions,
+    write_portfolio_snapshot,
+    read_last_portfolio_snapshot_time,
+    read_portfolio_snapshots,
+    read_account_version,
+    migrate_legacy_account,
+    StaleAccountError,
+)
+from log_writer import log_writer
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
 
+# Record at most one portfolio valuation per account in this many minutes
+SNAPSHOT_EVERY_N_MINUTES = int(os.getenv("SNAPSHOT_EVERY_N_MINUTES", "15"))
+# A cached report is reused until the account changes, or this long has passed and prices may have moved
+REPORT_CACHE_SECONDS = int(os.getenv("REPORT_CACHE_SECONDS", "60"))
+# How many of the latest transactions the compact account summary includes
+SUMMARY_TRANSACTIONS = int(os.getenv("SUMMARY_TRANSACTIONS", "10"))
+
+# A change based on a stale read of an account is reapplied to a fresh read at most this many times
+WRITE_ATTEMPTS = 20
+
+_report_cache: dict[str, tuple[int, float, str]] = {}
+_account_locks: dict[str, threading.Lock] = {}
+_account_locks_guard = threading.Lock()
+
+
+def _account_lock(name: str) -> threading.Lock:
+    with _account_locks_guard:
+        return _account_locks.setdefault(name.lower(), threading.Lock())
+
 
 class Transaction(BaseModel):
     symbol: str
@@ -30,113 +69,270 @@ class Account(BaseModel):
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    net_invested: float = 0.0
+    realized_pnl: float = 0.0
+    cost_basis: dict[str, float] = {}
+    _transactions: list[Transaction] | None = PrivateAttr(default=None)
+    _portfolio_value_time_series: list[tuple[str, float]] | None = PrivateAttr(default=None)
+    _version: int | None = PrivateAttr(default=None)
 
     @classmethod
     def get(cls, name: str):
+        """ Load the balance, strategy and holdings; the history is only read from the database when used """
         fields = read_account(name.lower())
+        # An account still in the legacy JSON table is migrated on first use rather than by every import
+        if not fields and migrate_legacy_account(name):
+            fields = read_account(name.lower())
         if not fields:
             fields = {
                 "name": name.lower(),
                 "balance": INITIAL_BALANCE,
                 "strategy": "",
                 "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
+                "net_invested": 0.0,
             }
-            write_account(name, fields)
-        return cls(**fields)
-    
-    
+            fields["version"] = write_account(name, fields)
+        version = fields.pop("version")
+        if fields.get("net_invested") is None:
+            fields.pop("net_invested", None)
+            account = cls(**fields)
+            account._version = version
+            account.rebuild_aggregates()
+            return account
+        account = cls(**fields)
+        account._version = version
+        return account
+
+    def refresh(self):
+        """ Reload the account from the database, discarding any unsaved changes """
+        fields = read_account(self.name)
+        self._version = fields.pop("version")
+        for field, value in fields.items():
+            setattr(self, field, value)
+        self._transactions = None
+        self._portfolio_value_time_series = None
+
+    @computed_field
+    @property
+    def transactions(self) -> list[Transaction]:
+        if self._transactions is None:
+            self._transactions = [Transaction(**row) for row in read_transactions(self.name)]
+        return self._transactions
+
+    @computed_field
+    @property
+    def portfolio_value_time_series(self) -> list[tuple[str, float]]:
+        if self._portfolio_value_time_series is None:
+            self._portfolio_value_time_series = read_portfolio_snapshots(self.name)
+        return self._portfolio_value_time_series
+
+    def get_portfolio_value_series(
+        self, start: str | None = None, end: str | None = None, resolution_seconds: int = 1
+    ) -> list[tuple[str, float]]:
+        """ Read just the part of the portfolio value series in a time range, downsampled to a resolution """
+        return read_portfolio_snapshots(self.name, start, end, resolution_seconds)
+
+    def state(self) -> dict:
+        """ The persisted state of the account, without its transaction and portfolio value history """
+        return self.model_dump(exclude={"name", "transactions", "portfolio_value_time_series"})
+
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Write the account, raising StaleAccountError if it has changed since it was read """
+        self._version = write_account(self.name.lower(), self.state(), self._version)
+        _report_cache.pop(self.name.lower(), None)
+
+    def _update(self, change, write=None):
+        """ Apply change to the account and write the result as one atomic step. Writers in this process
+        take turns on a per-account lock; if a writer in another process got there first, the account is
+        reloaded and change is applied again, so no update is lost. Returns the result of change. """
+        with _account_lock(self.name):
+            for attempt in range(WRITE_ATTEMPTS):
+                result = change()
+                try:
+                    if write:
+                        write(result)
+                    else:
+                        self.save()
+                    return result
+                except StaleAccountError:
+                    if attempt == WRITE_ATTEMPTS - 1:
+                        raise
+                    self.refresh()
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
-        self.save()
+        self.net_invested = 0.0
+        self.realized_pnl = 0.0
+        self.cost_basis = {}
+        self._transactions = []
+        self._portfolio_value_time_series = []
+        self._version = reset_account(self.name, self.state())
+        _report_cache.pop(self.name.lower(), None)
+
+    def apply_to_aggregates(self, transaction: Transaction):
+        """ Fold one trade into the running net invested, realized P&L and average cost basis.
+        Must be called before the trade is applied to holdings. """
+        symbol = transaction.symbol
+        held = self.holdings.get(symbol, 0)
+        basis = self.cost_basis.get(symbol, 0.0)
+        self.net_invested += transaction.total()
+        if transaction.quantity > 0:
+            self.cost_basis[symbol] = (basis * held + transaction.total()) / (held + transaction.quantity)
+        else:
+            self.realized_pnl += -transaction.quantity * (transaction.price - basis)
+            if held + transaction.quantity == 0:
+                self.cost_basis.pop(symbol, None)
+
+    def ledger_aggregates(self) -> dict:
+        """ Recompute the running aggregates by replaying the whole transaction ledger """
+        replay = Account(name=self.name, balance=0.0, strategy="", holdings={})
+        for transaction in self.transactions:
+            replay.apply_to_aggregates(transaction)
+            replay.holdings[transaction.symbol] = replay.holdings.get(transaction.symbol, 0) + transaction.quantity
+        return replay.model_dump(include={"net_invested", "realized_pnl", "cost_basis"})
+
+    def verify_aggregates(self) -> bool:
+        """ Check that the running aggregates agree with a full replay of the ledger """
+        rebuilt = self.ledger_aggregates()
+        return (
+            math.isclose(rebuilt["net_invested"], self.net_invested, abs_tol=1e-6)
+            and math.isclose(rebuilt["realized_pnl"], self.realized_pnl, abs_tol=1e-6)
+            and rebuilt["cost_basis"].keys() == self.cost_basis.keys()
+            and all(math.isclose(rebuilt["cost_basis"][s], self.cost_basis[s], abs_tol=1e-6) for s in self.cost_basis)
+        )
+
+    def rebuild_aggregates(self):
+        """ Replace the running aggregates with a full replay of the ledger and save them """
+        def rebuild():
+            for field, value in self.ledger_aggregates().items():
+                setattr(self, field, value)
+
+        self._update(rebuild)
+
+    def record_transaction(self, transaction: Transaction):
+        """ Append a trade to the ledger, writing just the new row, the changed holding and the aggregates """
+        self._version = write_trade(self.name, transaction.model_dump(), self.state(), self._version)
+        _report_cache.pop(self.name.lower(), None)
+        if self._transactions is not None:
+            self._transactions.append(transaction)
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+
+        def deposit():
+            self.balance += amount
+
+        self._update(deposit)
         print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def withdraw(self, amount: float):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
-        if amount > self.balance:
-            raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
+        def withdraw():
+            if amount > self.balance:
+                raise ValueError("Insufficient funds for withdrawal.")
+            self.balance -= amount
+
+        self._update(withdraw)
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
 
-    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Buy shares of a stock if sufficient funds are available. """
-        price = get_share_price(symbol)
+    def execute_buy(
+        self, symbol: str, quantity: int, rationale: str, price: float, timestamp: str | None = None
+    ) -> Transaction:
+        """ Apply a buy at the given market price, plus the spread, to this account in memory only """
         buy_price = price * (1 + SPREAD)
         total_cost = buy_price * quantity
-        
+
         if total_cost > self.balance:
             raise ValueError("Insufficient funds to buy shares.")
         elif price==0:
             raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         # Record transaction
         transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
+        self.apply_to_aggregates(transaction)
+
+        # Update holdings
+        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
+
         # Update balance
         self.balance -= total_cost
-        self.save()
-        write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return transaction
 
-    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Sell shares of a stock if the user has enough shares. """
+    def execute_sell(
+        self, symbol: str, quantity: int, rationale: str, price: float, timestamp: str | None = None
+    ) -> Transaction:
+        """ Apply a sale at the given market price, less the spread, to this account in memory only """
         if self.holdings.get(symbol, 0) < quantity:
             raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
-        
-        price = get_share_price(symbol)
+
         sell_price = price * (1 - SPREAD)
         total_proceeds = sell_price * quantity
-        
+
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Record transaction
+        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
+        self.apply_to_aggregates(transaction)
+
         # Update holdings
         self.holdings[symbol] -= quantity
-        
+
         # If shares are completely sold, remove from holdings
         if self.holdings[symbol] == 0:
             del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
 
         # Update balance
         self.balance += total_proceeds
-        self.save()
-        write_log(self.name, "account", f"Sold {quantity} of {symbol}")
+        return transaction
+
+    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Buy shares of a stock if sufficient funds are available. """
+        price = get_share_price(symbol)
+        self._update(lambda: self.execute_buy(symbol, quantity, rationale, price), self.record_transaction)
+        log_writer.write(self.name, "account", f"Bought {quantity} of {symbol}")
+        self.record_portfolio_value()
+        return "Completed. Latest details:\n" + self.report()
+
+    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Sell shares of a stock if the user has enough shares. """
+        if self.holdings.get(symbol, 0) < quantity:
+            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+        
+        price = get_share_price(symbol)
+        self._update(lambda: self.execute_sell(symbol, quantity, rationale, price), self.record_transaction)
+        log_writer.write(self.name, "account", f"Sold {quantity} of {symbol}")
+        self.record_portfolio_value()
         return "Completed. Latest details:\n" + self.report()
 
-    def calculate_portfolio_value(self):
+    def get_prices(self) -> dict[str, float]:
+        """ Price every holding in one batched lookup. """
+        return get_share_prices(list(self.holdings))
+
+    def _position_arrays(self, prices: dict[str, float]) -> tuple[np.ndarray, np.ndarray]:
+        quantities = np.fromiter(self.holdings.values(), dtype=float, count=len(self.holdings))
+        price_array = np.fromiter((prices[symbol] for symbol in self.holdings), dtype=float, count=len(self.holdings))
+        return quantities, price_array
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
         """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+        prices = prices if prices is not None else self.get_prices()
+        quantities, price_array = self._position_arrays(prices)
+        return self.balance + float(quantities @ price_array)
 
     def calculate_profit_loss(self, portfolio_value: float):
-        """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        """ Calculate profit or loss from the initial spend, using the running net invested total. """
+        return portfolio_value - self.net_invested - self.balance
+
+    def calculate_unrealized_profit_loss(self, prices: dict[str, float] | None = None) -> dict[str, float]:
+        """ Calculate the unrealized profit or loss of each position against its average cost basis. """
+        prices = prices if prices is not None else self.get_prices()
+        quantities, price_array = self._position_arrays(prices)
+        cost_basis = np.fromiter((self.cost_basis.get(symbol, 0.0) for symbol in self.holdings), dtype=float)
+        return dict(zip(self.holdings, ((price_array - cost_basis) * quantities).tolist()))
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,36 +340,100 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
         """ List all transactions made by the user. """
         return [transaction.model_dump() for transaction in self.transactions]
     
     def report(self) -> str:
-        """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
+        """ Return a json string representing the account. This is a pure read with no side effects. """
+        prices = self.get_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
         pnl = self.calculate_profit_loss(portfolio_value)
-        data = self.model_dump()
+        data = self.model_dump(exclude={"portfolio_value_time_series"})
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
-        write_log(self.name, "account", f"Retrieved account details")
+        data["unrealized_profit_loss"] = self.calculate_unrealized_profit_loss(prices)
         return json.dumps(data)
+
+    def summary(self, recent: int = SUMMARY_TRANSACTIONS) -> str:
+        """ Return a compact json string for prompts: cash, each holding with its cost basis and unrealized P&L,
+        aggregate stats and only the latest transactions. Its size doesn't grow with the trade history. """
+        prices = self.get_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
+        unrealized = self.calculate_unrealized_profit_loss(prices)
+        data = {
+            "cash": round(self.balance, 2),
+            "holdings": {
+                symbol: {
+                    "quantity": quantity,
+                    "cost_basis": round(self.cost_basis.get(symbol, 0.0), 2),
+                    "price": round(prices[symbol], 2),
+                    "unrealized_pnl": round(unrealized[symbol], 2),
+                }
+                for symbol, quantity in self.holdings.items()
+            },
+            "total_portfolio_value": round(portfolio_value, 2),
+            "total_profit_loss": round(self.calculate_profit_loss(portfolio_value), 2),
+            "realized_pnl": round(self.realized_pnl, 2),
+            "transaction_count": count_transactions(self.name),
+            "recent_transactions": [
+                f"{t['timestamp']} {'bought' if t['quantity'] > 0 else 'sold'} {abs(t['quantity'])} {t['symbol']} at {t['price']:.2f}"
+                for t in read_recent_transactions(self.name, recent)
+            ],
+        }
+        return json.dumps(data, separators=(",", ":"))
+
+    def record_portfolio_value(self, force: bool = False) -> bool:
+        """ Append a point to the portfolio value time series, unless this account already has one
+        from the last SNAPSHOT_EVERY_N_MINUTES minutes. Returns whether a point was recorded. """
+        now = datetime.now()
+        last = read_last_portfolio_snapshot_time(self.name)
+        if not force and last and now - datetime.fromisoformat(last) < timedelta(minutes=SNAPSHOT_EVERY_N_MINUTES):
+            return False
+        portfolio_value = self.calculate_portfolio_value()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        write_portfolio_snapshot(self.name, timestamp, portfolio_value)
+        if self._portfolio_value_time_series is not None:
+            self._portfolio_value_time_series.append((timestamp, portfolio_value))
+        return True
     
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
-        write_log(self.name, "account", f"Retrieved strategy")
+        log_writer.write(self.name, "account", f"Retrieved strategy")
         return self.strategy
     
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
-        self.strategy = strategy
-        self.save()
-        write_log(self.name, "account", f"Changed strategy")
+        def change():
+            self.strategy = strategy
+
+        self._update(change)
+        log_writer.write(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
+def get_account_report(name: str) -> str:
+    """
+    Return the report for an account from an in-process cache. An entry is served until the account's
+    version changes, which any process writing to the account bumps, or REPORT_CACHE_SECONDS pass.
+    """
+    name = name.lower()
+    version = read_account_version(name)
+    cached = _report_cache.get(name)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < REPORT_CACHE_SECONDS:
+        return cached[2]
+    account = Account.get(name)
+    report = account.report()
+    _report_cache[name] = (version, time.monotonic(), report)
+    return report
+
+
+def record_portfolio_values(names: list[str], force: bool = False) -> int:
+    """ Record a rate-limited portfolio valuation for each account; returns how many points were written """
+    return sum(Account.get(name).record_portfolio_value(force=force) for name in names)
+
+
 # Example of usage:
 if __name__ == "__main__":
     account = Account("John Doe")
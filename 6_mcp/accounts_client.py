@@ -1,39 +1,220 @@
 import mcp
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+from datetime import timedelta
+import asyncio
+import itertools
 import json
+import os
+from contextlib import asynccontextmanager
+from util import mcp_url
+from mcp_params import server_env, is_read_only_tool, is_server_failure
 
-params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
+params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=server_env)
+
+# With MCP_TRANSPORT=streamable-http, connect to the accounts server already running over HTTP
+# instead of spawning our own child process
+ACCOUNTS_URL = mcp_url("accounts_server") if os.getenv("MCP_TRANSPORT", "stdio") == "streamable-http" else None
+
+ACCOUNTS_POOL_SIZE = int(os.getenv("ACCOUNTS_POOL_SIZE", "1"))
+REQUEST_TIMEOUT_SECONDS = 120
+HEALTH_CHECK_SECONDS = 30
+
+
+class PooledServer:
+    """
+    One warm MCP server connection with an initialized ClientSession: a child process over stdio, or an
+    HTTP connection when given a url. The transport and session are entered and exited by a single
+    background task, as anyio requires, and stay open until close().
+    """
+
+    def __init__(self, params: StdioServerParameters, url: str | None = None):
+        self.params = params
+        self.url = url
+        self.session = None
+        self.error = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self.session is None:
+            raise self.error or ConnectionError("MCP server exited during startup")
+
+    @asynccontextmanager
+    async def _streams(self):
+        if self.url:
+            async with streamablehttp_client(self.url) as (read, write, _):
+                yield read, write
+        else:
+            async with stdio_client(self.params) as streams:
+                yield streams
+
+    async def _run(self):
+        try:
+            async with self._streams() as streams:
+                async with mcp.ClientSession(
+                    *streams, read_timeout_seconds=timedelta(seconds=REQUEST_TIMEOUT_SECONDS)
+                ) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self._task.done()
+
+    async def close(self):
+        self._closing.set()
+        if self._task:
+            await self._task
+
+
+class MCPSessionPool:
+    """
+    A process-wide pool of warm MCP server processes. ClientSession multiplexes concurrent requests over
+    one connection, so callers share servers instead of spawning one per call. Servers are started lazily,
+    pinged periodically, and restarted when they die or stop answering. A read that fails that way is retried
+    once on a fresh server; a write, like a trade, is not, since it may have gone through before the failure.
+    """
+
+    def __init__(
+        self,
+        params: StdioServerParameters,
+        size: int = 1,
+        health_check_seconds: float = HEALTH_CHECK_SECONDS,
+        url: str | None = None,
+    ):
+        self.params = params
+        self.url = url
+        self.size = size
+        self.health_check_seconds = health_check_seconds
+        self.servers: list[PooledServer | None] = [None] * size
+        self.calls = 0
+        self.starts = 0
+        self.restarts = 0
+        self._next = itertools.cycle(range(size))
+        self._lock = None
+        self._loop = None
+        self._health_task = None
+
+    def _bind_to_loop(self):
+        # Servers and locks belong to the event loop that created them; start afresh under a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self.servers = [None] * self.size
+            self._health_task = None
+
+    async def _server(self, index: int) -> PooledServer:
+        server = self.servers[index]
+        if server is not None and server.alive:
+            return server
+        async with self._lock:
+            server = self.servers[index]
+            if server is None or not server.alive:
+                if server is not None:
+                    self.restarts += 1
+                    await server.close()
+                server = PooledServer(self.params, self.url)
+                await server.start()
+                self.starts += 1
+                self.servers[index] = server
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_check())
+        return server
+
+    async def _health_check(self):
+        while any(server is not None for server in self.servers):
+            await asyncio.sleep(self.health_check_seconds)
+            for index, server in enumerate(self.servers):
+                if server is None:
+                    continue
+                try:
+                    await server.session.send_ping()
+                except Exception:
+                    await self._restart(index, server)
+
+    async def _restart(self, index: int, server: PooledServer):
+        async with self._lock:
+            if self.servers[index] is server:
+                self.servers[index] = None
+                self.restarts += 1
+                await server.close()
+
+    async def run(self, operation, retry: bool = False):
+        """
+        Run operation(session) on a warm server. If the server died or stopped answering, it is restarted,
+        and with retry the operation is run once more on the fresh server; only pass retry for operations
+        that are safe to repeat
+        """
+        self._bind_to_loop()
+        self.calls += 1
+        index = next(self._next)
+        for attempt in range(2):
+            server = await self._server(index)
+            try:
+                return await operation(server.session)
+            except Exception as e:
+                if not is_server_failure(e):
+                    raise
+                await self._restart(index, server)
+                if attempt or not retry:
+                    raise
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for index, server in enumerate(self.servers):
+            if server is not None:
+                self.servers[index] = None
+                await server.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "alive": sum(1 for server in self.servers if server is not None and server.alive),
+        }
+
+
+accounts_pool = MCPSessionPool(params, size=ACCOUNTS_POOL_SIZE, url=ACCOUNTS_URL)
 
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    tools_result = await accounts_pool.run(lambda session: session.list_tools(), retry=True)
+    return tools_result.tools
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    return await accounts_pool.run(
+        lambda session: session.call_tool(tool_name, tool_args), retry=is_read_only_tool(tool_name)
+    )
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    result = await accounts_pool.run(
+        lambda session: session.read_resource(f"accounts://accounts_server/{name}"), retry=True
+    )
+    return result.contents[0].text
+
+async def read_summary_resource(name):
+    result = await accounts_pool.run(lambda session: session.read_resource(f"accounts://summary/{name}"), retry=True)
+    return result.contents[0].text
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    result = await accounts_pool.run(lambda session: session.read_resource(f"accounts://strategy/{name}"), retry=True)
+    return result.contents[0].text
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -44,7 +225,7 @@ async def get_accounts_tools_openai():
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
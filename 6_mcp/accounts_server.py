@@ -1,5 +1,8 @@
+import asyncio
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, get_account_report
+from database import read_recent_transactions
+from util import serve
 
 mcp = FastMCP("accounts_server")
 
@@ -10,7 +13,7 @@ async def get_balance(name: str) -> float:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return (await asyncio.to_thread(Account.get, name)).balance
 
 @mcp.tool()
 async def get_holdings(name: str) -> dict[str, int]:
@@ -19,7 +22,7 @@ async def get_holdings(name: str) -> dict[str, int]:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return (await asyncio.to_thread(Account.get, name)).holdings
 
 @mcp.tool()
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
@@ -31,7 +34,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return await asyncio.to_thread(lambda: Account.get(name).buy_shares(symbol, quantity, rationale))
 
 
 @mcp.tool()
@@ -44,7 +47,7 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return await asyncio.to_thread(lambda: Account.get(name).sell_shares(symbol, quantity, rationale))
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,17 +57,29 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return await asyncio.to_thread(lambda: Account.get(name).change_strategy(strategy))
+
+@mcp.tool()
+async def list_transactions(name: str, limit: int = 50) -> list[dict]:
+    """List the most recent transactions in the account's full history, oldest first.
+
+    Args:
+        name: The name of the account holder
+        limit: The number of most recent transactions to return
+    """
+    return await asyncio.to_thread(read_recent_transactions, name, limit)
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.report()
+    return await asyncio.to_thread(get_account_report, name)
+
+@mcp.resource("accounts://summary/{name}")
+async def read_summary_resource(name: str) -> str:
+    return await asyncio.to_thread(lambda: Account.get(name).summary())
 
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.get_strategy()
+    return await asyncio.to_thread(lambda: Account.get(name.lower()).get_strategy())
 
 if __name__ == "__main__":
-    mcp.run(transport='stdio')
\ No newline at end of file
+    serve(mcp)
\ No newline at end of file
@@ -3,8 +3,22 @@ from util import css, js, Color
 import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
+import threading
+from collections import deque
 from accounts import Account
-from database import read_log
+from database import read_log_since
+from change_feed import ChangeFeed
+
+# One point per hour keeps a month of history to a few hundred points on the chart
+CHART_RESOLUTION_SECONDS = 3600
+LOG_LINES = 13
+
+# The dashboard components each kind of change makes stale
+PANEL_OUTPUTS = {
+    "account": ("portfolio_value", "holdings", "transactions"),
+    "portfolio": ("portfolio_value", "chart"),
+    "logs": ("logs",),
+}
 
 mapper = {
     "trace": Color.WHITE,
@@ -22,18 +36,41 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        # Shared by every browser session: each tick only reads log rows written since the cursor
+        self.log_cursor = 0
+        self.log_lines = deque(maxlen=LOG_LINES)
+        self.log_lock = threading.Lock()
+        # Rendered once per change and shared by every browser session
+        self.outputs = {}
+        self.render(PANEL_OUTPUTS)
 
     def reload(self):
         self.account = Account.get(self.name)
 
+    def render(self, panels):
+        """Rebuild the outputs made stale by changes to these panels"""
+        stale = {output for panel in panels for output in PANEL_OUTPUTS[panel]}
+        if "account" in panels:
+            self.reload()
+        renderers = {
+            "portfolio_value": self.get_portfolio_value,
+            "chart": self.get_portfolio_value_chart,
+            "logs": self.get_logs,
+            "holdings": self.get_holdings_df,
+            "transactions": self.get_transactions_df,
+        }
+        for output in stale:
+            self.outputs[output] = renderers[output]()
+
     def get_title(self) -> str:
         return f"<div style='text-align: center;font-size:34px;'>{self.name}<span style='color:#ccc;font-size:24px;'> ({self.model_name}) - {self.lastname}</span></div>"
 
     def get_strategy(self) -> str:
         return self.account.get_strategy()
 
-    def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+    def get_portfolio_value_df(self, start: str | None = None) -> pd.DataFrame:
+        series = self.account.get_portfolio_value_series(start, resolution_seconds=CHART_RESOLUTION_SECONDS)
+        df = pd.DataFrame(series, columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -80,17 +117,14 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
-    def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
-        response = ""
-        for log in logs:
-            timestamp, type, message = log
-            color = mapper.get(type, Color.WHITE).value
-            response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
-        return gr.update()
+    def get_logs(self) -> str:
+        with self.log_lock:
+            for id, timestamp, type, message in read_log_since(self.name, self.log_cursor, last_n=LOG_LINES):
+                color = mapper.get(type, Color.WHITE).value
+                self.log_lines.append(f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>")
+                self.log_cursor = id
+            response = "".join(self.log_lines)
+        return f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
 
 
 class TraderView:
@@ -98,23 +132,24 @@ class TraderView:
         self.trader = trader
         self.portfolio_value = None
         self.chart = None
+        self.log = None
         self.holdings_table = None
         self.transactions_table = None
 
     def make_ui(self):
+        # Values come from the trader's shared rendered outputs, so opening a tab doesn't read the database
+        outputs = self.trader.outputs
         with gr.Column():
             gr.HTML(self.trader.get_title())
             with gr.Row():
-                self.portfolio_value = gr.HTML(self.trader.get_portfolio_value)
+                self.portfolio_value = gr.HTML(lambda: outputs["portfolio_value"])
             with gr.Row():
-                self.chart = gr.Plot(
-                    self.trader.get_portfolio_value_chart, container=True, show_label=False
-                )
+                self.chart = gr.Plot(lambda: outputs["chart"], container=True, show_label=False)
             with gr.Row(variant="panel"):
-                self.log = gr.HTML(self.trader.get_logs)
+                self.log = gr.HTML(lambda: outputs["logs"])
             with gr.Row():
                 self.holdings_table = gr.Dataframe(
-                    value=self.trader.get_holdings_df,
+                    value=lambda: outputs["holdings"],
                     label="Holdings",
                     headers=["Symbol", "Quantity"],
                     row_count=(5, "dynamic"),
@@ -124,7 +159,7 @@ class TraderView:
                 )
             with gr.Row():
                 self.transactions_table = gr.Dataframe(
-                    value=self.trader.get_transactions_df,
+                    value=lambda: outputs["transactions"],
                     label="Recent Transactions",
                     headers=["Timestamp", "Symbol", "Quantity", "Price", "Rationale"],
                     row_count=(5, "dynamic"),
@@ -133,36 +168,20 @@ class TraderView:
                     elem_classes=["dataframe-fix"],
                 )
 
-        timer = gr.Timer(value=120)
-        timer.tick(
-            fn=self.refresh,
-            inputs=[],
-            outputs=[
-                self.portfolio_value,
-                self.chart,
-                self.holdings_table,
-                self.transactions_table,
-            ],
-            show_progress="hidden",
-            queue=False,
-        )
-        log_timer = gr.Timer(value=0.5)
-        log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
-            outputs=[self.log],
-            show_progress="hidden",
-            queue=False,
-        )
+    def components(self) -> dict:
+        return {
+            "portfolio_value": self.portfolio_value,
+            "chart": self.chart,
+            "logs": self.log,
+            "holdings": self.holdings_table,
+            "transactions": self.transactions_table,
+        }
 
-    def refresh(self):
-        self.trader.reload()
-        return (
-            self.trader.get_portfolio_value(),
-            self.trader.get_portfolio_value_chart(),
-            self.trader.get_holdings_df(),
-            self.trader.get_transactions_df(),
-        )
+    def updates(self, panels) -> dict:
+        """The new values of just the components that changes to these panels made stale"""
+        components = self.components()
+        stale = {output for panel in panels for output in PANEL_OUTPUTS[panel]}
+        return {components[output]: self.trader.outputs[output] for output in stale}
 
 
 # Main UI construction
@@ -174,6 +193,26 @@ def create_ui():
         for trader_name, lastname, model_name in zip(names, lastnames, short_model_names)
     ]
     trader_views = [TraderView(trader) for trader in traders]
+    by_name = {trader.name.lower(): trader for trader in traders}
+
+    # One watcher for the whole app: it re-renders a trader's changed panels once, then wakes every session
+    feed = ChangeFeed(list(by_name))
+    feed.add_listener(
+        lambda changes: [by_name[name].render(panels) for name, panels in changes.items()]
+    )
+    feed.start()
+
+    async def push_updates():
+        """Runs for each open page, pushing only the components that changed since its last update"""
+        revision = feed.revision
+        while True:
+            seen, revision = revision, await feed.wait(revision)
+            changes = feed.changes_since(seen)
+            updates = {}
+            for view in trader_views:
+                updates.update(view.updates(changes.get(view.trader.name.lower(), ())))
+            if updates:
+                yield updates
 
     with gr.Blocks(
         title="Traders", css=css, js=js, theme=gr.themes.Default(primary_hue="sky"), fill_width=True
@@ -181,6 +220,13 @@ def create_ui():
         with gr.Row():
             for trader_view in trader_views:
                 trader_view.make_ui()
+        ui.load(
+            push_updates,
+            inputs=None,
+            outputs=[component for view in trader_views for component in view.components().values()],
+            show_progress="hidden",
+            concurrency_limit=None,
+        )
 
     return ui
 
@@ -0,0 +1,229 @@
+"""
+Replay stored daily closes from the market_prices table through in-memory accounts, so a strategy can be
+evaluated over months of history in seconds instead of by running live traders in real time.
+
+A strategy is any callable decide(date, prices, account) -> list[Order], where prices holds every stored
+close on that date. Built in are a buy and hold rule, a momentum rule, and Recorded, which replays the
+trades a live trader made; an LLM agent can be plugged in the same way, or stubbed with recorded orders.
+
+    uv run backtest.py --start 2025-01-01 --end 2025-06-30 --strategy momentum --strategy buy_and_hold --replay warren
+"""
+
+import argparse
+import time
+from collections import defaultdict, deque
+from typing import Callable, NamedTuple
+import numpy as np
+from pydantic import BaseModel
+from accounts import Account, INITIAL_BALANCE
+from database import read_market_range, read_transactions
+
+TRADING_DAYS_PER_YEAR = 252
+# Simulated trades are stamped at the close of the day they replay
+CLOSE_TIME = "16:00:00"
+
+
+class Order(NamedTuple):
+    symbol: str
+    quantity: int  # negative for a sale
+    rationale: str = "backtest"
+
+
+Decide = Callable[[str, dict[str, float], Account], list[Order]]
+
+
+class BacktestResult(BaseModel):
+    name: str
+    start_value: float
+    end_value: float
+    total_return: float
+    annualized_return: float
+    max_drawdown: float
+    turnover: float
+    trades: int
+    rejected: int
+    values: list[tuple[str, float]]
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<16} return {self.total_return:8.2%}  annualized {self.annualized_return:8.2%}  "
+            f"max drawdown {self.max_drawdown:7.2%}  turnover {self.turnover:6.2f}x  "
+            f"trades {self.trades:5d}  rejected {self.rejected:4d}"
+        )
+
+
+def buy_and_hold(symbols: list[str]) -> Decide:
+    """Split the starting cash equally across symbols on the first day, then never trade again"""
+
+    def decide(date: str, prices: dict[str, float], account: Account) -> list[Order]:
+        if account.holdings or account.transactions:
+            return []
+        held = [symbol for symbol in symbols if prices.get(symbol)]
+        budget = account.balance / max(len(held), 1) * 0.99
+        return [Order(symbol, int(budget // prices[symbol]), "buy and hold") for symbol in held]
+
+    return decide
+
+
+def momentum(symbols: list[str], lookback: int = 20, top_n: int = 3) -> Decide:
+    """Hold equal amounts of the top_n symbols by return over the last lookback days, rebalancing as the ranking changes"""
+    history: dict[str, deque] = defaultdict(lambda: deque(maxlen=lookback + 1))
+
+    def decide(date: str, prices: dict[str, float], account: Account) -> list[Order]:
+        for symbol in symbols:
+            if prices.get(symbol):
+                history[symbol].append(prices[symbol])
+        ranked = sorted(
+            (closes[-1] / closes[0] - 1, symbol) for symbol, closes in history.items() if len(closes) > lookback
+        )
+        if not ranked:
+            return []
+        leaders = {symbol for change, symbol in ranked[-top_n:] if change > 0}
+        orders = [
+            Order(symbol, -quantity, "momentum exit")
+            for symbol, quantity in account.holdings.items()
+            if symbol not in leaders and prices.get(symbol)
+        ]
+        entering = [symbol for symbol in leaders if symbol not in account.holdings]
+        if entering:
+            cash = account.balance + sum(-order.quantity * prices[order.symbol] for order in orders)
+            budget = cash / len(entering) * 0.99
+            orders += [Order(symbol, int(budget // prices[symbol]), "momentum entry") for symbol in entering]
+        return orders
+
+    return decide
+
+
+class Recorded:
+    """
+    Replay a fixed set of orders on the dates they were made, at the backtest's prices. Built from a live
+    trader's ledger, this reruns an LLM agent's actual decisions; built from a dict, it stubs one.
+    """
+
+    def __init__(self, orders_by_date: dict[str, list[Order]]):
+        self.orders_by_date = orders_by_date
+
+    @classmethod
+    def from_account(cls, name: str) -> "Recorded":
+        orders_by_date = defaultdict(list)
+        for transaction in read_transactions(name):
+            orders_by_date[transaction["timestamp"][:10]].append(
+                Order(transaction["symbol"], transaction["quantity"], transaction["rationale"])
+            )
+        return cls(orders_by_date)
+
+    def __call__(self, date: str, prices: dict[str, float], account: Account) -> list[Order]:
+        return self.orders_by_date.get(date, [])
+
+
+class Backtest:
+    """
+    Run several accounts through the same stretch of market history. Accounts live only in memory, so
+    trades never touch SQLite; the one database read is the price history, loaded up front.
+    """
+
+    def __init__(
+        self,
+        strategies: dict[str, Decide],
+        start: str,
+        end: str,
+        symbols: list[str] | None = None,
+        initial_balance: float = INITIAL_BALANCE,
+    ):
+        self.strategies = strategies
+        self.days = read_market_range(start, end, symbols)
+        self.initial_balance = initial_balance
+
+    def _new_account(self, name: str) -> Account:
+        account = Account(name=name, balance=self.initial_balance, strategy="", holdings={})
+        account._transactions = []
+        return account
+
+    def _execute(self, account: Account, order: Order, price: float | None, timestamp: str) -> float:
+        """Apply one order, returning the traded notional; raises ValueError if the account can't fill it"""
+        if not order.quantity:
+            return 0.0
+        if not price:
+            raise ValueError(f"No price for {order.symbol}")
+        if order.quantity > 0:
+            transaction = account.execute_buy(order.symbol, order.quantity, order.rationale, price, timestamp)
+        else:
+            transaction = account.execute_sell(order.symbol, -order.quantity, order.rationale, price, timestamp)
+        account._transactions.append(transaction)
+        return abs(transaction.total())
+
+    def run(self) -> dict[str, BacktestResult]:
+        accounts = {name: self._new_account(name) for name in self.strategies}
+        values = {name: [] for name in self.strategies}
+        traded = dict.fromkeys(self.strategies, 0.0)
+        rejected = dict.fromkeys(self.strategies, 0)
+        # Closes carry forward, so a holding is still valued on a date its symbol is missing from
+        last_prices: dict[str, float] = {}
+        for date, prices in self.days:
+            last_prices.update(prices)
+            timestamp = f"{date} {CLOSE_TIME}"
+            for name, decide in self.strategies.items():
+                account = accounts[name]
+                for order in decide(date, prices, account):
+                    try:
+                        traded[name] += self._execute(account, order, prices.get(order.symbol), timestamp)
+                    except ValueError:
+                        rejected[name] += 1
+                values[name].append((date, account.calculate_portfolio_value(last_prices)))
+        return {
+            name: self._result(name, accounts[name], values[name], traded[name], rejected[name])
+            for name in self.strategies
+        }
+
+    def _result(
+        self, name: str, account: Account, values: list[tuple[str, float]], traded: float, rejected: int
+    ) -> BacktestResult:
+        series = np.array([value for _, value in values] or [self.initial_balance])
+        total_return = series[-1] / self.initial_balance - 1
+        years = max(len(series), 1) / TRADING_DAYS_PER_YEAR
+        peaks = np.maximum.accumulate(np.maximum(series, self.initial_balance))
+        return BacktestResult(
+            name=name,
+            start_value=self.initial_balance,
+            end_value=float(series[-1]),
+            total_return=float(total_return),
+            annualized_return=float((1 + total_return) ** (1 / years) - 1) if total_return > -1 else -1.0,
+            max_drawdown=float(np.max(1 - series / peaks)),
+            turnover=float(traded / series.mean()),
+            trades=len(account.transactions),
+            rejected=rejected,
+            values=values,
+        )
+
+
+STRATEGIES = {
+    "buy_and_hold": buy_and_hold,
+    "momentum": momentum,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest strategies against the stored daily market closes")
+    parser.add_argument("--start", required=True, help="first date to replay, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="last date to replay, YYYY-MM-DD")
+    parser.add_argument(
+        "--symbols", nargs="+", default=["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA"],
+        help="the universe the rule based strategies trade",
+    )
+    parser.add_argument("--strategy", action="append", choices=STRATEGIES.keys(), default=[])
+    parser.add_argument(
+        "--replay", action="append", default=[], metavar="TRADER", help="replay a live trader's recorded trades"
+    )
+    args = parser.parse_args()
+    strategies = {name: STRATEGIES[name](args.symbols) for name in args.strategy}
+    strategies |= {f"replay {name}": Recorded.from_account(name) for name in args.replay}
+    if not strategies:
+        parser.error("give at least one --strategy or --replay")
+    # Recorded traders may hold symbols outside the universe, so only narrow the price history without them
+    backtest = Backtest(strategies, args.start, args.end, None if args.replay else args.symbols)
+    started = time.perf_counter()
+    results = backtest.run()
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {len(backtest.days)} trading days for {len(strategies)} accounts in {elapsed:.2f}s")
+    for result in results.values():
+        print(result.summary())
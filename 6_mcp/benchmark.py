@@ -0,0 +1,639 @@
+"""
+Micro-benchmarks for the trading floor's storage and service layers.
+
+Each benchmark runs against a scratch database so it never touches accounts.db:
+
+    uv run benchmark.py database
+    uv run benchmark.py market
+    uv run benchmark.py accounts_client
+    uv run benchmark.py accounts_http -c 20
+    uv run benchmark.py trades -c 8
+    uv run benchmark.py prompts -n 1000
+    uv run benchmark.py push -n 20
+    uv run benchmark.py dashboard -c 50
+    uv run benchmark.py research
+    uv run benchmark.py turns -n 1000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+TRADERS = ["warren", "george", "ray", "cathie"]
+
+
+def _legacy_writes(db: str, name: str, n: int) -> None:
+    """The original connect-per-call pattern: one connection, one statement and one commit per write"""
+    for i in range(n):
+        with sqlite3.connect(db, timeout=30) as conn:
+            conn.execute(
+                "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), ?, ?)",
+                (name, "function", f"Ended function lookup_share_price {i}"),
+            )
+            conn.commit()
+        with sqlite3.connect(db, timeout=30) as conn:
+            conn.execute(
+                "INSERT INTO accounts (name, account) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET account=excluded.account",
+                (name, json.dumps({"name": name, "balance": 10_000.0 - i})),
+            )
+            conn.commit()
+
+
+def _pooled_writes(db: str, name: str, n: int) -> None:
+    os.environ["ACCOUNTS_DB"] = db
+    from database import write_log, write_account
+
+    for i in range(n):
+        write_log(name, "function", f"Ended function lookup_share_price {i}")
+        write_account(name, {"balance": 10_000.0 - i, "strategy": "", "holdings": {"AAPL": i}})
+
+
+def _run_traders(target, db: str, n: int) -> float:
+    """Run one writer process per trader, as the four accounts servers do, and return writes/sec"""
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=target, args=(db, name, n)) for name in TRADERS]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    return 2 * n * len(TRADERS) / elapsed
+
+
+def bench_database(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        with sqlite3.connect(legacy_db) as conn:
+            conn.execute("CREATE TABLE accounts (name TEXT PRIMARY KEY, account TEXT)")
+            conn.execute(
+                "CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT)"
+            )
+        before = _run_traders(_legacy_writes, legacy_db, n)
+        # Create the schema once up front so the four processes don't race to set WAL mode
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "pooled.db")
+        import database  # noqa: F401
+
+        after = _run_traders(_pooled_writes, os.environ["ACCOUNTS_DB"], n)
+    print(f"SQLite writes, {len(TRADERS)} traders x {2 * n} writes each")
+    print(f"  connect per call: {before:10,.0f} writes/sec")
+    print(f"  pooled + WAL:     {after:10,.0f} writes/sec  ({after / before:.1f}x)")
+
+
+def _fake_market(tickers: int = 10_000) -> dict[str, float]:
+    symbols = {"".join(random.choices(string.ascii_uppercase, k=random.randint(1, 5))) for _ in range(tickers * 2)}
+    return {symbol: round(random.uniform(1, 500), 2) for symbol in list(symbols)[:tickers]}
+
+
+def bench_market(n: int) -> None:
+    dates = [f"2025-05-{day:02d}" for day in range(1, 21)]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "market.db")
+        from database import get_connection, write_market, read_market_price, read_market_history
+
+        conn = get_connection()
+        conn.execute("CREATE TABLE legacy_market (date TEXT PRIMARY KEY, data TEXT)")
+        market = _fake_market()
+        for date in dates:
+            with conn:
+                conn.execute("INSERT INTO legacy_market VALUES (?, ?)", (date, json.dumps(market)))
+            write_market(date, market)
+        symbols = random.choices(list(market), k=n)
+
+        # Each MCP server process starts cold, so the legacy path parses the blob once per process
+        start = time.perf_counter()
+        for symbol in symbols:
+            row = conn.execute("SELECT data FROM legacy_market WHERE date = ?", (dates[-1],)).fetchone()
+            json.loads(row[0]).get(symbol, 0.0)
+        legacy_lookup = (time.perf_counter() - start) / n
+
+        start = time.perf_counter()
+        for symbol in symbols:
+            read_market_price(dates[-1], symbol)
+        columnar_lookup = (time.perf_counter() - start) / n
+
+        history_n = max(n // 20, 1)
+        start = time.perf_counter()
+        for symbol in symbols[:history_n]:
+            for (blob,) in conn.execute("SELECT data FROM legacy_market ORDER BY date"):
+                json.loads(blob).get(symbol)
+        legacy_history = (time.perf_counter() - start) / history_n
+
+        start = time.perf_counter()
+        for symbol in symbols[:history_n]:
+            read_market_history(symbol)
+        columnar_history = (time.perf_counter() - start) / history_n
+
+    print(f"Market lookups, {len(market):,} tickers x {len(dates)} dates")
+    print(f"  one symbol, JSON blob:      {legacy_lookup * 1e6:10,.0f} us")
+    print(f"  one symbol, columnar:       {columnar_lookup * 1e6:10,.0f} us  ({legacy_lookup / columnar_lookup:.0f}x)")
+    print(f"  symbol history, JSON blob:  {legacy_history * 1e6:10,.0f} us")
+    print(f"  symbol history, columnar:   {columnar_history * 1e6:10,.0f} us  ({legacy_history / columnar_history:.0f}x)")
+
+
+async def _accounts_client_latencies(n: int) -> tuple[float, float]:
+    import mcp
+    from mcp.client.stdio import stdio_client
+    from accounts_client import params, read_accounts_resource, accounts_pool
+
+    async def spawn_per_call():
+        async with stdio_client(params) as streams:
+            async with mcp.ClientSession(*streams) as session:
+                await session.initialize()
+                await session.read_resource("accounts://accounts_server/warren")
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await spawn_per_call()
+    before = (time.perf_counter() - start) / n
+
+    await read_accounts_resource("warren")  # warm the pool, as the first trader cycle would
+    start = time.perf_counter()
+    for _ in range(n):
+        await read_accounts_resource("warren")
+    after = (time.perf_counter() - start) / n
+    await accounts_pool.close()
+    return before, after
+
+
+def bench_accounts_client(n: int) -> None:
+    n = min(n, 20)
+    before, after = asyncio.run(_accounts_client_latencies(n))
+    print(f"accounts_client read_accounts_resource, {n} sequential calls")
+    print(f"  new server per call: {before * 1000:10,.1f} ms/call")
+    print(f"  pooled session:      {after * 1000:10,.1f} ms/call  ({before / after:.0f}x)")
+
+
+async def _accounts_http_load(url: str, n: int, clients: int) -> tuple[float, list[float]]:
+    import mcp
+    from mcp.client.streamable_http import streamablehttp_client
+
+    latencies = []
+
+    async def client(index: int):
+        name = f"trader{index}"
+        async with streamablehttp_client(url) as (read, write, _):
+            async with mcp.ClientSession(read, write) as session:
+                await session.initialize()
+                for i in range(n):
+                    start = time.perf_counter()
+                    if i % 2:
+                        await session.call_tool(
+                            "buy_shares", {"name": name, "symbol": "AAPL", "quantity": 1, "rationale": "load test"}
+                        )
+                    else:
+                        await session.call_tool("get_balance", {"name": name})
+                    latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    return time.perf_counter() - start, latencies
+
+
+def _wait_for_port(port: int, timeout: float = 30) -> None:
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"accounts_server did not start listening on port {port}")
+
+
+def bench_accounts_http(n: int, clients: int = 20) -> None:
+    n = min(n, 100)
+    port = 18001
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "ACCOUNTS_DB": os.path.join(tmp, "http.db"), "POLYGON_API_KEY": ""}
+        server = subprocess.Popen(
+            [sys.executable, "accounts_server.py", "--transport", "streamable-http", "--port", str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port)
+            elapsed, latencies = asyncio.run(_accounts_http_load(f"http://127.0.0.1:{port}/mcp", n, clients))
+        finally:
+            server.terminate()
+            server.wait()
+    latencies.sort()
+    print(f"accounts_server over streamable HTTP, {clients} concurrent clients x {n} calls (get_balance / buy_shares)")
+    print(f"  throughput:  {len(latencies) / elapsed:10,.0f} requests/sec")
+    print(f"  p50 latency: {latencies[len(latencies) // 2] * 1000:10,.1f} ms")
+    print(f"  p95 latency: {latencies[int(len(latencies) * 0.95)] * 1000:10,.1f} ms")
+
+
+def _stress_trades(db: str, threads: int, n: int) -> tuple[int, int]:
+    """Hammer one account from several threads with random buys and sells; returns (trades, rejected)"""
+    os.environ["ACCOUNTS_DB"] = db
+    from concurrent.futures import ThreadPoolExecutor
+    from accounts import Account
+
+    def trader(seed: int) -> tuple[int, int]:
+        rng = random.Random(seed)
+        trades = rejected = 0
+        for _ in range(n):
+            account = Account.get("stress")
+            try:
+                if rng.random() < 0.6:
+                    account.buy_shares(rng.choice(["AAPL", "MSFT", "NVDA"]), rng.randint(1, 3), "stress test")
+                else:
+                    account.sell_shares(rng.choice(["AAPL", "MSFT", "NVDA"]), rng.randint(1, 3), "stress test")
+                trades += 1
+            except ValueError:
+                rejected += 1
+        return trades, rejected
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(trader, range(os.getpid() * 100, os.getpid() * 100 + threads)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def _stress_process(db: str, threads: int, n: int, results) -> None:
+    results.put(_stress_trades(db, threads, n))
+
+
+def bench_trades(n: int, clients: int = 8) -> None:
+    """Concurrent buys and sells on one account from several processes and threads, then check for drift"""
+    n = min(n, 200)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "trades.db")
+        os.environ["SNAPSHOT_EVERY_N_MINUTES"] = "100000"
+        from accounts import Account, INITIAL_BALANCE
+
+        Account.get("stress").reset("")
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        processes = [
+            ctx.Process(target=_stress_process, args=(os.environ["ACCOUNTS_DB"], clients, n, queue))
+            for _ in range(len(TRADERS))
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        account = Account.get("stress")
+        ledger = account.transactions
+        holdings = {}
+        for transaction in ledger:
+            holdings[transaction.symbol] = holdings.get(transaction.symbol, 0) + transaction.quantity
+        expected_balance = INITIAL_BALANCE - sum(transaction.total() for transaction in ledger)
+        trades = sum(r[0] for r in results)
+        rejected = sum(r[1] for r in results)
+        checks = {
+            "every accepted trade is in the ledger": len(ledger) == trades,
+            "balance matches the ledger": abs(account.balance - expected_balance) < 1e-6,
+            "holdings match the ledger": {s: q for s, q in holdings.items() if q} == account.holdings,
+            "no negative holdings or balance": account.balance >= -1e-6 and min(holdings.values(), default=0) >= 0,
+            "running aggregates match the ledger": account.verify_aggregates(),
+        }
+    print(f"Concurrent trades on one account, {len(TRADERS)} processes x {clients} threads x {n} attempts")
+    print(f"  {trades:,} trades and {rejected:,} rejected in {elapsed:.1f}s ({trades / elapsed:,.0f} trades/sec)")
+    for check, passed in checks.items():
+        print(f"  {'ok  ' if passed else 'FAIL'} {check}")
+
+
+def _token_counter():
+    """Count tokens with tiktoken, or estimate at 4 characters a token if its encodings can't be loaded"""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text)), "tokens"
+    except Exception:
+        return lambda text: len(text) // 4, "tokens (estimated)"
+
+
+def _veteran_account(name: str, n: int):
+    """An account that has made n trades across ten symbols, as a trader does over months of runs"""
+    from accounts import Account
+
+    symbols = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "SPY", "QQQ", "IWM"]
+    account = Account.get(name)
+    account.reset("Buy quality growth stocks on dips and hold them")
+    account.deposit(10_000_000)
+    for i in range(n):
+        symbol = symbols[i % len(symbols)]
+        if i % 3 == 2 and account.holdings.get(symbol):
+            account.sell_shares(symbol, 1, "Trimming the position after a strong run")
+        else:
+            account.buy_shares(symbol, 2, "Adding on weakness in line with the long term thesis")
+    return account
+
+
+def bench_prompts(n: int) -> None:
+    """Prompt size and build time for a long-lived account, with the full report and with the compact summary"""
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "prompts.db")
+        os.environ["SNAPSHOT_EVERY_N_MINUTES"] = "100000"
+        os.environ["REPORT_CACHE_SECONDS"] = "0"
+        from accounts import Account, get_account_report
+        from templates import trade_message, account_summary
+        from traders import account_changes
+
+        account = _veteran_account("veteran", n)
+        count, unit = _token_counter()
+
+        def full():
+            report = json.loads(get_account_report("veteran"))
+            report.pop("portfolio_value_time_series", None)
+            return trade_message("veteran", account.strategy, json.dumps(report))
+
+        previous = json.loads(Account.get("veteran").summary())
+
+        def summary():
+            text = Account.get("veteran").summary()
+            return trade_message("veteran", account.strategy, account_summary(text, account_changes(previous, json.loads(text))))
+
+        results = {}
+        for label, build in [("full report", full), ("summary + changes", summary)]:
+            start = time.perf_counter()
+            for _ in range(20):
+                message = build()
+            results[label] = (count(message), (time.perf_counter() - start) / 20)
+    print(f"Trader prompt for an account with {n:,} transactions")
+    for label, (tokens, seconds) in results.items():
+        print(f"  {label:<18} {tokens:10,} {unit}, built in {seconds * 1000:6.1f} ms")
+    (full_tokens, _), (summary_tokens, _) = results.values()
+    print(f"  the summary prompt is {full_tokens / summary_tokens:.0f}x smaller")
+
+
+async def _trader_turns(runs: int) -> dict:
+    """Run the veteran's trades through the real fleet and MCP servers; returns its span metrics summary"""
+    from agents import set_default_openai_api, set_trace_processors
+    from traders import Trader
+    from tracers import MetricsTracer
+    from span_metrics import metrics_writer, summarize
+    from database import read_span_metrics
+    from mcp_fleet import MCPServerFleet
+    from accounts_client import accounts_pool
+    import llm_clients
+
+    set_default_openai_api("chat_completions")
+    set_trace_processors([MetricsTracer()])
+    trader = Trader("Veteran", "Tester", "gpt-4o-mini")
+    fleet = MCPServerFleet([trader.name], research=False)
+    try:
+        await fleet.start()
+        for _ in range(runs):
+            trader.do_trade = True
+            await trader.run(fleet)
+        metrics_writer.flush()
+        return summarize(read_span_metrics("0000-01-01 00:00:00"))
+    finally:
+        await fleet.close()
+        await accounts_pool.close()
+        await llm_clients.close_clients()
+
+
+def _turns_process(prompt: str, n: int, runs: int, latency: float, prefill: float, results) -> None:
+    from loadtest import STUB_PORT, start_stub, _stub_environment
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _stub_environment(os.path.join(tmp, "turns.db"), STUB_PORT)
+        os.environ["ACCOUNT_PROMPT"] = prompt
+        _veteran_account("veteran", n)
+        server, thread = start_stub(latency, STUB_PORT, prefill_seconds=prefill)
+        try:
+            summary = asyncio.run(_trader_turns(runs))
+        finally:
+            server.should_exit = True
+            thread.join()
+    results.put((summary["traders"]["veteran"], summary["models"]["gpt-4o-mini"]))
+
+
+def bench_turns(n: int, runs: int = 5, latency: float = 0.3, prefill: float = 0.05) -> None:
+    """
+    End-to-end trader run latency for a long-lived account, with the full report and with the compact summary,
+    against loadtest's stub LLM. The stub answers in about latency seconds, plus prefill seconds for every
+    1,000 prompt tokens; hosted models take roughly that long to read a prompt, though it varies by model and load.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for label, prompt in [("full report", "full"), ("summary + changes", "summary")]:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_turns_process, args=(prompt, n, runs, latency, prefill, queue))
+        process.start()
+        results[label] = queue.get()
+        process.join()
+    print(
+        f"Trader runs for an account with {n:,} transactions, {runs} runs each, stub LLM at {latency * 1000:.0f}ms "
+        f"plus {prefill * 1000:.0f}ms per 1k prompt tokens"
+    )
+    for label, (trader, model) in results.items():
+        print(
+            f"  {label:<18} run {trader['p50_ms'] / 1000:6.2f}s p50 {trader['p95_ms'] / 1000:6.2f}s p95, "
+            f"LLM call {model['p50_ms']:6.0f}ms p50, {trader['input_tokens'] // trader['runs']:8,} prompt tokens a run"
+        )
+
+
+def _slow_endpoint(delay: float) -> tuple[str, list, object]:
+    """A local stand-in for Pushover that takes delay seconds to answer; returns its url and received messages"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import parse_qs
+    import threading
+
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+            received.append(parse_qs(body).get("message", [""])[0])
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Length", "12")
+            self.end_headers()
+            self.wfile.write(b'{"status":1}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/1/messages.json", received, server
+
+
+async def _push_latencies(url: str, n: int) -> float:
+    import push_server
+    from push_queue import PushQueue
+
+    push_server.push_queue = PushQueue(url=url, window_seconds=0.5, min_interval_seconds=0)
+    start = time.perf_counter()
+    for i in range(n):
+        await push_server.push(push_server.PushModelArgs(message=f"Bought {i} shares of AAPL"))
+    latency = (time.perf_counter() - start) / n
+    await push_server.push_queue.close()
+    return latency
+
+
+def bench_push(n: int, delay: float = 1.0) -> None:
+    import requests
+
+    n = min(n, 50)
+    url, received, server = _slow_endpoint(delay)
+    start = time.perf_counter()
+    for i in range(n):
+        requests.post(url, data={"message": f"Bought {i} shares of AAPL"})
+    before = (time.perf_counter() - start) / n
+    sent_before = len(received)
+    received.clear()
+    after = asyncio.run(_push_latencies(url, n))
+    server.shutdown()
+    print(f"push tool, {n} calls against an endpoint that takes {delay:.1f}s to answer")
+    print(f"  blocking requests.post: {before * 1000:10,.1f} ms/call, {sent_before} upstream requests")
+    print(f"  queued with digests:    {after * 1000:10,.3f} ms/call, {len(received)} upstream requests")
+
+
+async def _poll_logs(names: list[str], sessions: int, seconds: float) -> int:
+    """The old dashboard: every session reads every trader's new log rows on a 0.5s timer; returns the reads"""
+    from database import read_log_since
+
+    reads = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for _ in range(sessions):
+            for name in names:
+                read_log_since(name, 0, last_n=13)
+                reads += 1
+        await asyncio.sleep(0.5)
+    return reads
+
+
+async def _feed_sessions(feed, sessions: int, seconds: float, trade) -> tuple[int, float]:
+    """Sessions waiting on the change feed through an idle spell and then one trade; returns wakeups and latency"""
+    revisions = [feed.revision] * sessions
+    woken = []
+
+    async def session(i):
+        revisions[i] = await feed.wait(revisions[i])
+        woken.append(time.perf_counter())
+
+    waiting = [asyncio.create_task(session(i)) for i in range(sessions)]
+    await asyncio.sleep(seconds)
+    idle_wakeups = len(woken)
+    start = time.perf_counter()
+    await asyncio.to_thread(trade)
+    await asyncio.gather(*waiting)
+    return idle_wakeups, max(woken) - start
+
+
+def bench_dashboard(n: int, clients: int = 50, seconds: float = 5.0) -> None:
+    """Database reads and CPU for open dashboard tabs while nothing trades, polling versus the change feed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "dashboard.db")
+        os.environ["SNAPSHOT_EVERY_N_MINUTES"] = "100000"
+        from accounts import Account
+        from change_feed import ChangeFeed
+
+        for name in TRADERS:
+            Account.get(name).deposit(10_000)
+        cpu = time.process_time()
+        polled = asyncio.run(_poll_logs(TRADERS, clients, seconds))
+        polled_cpu = time.process_time() - cpu
+        feed = ChangeFeed(TRADERS, poll_seconds=0.5)
+        renders = []
+        feed.add_listener(renders.append)
+        feed.start()
+        cpu = time.process_time()
+        idle_wakeups, latency = asyncio.run(
+            _feed_sessions(feed, clients, seconds, lambda: Account.get("warren").deposit(1))
+        )
+        feed_cpu = time.process_time() - cpu
+        feed.stop()
+        stats = feed.stats()
+    print(f"Dashboard with {clients} open tabs and {len(TRADERS)} traders, idle for {seconds:.0f}s then one deposit")
+    print(f"  0.5s polling per tab: {polled:8,} log queries, {polled_cpu:6.2f}s CPU")
+    print(
+        f"  change feed:          {stats['polls']:8,} data_version checks, {stats['reads']} marker reads, "
+        f"{feed_cpu:6.2f}s CPU including the deposit"
+    )
+    print(
+        f"  {idle_wakeups} wakeups while idle; the deposit was rendered {len(renders)}x "
+        f"and pushed to all {clients} tabs in {latency * 1000:.0f} ms"
+    )
+
+
+RESEARCH_QUESTIONS = [
+    "Latest news on {symbol}",
+    "What is the latest news for {symbol}?",
+    "{symbol} news today",
+    "Research recent news about {symbol} stock",
+    "Any notable financial news and opportunities today?",
+    "Look up notable financial news and market opportunities",
+]
+
+
+def bench_research(n: int, clients: int = 4, cycles: int = 3, llm_calls: int = 4, delay: float = 0.2) -> None:
+    """Researcher runs and LLM calls for traders asking overlapping questions, with and without the shared cache"""
+    from research_cache import ResearchCache
+
+    rng = random.Random(1)
+    symbols = ["NVDA", "AAPL", "TSLA"]
+    asked = [
+        [[rng.choice(RESEARCH_QUESTIONS).format(symbol=rng.choice(symbols)) for _ in range(2)] for _ in range(clients)]
+        for _ in range(cycles)
+    ]
+
+    async def research(query: str) -> tuple[str, int]:
+        await asyncio.sleep(delay)
+        return f"Summary for {query}", llm_calls
+
+    async def run(cache: ResearchCache):
+        for cycle in asked:
+            await asyncio.gather(*(
+                asyncio.gather(*(cache.get(question, research) for question in questions)) for questions in cycle
+            ))
+        return cache.stats()
+
+    uncached = asyncio.run(run(ResearchCache(ttl_seconds=0)))
+    cached = asyncio.run(run(ResearchCache(symbols=lambda: set(symbols))))
+    print(f"{clients} traders asking 2 research questions each, {cycles} cycles, {llm_calls} LLM calls per Researcher run")
+    print(f"  no cache:     {uncached['misses']:4} Researcher runs, {uncached['llm_calls']:4} LLM calls")
+    print(
+        f"  shared cache: {cached['misses']:4} Researcher runs, {cached['llm_calls']:4} LLM calls, "
+        f"{cached['hit_rate']:.0%} hit rate ({cached['hits']} exact, {cached['near_hits']} near-duplicate, "
+        f"{cached['coalesced']} joined a running search), {cached['llm_calls_saved']} LLM calls saved"
+    )
+
+
+BENCHMARKS = {
+    "database": bench_database,
+    "market": bench_market,
+    "accounts_client": bench_accounts_client,
+    "accounts_http": bench_accounts_http,
+    "trades": bench_trades,
+    "prompts": bench_prompts,
+    "push": bench_push,
+    "dashboard": bench_dashboard,
+    "research": bench_research,
+    "turns": bench_turns,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trading floor benchmarks")
+    parser.add_argument("benchmark", choices=BENCHMARKS.keys())
+    parser.add_argument("-n", type=int, default=500, help="iterations per trader")
+    parser.add_argument("-c", "--clients", type=int, help="concurrent clients for accounts_http, trades and dashboard")
+    args = parser.parse_args()
+    if args.benchmark in ("accounts_http", "trades", "dashboard") and args.clients:
+        BENCHMARKS[args.benchmark](args.n, args.clients)
+    else:
+        BENCHMARKS[args.benchmark](args.n)
@@ -0,0 +1,139 @@
+"""
+Publishes change events for the accounts, logs and portfolio value history that the dashboard shows.
+
+The traders write from other processes, so instead of an in-process pub/sub, one background thread watches
+SQLite's data_version, which changes whenever any connection commits. That is a single cheap pragma per
+poll; only when it moves does the feed read one marker per account to find out which panels changed, and
+then it tells its listeners once, however many browser sessions are waiting on it.
+"""
+
+import asyncio
+import os
+import threading
+from collections.abc import Callable
+from database import read_data_version, read_change_markers
+
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "0.5"))
+PANELS = ("account", "logs", "portfolio")
+
+
+class ChangeFeed:
+    """
+    Polls the database for commits and reports which panels of which accounts changed. Listeners are called
+    from the polling thread with {name: {panel, ...}}; afterwards the feed's revision goes up and every
+    coroutine waiting in wait() is woken, so listeners can prepare what waiters are about to read.
+    """
+
+    def __init__(self, names: list[str], poll_seconds: float = CHANGE_POLL_SECONDS):
+        self.names = [name.lower() for name in names]
+        self.poll_seconds = poll_seconds
+        self.revision = 0
+        self.polls = 0
+        self.reads = 0
+        self.events = 0
+        self._changed_at: dict[tuple[str, str], int] = {}
+        self._listeners: list[Callable[[dict[str, set[str]]], None]] = []
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._data_version = None
+        self._markers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener: Callable[[dict[str, set[str]]], None]):
+        self._listeners.append(listener)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        self.poll()
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                changes = self.poll()
+            except Exception as e:
+                print(f"Change feed poll failed: {e}")
+                continue
+            if changes:
+                self.publish(changes)
+
+    def poll(self) -> dict[str, set[str]]:
+        """Check for commits since the last poll; returns the changed panels of each account"""
+        self.polls += 1
+        data_version = read_data_version()
+        if data_version == self._data_version:
+            return {}
+        self._data_version = data_version
+        self.reads += 1
+        markers = read_change_markers(self.names)
+        changes = {}
+        for name, marker in markers.items():
+            previous = self._markers.get(name)
+            if previous is not None:
+                changed = {panel for panel in PANELS if marker[panel] != previous[panel]}
+                if changed:
+                    changes[name] = changed
+        self._markers = markers
+        return changes
+
+    def publish(self, changes: dict[str, set[str]]):
+        for listener in self._listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"Change feed listener failed: {e}")
+        with self._lock:
+            self.revision += 1
+            self.events += 1
+            for name, panels in changes.items():
+                for panel in panels:
+                    self._changed_at[(name, panel)] = self.revision
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait(self, revision: int) -> int:
+        """Wait until the feed has moved past revision, and return the latest revision"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.revision > revision:
+                return self.revision
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        finally:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+        return self.revision
+
+    def changes_since(self, revision: int) -> dict[str, set[str]]:
+        changes = {}
+        with self._lock:
+            for (name, panel), changed_at in self._changed_at.items():
+                if changed_at > revision:
+                    changes.setdefault(name, set()).add(panel)
+        return changes
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "polls": self.polls,
+            "reads": self.reads,
+            "events": self.events,
+            "waiting": len(self._waiters),
+        }
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
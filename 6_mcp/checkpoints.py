@@ -0,0 +1,135 @@
+"""
+Durable trader runs. The transcript of each trader's in-flight run is saved to the database before every
+model request and after every tool result, so when a run dies part way through, whether from an exception
+or a crash of the whole trading floor, the trader's next run picks it up from the last checkpoint instead
+of starting over. The model sees the tool calls and results it has already been through, so research and
+trades that completed are not paid for or made twice; only tool calls that had not returned are lost.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from agents import Model, RunHooks
+from database import TIMESTAMP_FORMAT, write_run_checkpoint, read_run_checkpoint, delete_run_checkpoint
+
+# A checkpoint older than this is from a market that has moved on, so it is dropped rather than resumed
+CHECKPOINT_MAX_AGE_MINUTES = float(os.getenv("CHECKPOINT_MAX_AGE_MINUTES", "90"))
+# A run that keeps failing after this many resumes starts over
+CHECKPOINT_MAX_RESUMES = int(os.getenv("CHECKPOINT_MAX_RESUMES", "2"))
+
+
+class RunCheckpoint:
+    """
+    The transcript of one trader run: the model's input as of its latest request, the items of the
+    model's latest response, and the outputs of the tool calls from that response that have returned
+    """
+
+    def __init__(self, name: str, mode: str, started_at: str | None = None, turns: int = 0, resumes: int = 0):
+        self.name = name
+        self.mode = mode
+        self.started_at = started_at or datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self.turns = turns
+        self.resumes = resumes
+        self.items: list[dict] = []
+        self.response: list[dict] = []
+        self.outputs: dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def load(cls, name: str) -> "RunCheckpoint | None":
+        """The trader's unfinished run, if it is recent enough and hasn't already failed too often to resume"""
+        data = read_run_checkpoint(name)
+        if data is None:
+            return None
+        started_at = datetime.strptime(data["started_at"], TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+        expired = datetime.now(timezone.utc) - started_at > timedelta(minutes=CHECKPOINT_MAX_AGE_MINUTES)
+        if expired or data["resumes"] >= CHECKPOINT_MAX_RESUMES:
+            delete_run_checkpoint(name)
+            return None
+        checkpoint = cls(name, data["mode"], data["started_at"], data["turns"], data["resumes"] + 1)
+        checkpoint.items = data["items"]
+        checkpoint.response = data["response"]
+        checkpoint.outputs = data["outputs"]
+        write_run_checkpoint(name, checkpoint.to_dict())
+        return checkpoint
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "turns": self.turns,
+            "resumes": self.resumes,
+            "items": self.items,
+            "response": self.response,
+            "outputs": self.outputs,
+        }
+
+    def transcript(self) -> list[dict]:
+        """
+        The input to resume the run with: everything up to the latest request, then the latest response
+        with only the tool calls that returned, each followed by its output
+        """
+        calls = [
+            item for item in self.response
+            if item.get("type") != "function_call" or item["call_id"] in self.outputs
+        ]
+        outputs = [
+            {"call_id": item["call_id"], "output": self.outputs[item["call_id"]], "type": "function_call_output"}
+            for item in calls
+            if item.get("type") == "function_call"
+        ]
+        return self.items + calls + outputs
+
+    async def save(self):
+        async with self._lock:
+            await asyncio.to_thread(write_run_checkpoint, self.name, self.to_dict())
+
+    async def record_request(self, input: str | list):
+        """The model is about to be called with the whole run so far, including every tool output"""
+        self.items = [{"content": input, "role": "user"}] if isinstance(input, str) else list(input)
+        self.response = []
+        self.outputs = {}
+        self.turns += 1
+        await self.save()
+
+    async def record_response(self, items: list[dict]):
+        self.response = items
+        await self.save()
+
+    async def record_output(self, call_id: str, output):
+        self.outputs[call_id] = str(output)
+        await self.save()
+
+    async def clear(self):
+        async with self._lock:
+            await asyncio.to_thread(delete_run_checkpoint, self.name)
+
+
+class CheckpointedModel(Model):
+    """Wraps the trader's model to checkpoint the run before each request and after each response"""
+
+    def __init__(self, model: Model, checkpoint: RunCheckpoint):
+        self.model = model
+        self.checkpoint = checkpoint
+
+    async def get_response(self, system_instructions, input, *args, **kwargs):
+        await self.checkpoint.record_request(input)
+        response = await self.model.get_response(system_instructions, input, *args, **kwargs)
+        await self.checkpoint.record_response(response.to_input_items())
+        return response
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        # Only requests are checkpointed; a partly streamed response is repeated on resume
+        await self.checkpoint.record_request(input)
+        async for event in self.model.stream_response(system_instructions, input, *args, **kwargs):
+            yield event
+
+
+class CheckpointHooks(RunHooks):
+    """Checkpoints the run as each of the trader's tool calls returns"""
+
+    def __init__(self, checkpoint: RunCheckpoint):
+        self.checkpoint = checkpoint
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        await self.checkpoint.record_output(context.tool_call_id, result)
@@ -1,17 +1,142 @@
 import sqlite3
 import json
-from datetime import datetime
+import os
+import atexit
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
 
+# Connection tuning: WAL lets the accounts, market and dashboard processes read while a trader writes,
+# and synchronous=NORMAL is durable in WAL mode without an fsync on every commit
+PRAGMAS = {
+    # Takes effect for new databases; retention.py converts existing ones with a one-off VACUUM. It must come
+    # before journal_mode, since switching a new database to WAL writes its header with auto_vacuum fixed
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,  # negative means KiB, so 64MB of page cache
+    "mmap_size": 268_435_456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 30_000,
+}
+STATEMENT_CACHE_SIZE = 256
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
+# Portfolio value retention: raw points for a day, then 5 minute OHLC buckets for a month, then daily buckets
+RAW_SNAPSHOT_RETENTION = timedelta(days=1)
+FIVE_MINUTE_BUCKET_RETENTION = timedelta(days=30)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+
+class StaleAccountError(Exception):
+    """Raised when an account changed since it was read, so a write based on that read would lose an update"""
+
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return the long-lived connection for the current thread, opening and tuning it on first use.
+    sqlite3 keeps a per-connection cache of prepared statements, so reusing the connection
+    means the same SQL is only ever compiled once per thread.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB, timeout=30, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+@atexit.register
+def close_connections():
+    """Close every pooled connection, checkpointing the WAL back into the main database file"""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        _connections.clear()
+    _local.__dict__.clear()
+
+
+def _ensure_columns(conn, table, columns: dict[str, str]):
+    """Add any columns missing from a table created by an earlier version of this schema"""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for column, definition in columns.items():
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+with get_connection() as conn:
+    # Legacy table holding each account as one JSON blob; read only by migrate_legacy_account
+    conn.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS account_info (
+            name TEXT PRIMARY KEY,
+            balance REAL NOT NULL,
+            strategy TEXT NOT NULL
+        )
+    ''')
+    # Running aggregates; a NULL net_invested means they have not yet been built from the ledger
+    _ensure_columns(conn, "account_info", {"net_invested": "REAL", "realized_pnl": "REAL NOT NULL DEFAULT 0"})
+    # Bumped on every write, so readers in any process can tell whether a cached view is stale
+    _ensure_columns(conn, "account_info", {"version": "INTEGER NOT NULL DEFAULT 0"})
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (name, symbol)
+        )
+    ''')
+    _ensure_columns(conn, "holdings", {"cost_basis": "REAL NOT NULL DEFAULT 0"})
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            rationale TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name ON transactions (name, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            datetime TEXT NOT NULL,
+            value REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_snapshots_name ON portfolio_snapshots (name, datetime)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_buckets (
+            name TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            start TEXT NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (name, resolution, start)
+        )
+    ''')
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -20,82 +145,649 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)')
+    # One row per finished agent, generation, tool or MCP span, written by tracers.MetricsTracer
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS span_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            trace_id TEXT,
+            started_at TEXT NOT NULL,
+            type TEXT NOT NULL,
+            label TEXT,
+            server TEXT,
+            model TEXT,
+            duration_ms REAL,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cost REAL,
+            error TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_span_metrics_started_at ON span_metrics (started_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_span_metrics_name ON span_metrics (name, started_at)')
+    # The in-flight agent run of each trader, saved after every model request and tool result by checkpoints.py
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS run_checkpoints (
+            name TEXT PRIMARY KEY,
+            updated_at TEXT NOT NULL,
+            checkpoint TEXT NOT NULL
+        )
+    ''')
+    # Legacy table holding each date's prices as one JSON blob; read only by migrate_legacy_market
+    conn.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS market_prices (
+            date TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (date, symbol)
+        ) WITHOUT ROWID
+    ''')
+    # Covering index so a symbol's history is read from the index alone
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_market_prices_symbol ON market_prices (symbol, date, close)')
+    conn.execute('CREATE TABLE IF NOT EXISTS market_dates (date TEXT PRIMARY KEY, symbols INTEGER NOT NULL)')
+
+
+def _insert_history(conn, name, transactions, snapshots):
+    conn.executemany('''
+        INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"]) for t in transactions])
+    conn.executemany(
+        'INSERT INTO portfolio_snapshots (name, datetime, value) VALUES (?, ?, ?)',
+        [(name, when, value) for when, value in snapshots],
+    )
+
+
+def migrate_legacy_account(name) -> bool:
+    """
+    Copy one account stored as a JSON blob in the legacy accounts table into the normalized tables.
+    The check and the copy share one write transaction, so processes migrating at the same time can't
+    both copy it; returns whether this call did.
+    """
+    name = name.lower()
+    conn = get_connection()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('SELECT 1 FROM account_info WHERE name = ?', (name,)).fetchone():
+            return False
+        row = conn.execute('SELECT account FROM accounts WHERE name = ?', (name,)).fetchone()
+        if not row:
+            return False
+        account = json.loads(row[0])
+        _write_account(conn, name, account)
+        _insert_history(conn, name, account.get("transactions", []), account.get("portfolio_value_time_series", []))
+    return True
+
+
+def migrate_legacy_accounts(drop_legacy=False) -> list[str]:
+    """
+    Copy accounts stored as JSON blobs in the legacy accounts table into the normalized tables.
+    Accounts that already exist in account_info are left alone, so this is safe to run repeatedly,
+    including from several processes at once.
+
+    Args:
+        drop_legacy (bool): Delete the legacy rows once they have been migrated
+
+    Returns:
+        list: The names of the accounts that were migrated
+    """
+    conn = get_connection()
+    names = [row[0] for row in conn.execute('''
+        SELECT name FROM accounts
+        WHERE name NOT IN (SELECT name FROM account_info)
+    ''')]
+    migrated = [name for name in names if migrate_legacy_account(name)]
+    if drop_legacy:
+        with conn:
+            conn.execute('DELETE FROM accounts WHERE name IN (SELECT name FROM account_info)')
+    return migrated
+
+
+def _write_account(conn, name, account_dict):
+    name = name.lower()
+    conn.execute('''
+        INSERT INTO account_info (name, balance, strategy, net_invested, realized_pnl)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            balance=excluded.balance,
+            strategy=excluded.strategy,
+            net_invested=excluded.net_invested,
+            realized_pnl=excluded.realized_pnl,
+            version=account_info.version + 1
+    ''', (
+        name,
+        account_dict["balance"],
+        account_dict["strategy"],
+        account_dict.get("net_invested"),
+        account_dict.get("realized_pnl", 0.0),
+    ))
+    cost_basis = account_dict.get("cost_basis", {})
+    conn.execute('DELETE FROM holdings WHERE name = ?', (name,))
+    conn.executemany(
+        'INSERT INTO holdings (name, symbol, quantity, cost_basis) VALUES (?, ?, ?, ?)',
+        [(name, symbol, quantity, cost_basis.get(symbol, 0.0)) for symbol, quantity in account_dict["holdings"].items()],
+    )
+
+def _begin_versioned(conn, name, expected_version: int | None):
+    """
+    Take the write lock up front with BEGIN IMMEDIATE, so no other writer can slip in between checking
+    the version and writing, then check the account is still at the version the caller read
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    if expected_version is None:
+        return
+    row = conn.execute('SELECT version FROM account_info WHERE name = ?', (name,)).fetchone()
+    if row and row[0] != expected_version:
+        raise StaleAccountError(f"Account {name} is at version {row[0]}, not {expected_version}")
+
+def _read_version(conn, name) -> int:
+    return conn.execute('SELECT version FROM account_info WHERE name = ?', (name,)).fetchone()[0]
+
+def write_account(name, account_dict, expected_version: int | None = None) -> int:
+    """
+    Write the balance, strategy and holdings of an account; transaction history is appended separately.
+
+    Args:
+        name (str): The account name
+        account_dict (dict): A dict with balance, strategy, holdings and optionally the running aggregates
+        expected_version (int): If given, the version the account was read at; raises StaleAccountError
+            instead of writing if another writer has changed it since
+
+    Returns:
+        int: The account's new version
+    """
+    name = name.lower()
+    with get_connection() as conn:
+        _begin_versioned(conn, name, expected_version)
+        _write_account(conn, name, account_dict)
+        return _read_version(conn, name)
 
 def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+    """
+    Read the balance, strategy and holdings of an account; history is loaded with read_transactions
+    and read_portfolio_snapshots.
+
+    Returns:
+        dict: The account fields and version, or None if there is no such account; net_invested is None
+        when the running aggregates have not been built from the ledger yet
+    """
+    name = name.lower()
+    conn = get_connection()
+    # One read transaction, so the holdings are from the same version as the balance
+    with conn:
+        conn.execute('BEGIN')
+        row = conn.execute('''
+            SELECT balance, strategy, net_invested, realized_pnl, version FROM account_info WHERE name = ?
+        ''', (name,)).fetchone()
+        if not row:
+            return None
+        holdings = conn.execute(
+            'SELECT symbol, quantity, cost_basis FROM holdings WHERE name = ? ORDER BY rowid', (name,)
+        ).fetchall()
+    return {
+        "name": name,
+        "balance": row[0],
+        "strategy": row[1],
+        "net_invested": row[2],
+        "realized_pnl": row[3],
+        "version": row[4],
+        "holdings": {symbol: quantity for symbol, quantity, _ in holdings},
+        "cost_basis": {symbol: cost_basis for symbol, _, cost_basis in holdings},
+    }
+
+def read_account_version(name) -> int | None:
+    row = get_connection().execute('SELECT version FROM account_info WHERE name = ?', (name.lower(),)).fetchone()
+    return row[0] if row else None
+
+def read_account_names() -> list[str]:
+    return [row[0] for row in get_connection().execute('SELECT name FROM account_info ORDER BY name')]
+
+def read_traded_symbols() -> set[str]:
+    """Every symbol any account holds or has ever traded"""
+    return {
+        row[0] for row in get_connection().execute('SELECT symbol FROM holdings UNION SELECT symbol FROM transactions')
+    }
+
+def read_data_version() -> int:
+    """A counter that changes whenever another connection, in this process or any other, commits to the database"""
+    return get_connection().execute('PRAGMA data_version').fetchone()[0]
+
+def read_change_markers(names: list[str]) -> dict[str, dict]:
+    """
+    Read, for each account, values that change whenever its account, logs or portfolio value history are
+    written to: the account version, the newest log id and the newest portfolio snapshot time. Each one is
+    a single index lookup, so the cost doesn't grow with the history.
+
+    Returns:
+        dict: A dict of {"account": ..., "logs": ..., "portfolio": ...} for each name
+    """
+    conn = get_connection()
+    markers = {}
+    for name in names:
+        name = name.lower()
+        markers[name] = dict(zip(("account", "logs", "portfolio"), conn.execute('''
+            SELECT
+                (SELECT version FROM account_info WHERE name = ?),
+                (SELECT MAX(id) FROM logs WHERE name = ?),
+                (SELECT MAX(datetime) FROM portfolio_snapshots WHERE name = ?)
+        ''', (name, name, name)).fetchone()))
+    return markers
+
+def reset_account(name, account_dict) -> int:
+    """Overwrite an account and discard its transaction and portfolio value history; returns the new version"""
+    name = name.lower()
+    with get_connection() as conn:
+        _begin_versioned(conn, name, None)
+        conn.execute('DELETE FROM transactions WHERE name = ?', (name,))
+        conn.execute('DELETE FROM portfolio_snapshots WHERE name = ?', (name,))
+        conn.execute('DELETE FROM portfolio_buckets WHERE name = ?', (name,))
+        _write_account(conn, name, account_dict)
+        return _read_version(conn, name)
+
+def write_trade(name, transaction: dict, account_dict: dict, expected_version: int | None = None) -> int:
+    """
+    Record a trade in one small transaction: append to the ledger, adjust the holding and its cost basis,
+    and set the new balance and running aggregates.
+
+    Args:
+        name (str): The account name
+        transaction (dict): The transaction, with a negative quantity for a sale
+        account_dict (dict): The balance, net_invested, realized_pnl and cost_basis after the trade
+        expected_version (int): If given, the version the trade was priced against; raises StaleAccountError
+            instead of writing if another writer has changed the account since
+
+    Returns:
+        int: The account's new version
+    """
+    name = name.lower()
+    symbol = transaction["symbol"]
+    with get_connection() as conn:
+        _begin_versioned(conn, name, expected_version)
+        _insert_history(conn, name, [transaction], [])
+        conn.execute('''
+            INSERT INTO holdings (name, symbol, quantity, cost_basis)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(name, symbol) DO UPDATE SET
+                quantity=quantity + excluded.quantity,
+                cost_basis=excluded.cost_basis
+        ''', (name, symbol, transaction["quantity"], account_dict["cost_basis"].get(symbol, 0.0)))
+        conn.execute('DELETE FROM holdings WHERE name = ? AND symbol = ? AND quantity = 0', (name, symbol))
+        conn.execute('''
+            UPDATE account_info SET balance = ?, net_invested = ?, realized_pnl = ?, version = version + 1
+            WHERE name = ?
+        ''', (account_dict["balance"], account_dict["net_invested"], account_dict["realized_pnl"], name))
+        return _read_version(conn, name)
+
+def read_transactions(name) -> list[dict]:
+    cursor = get_connection().execute('''
+        SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+        WHERE name = ?
+        ORDER BY id
+    ''', (name.lower(),))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def read_recent_transactions(name, limit: int) -> list[dict]:
+    """Read an account's most recent transactions, oldest first, without loading the rest of the ledger"""
+    cursor = get_connection().execute('''
+        SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+        WHERE name = ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (name.lower(), limit))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in reversed(cursor.fetchall())]
+
+def count_transactions(name) -> int:
+    return get_connection().execute('SELECT COUNT(*) FROM transactions WHERE name = ?', (name.lower(),)).fetchone()[0]
+
+def write_portfolio_snapshot(name, timestamp: str, value: float):
+    with get_connection() as conn:
+        conn.execute(
+            'INSERT INTO portfolio_snapshots (name, datetime, value) VALUES (?, ?, ?)',
+            (name.lower(), timestamp, value),
+        )
+
+def read_last_portfolio_snapshot_time(name) -> str | None:
+    row = get_connection().execute(
+        'SELECT MAX(datetime) FROM portfolio_snapshots WHERE name = ?', (name.lower(),)
+    ).fetchone()
+    return row[0]
+
+def read_portfolio_snapshots(name, start: str | None = None, end: str | None = None, resolution_seconds: int = 1):
+    """
+    Read the portfolio value series for an account across all retention tiers, oldest first.
+    Compacted buckets contribute their closing value at the bucket's start time.
+
+    Args:
+        name (str): The account name
+        start (str): Only include points at or after this timestamp
+        end (str): Only include points at or before this timestamp
+        resolution_seconds (int): Downsample in the database to the last point in each interval of this length
+
+    Returns:
+        list: A list of (datetime, value) tuples
+    """
+    name = name.lower()
+    start = start or "0000-01-01 00:00:00"
+    end = end or "9999-12-31 23:59:59"
+    # SQLite returns the bare value column from the same row as MAX(datetime), i.e. the last point per interval
+    return get_connection().execute('''
+        SELECT MAX(datetime), value FROM (
+            SELECT datetime, value FROM portfolio_snapshots
+            WHERE name = ? AND datetime BETWEEN ? AND ?
+            UNION ALL
+            SELECT start, close FROM portfolio_buckets
+            WHERE name = ? AND start BETWEEN ? AND ?
+        )
+        GROUP BY CAST(strftime('%s', datetime) AS INTEGER) / ?
+        ORDER BY 1
+    ''', (name, start, end, name, start, end, max(resolution_seconds, 1))).fetchall()
+
+def _bucket_start(timestamp: str, resolution: str) -> str:
+    when = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    if resolution == "5min":
+        when = when.replace(minute=when.minute - when.minute % 5, second=0)
+    else:
+        when = when.replace(hour=0, minute=0, second=0)
+    return when.strftime(TIMESTAMP_FORMAT)
+
+def _write_buckets(conn, resolution, points):
+    """Fold (name, timestamp, open, high, low, close) points, sorted by name and time, into buckets"""
+    buckets = []
+    for (name, start), group in groupby(points, key=lambda p: (p[0], _bucket_start(p[1], resolution))):
+        group = list(group)
+        buckets.append((
+            name, resolution, start,
+            group[0][2], max(p[3] for p in group), min(p[4] for p in group), group[-1][5],
+        ))
+    conn.executemany('''
+        INSERT INTO portfolio_buckets (name, resolution, start, open, high, low, close)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(name, resolution, start) DO UPDATE SET
+            high=MAX(high, excluded.high),
+            low=MIN(low, excluded.low),
+            close=excluded.close
+    ''', buckets)
+    return len(buckets)
+
+def compact_portfolio_snapshots(now: datetime | None = None) -> tuple[int, int]:
+    """
+    Apply the retention tiers: raw points older than RAW_SNAPSHOT_RETENTION become 5 minute OHLC buckets,
+    and 5 minute buckets older than FIVE_MINUTE_BUCKET_RETENTION become daily buckets.
+
+    Returns:
+        tuple: The number of 5 minute and daily buckets written
+    """
+    now = now or datetime.now()
+    raw_cutoff = _bucket_start((now - RAW_SNAPSHOT_RETENTION).strftime(TIMESTAMP_FORMAT), "5min")
+    five_minute_cutoff = _bucket_start((now - FIVE_MINUTE_BUCKET_RETENTION).strftime(TIMESTAMP_FORMAT), "1d")
+    with get_connection() as conn:
+        rows = conn.execute('''
+            SELECT name, datetime, value, value, value, value FROM portfolio_snapshots
+            WHERE datetime < ?
+            ORDER BY name, datetime, id
+        ''', (raw_cutoff,)).fetchall()
+        five_minute = _write_buckets(conn, "5min", rows)
+        conn.execute('DELETE FROM portfolio_snapshots WHERE datetime < ?', (raw_cutoff,))
+
+        rows = conn.execute('''
+            SELECT name, start, open, high, low, close FROM portfolio_buckets
+            WHERE resolution = '5min' AND start < ?
+            ORDER BY name, start
+        ''', (five_minute_cutoff,)).fetchall()
+        daily = _write_buckets(conn, "1d", rows)
+        conn.execute("DELETE FROM portfolio_buckets WHERE resolution = '5min' AND start < ?", (five_minute_cutoff,))
+    return five_minute, daily
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
-    
+
     Args:
         name (str): The name associated with the log
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
+    with get_connection() as conn:
+        conn.execute('''
             INSERT INTO logs (name, datetime, type, message)
             VALUES (?, datetime('now'), ?, ?)
         ''', (name.lower(), type, message))
-        conn.commit()
+
+def write_logs(entries: list[tuple[str, str, str, str]]):
+    """
+    Write a batch of log entries to the logs table in one transaction.
+
+    Args:
+        entries (list): Tuples of (name, datetime, type, message), with datetime in UTC like datetime('now')
+    """
+    with get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO logs (name, datetime, type, message)
+            VALUES (?, ?, ?, ?)
+        ''', [(name.lower(), when, type, message) for name, when, type, message in entries])
 
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
-    
+
     Args:
         name (str): The name to retrieve logs for
         last_n (int): Number of most recent entries to retrieve
-        
+
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    cursor = get_connection().execute('''
+        SELECT datetime, type, message FROM logs
+        WHERE name = ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (name.lower(), last_n))
+    return reversed(cursor.fetchall())
+
+def read_log_since(name: str, last_id: int = 0, last_n=100):
+    """
+    Read the log entries for a given name written after a known entry, using the (name, id) index
+    so the cost depends only on the number of new entries.
+
+    Args:
+        name (str): The name to retrieve logs for
+        last_id (int): The id of the last entry already seen; 0 to start from the most recent entries
+        last_n (int): At most this many of the newest entries are returned
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message), oldest first
+    """
+    cursor = get_connection().execute('''
+        SELECT id, datetime, type, message FROM logs
+        WHERE name = ? AND id > ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (name.lower(), last_id, last_n))
+    return cursor.fetchall()[::-1]
+
+def write_run_checkpoint(name: str, checkpoint: dict):
+    with get_connection() as conn:
+        conn.execute('''
+            INSERT INTO run_checkpoints (name, updated_at, checkpoint) VALUES (?, datetime('now'), ?)
+            ON CONFLICT(name) DO UPDATE SET updated_at = excluded.updated_at, checkpoint = excluded.checkpoint
+        ''', (name.lower(), json.dumps(checkpoint)))
+
+def read_run_checkpoint(name: str) -> dict | None:
+    row = get_connection().execute(
+        'SELECT checkpoint FROM run_checkpoints WHERE name = ?', (name.lower(),)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+def delete_run_checkpoint(name: str):
+    with get_connection() as conn:
+        conn.execute('DELETE FROM run_checkpoints WHERE name = ?', (name.lower(),))
+
+SPAN_METRIC_COLUMNS = (
+    "name", "trace_id", "started_at", "type", "label", "server", "model",
+    "duration_ms", "input_tokens", "output_tokens", "cost", "error",
+)
+
+def write_span_metrics(entries: list[tuple]):
+    """Write a batch of span metrics in one transaction, each a tuple in the order of SPAN_METRIC_COLUMNS"""
+    with get_connection() as conn:
+        conn.executemany(f'''
+            INSERT INTO span_metrics ({", ".join(SPAN_METRIC_COLUMNS)})
+            VALUES ({", ".join("?" * len(SPAN_METRIC_COLUMNS))})
+        ''', entries)
+
+def read_span_metrics(since: str, name: str | None = None) -> list[dict]:
+    """
+    Read the span metrics for spans that started at or after a UTC timestamp, oldest first.
+
+    Args:
+        since (str): The earliest start time to include, like 2025-06-01 14:00:00
+        name (str): Only include spans from this trader's runs
+
+    Returns:
+        list: A list of dicts keyed by SPAN_METRIC_COLUMNS
+    """
+    query = f'SELECT {", ".join(SPAN_METRIC_COLUMNS)} FROM span_metrics WHERE started_at >= ?'
+    parameters = [since]
+    if name:
+        query += ' AND name = ?'
+        parameters.append(name.lower())
+    rows = get_connection().execute(query + ' ORDER BY started_at', parameters).fetchall()
+    return [dict(zip(SPAN_METRIC_COLUMNS, row)) for row in rows]
+
+def delete_span_metrics(before: str) -> int:
+    with get_connection() as conn:
+        return conn.execute('DELETE FROM span_metrics WHERE started_at < ?', (before,)).rowcount
+
+def read_log_names() -> list[str]:
+    return [row[0] for row in get_connection().execute('SELECT DISTINCT name FROM logs ORDER BY name')]
+
+def read_log_expiry_id(name: str, before: str | None = None, keep_rows: int | None = None) -> int:
+    """
+    Find the newest log entry for a name that falls outside the retention policy.
+
+    Args:
+        name (str): The name to apply the policy to
+        before (str): Entries written before this UTC timestamp are expired
+        keep_rows (int): Entries beyond the newest keep_rows are expired
+
+    Returns:
+        int: Every entry for the name with an id up to and including this one is expired; 0 if none are
+    """
+    conn = get_connection()
+    expiry_id = 0
+    if before:
+        row = conn.execute('SELECT MAX(id) FROM logs WHERE name = ? AND datetime < ?', (name, before)).fetchone()
+        expiry_id = max(expiry_id, row[0] or 0)
+    if keep_rows is not None:
+        row = conn.execute(
+            'SELECT id FROM logs WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?', (name, keep_rows)
+        ).fetchone()
+        expiry_id = max(expiry_id, row[0] if row else 0)
+    return expiry_id
+
+def read_logs_up_to(name: str, max_id: int, limit: int) -> list[tuple]:
+    """Read the oldest entries for a name with ids up to max_id, as (id, name, datetime, type, message)"""
+    return get_connection().execute('''
+        SELECT id, name, datetime, type, message FROM logs
+        WHERE name = ? AND id <= ?
+        ORDER BY id
+        LIMIT ?
+    ''', (name, max_id, limit)).fetchall()
+
+def delete_logs(name: str, first_id: int, last_id: int) -> int:
+    with get_connection() as conn:
+        return conn.execute(
+            'DELETE FROM logs WHERE name = ? AND id BETWEEN ? AND ?', (name, first_id, last_id)
+        ).rowcount
+
+def incremental_vacuum() -> bool:
+    """
+    Return free pages to the filesystem. A database created before auto_vacuum was enabled is converted
+    with one full VACUUM; after that only the free pages are released. Returns whether a full VACUUM ran.
+    """
+    conn = get_connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+    conn.execute('PRAGMA incremental_vacuum').fetchall()
+    return False
+
+def _write_market(conn, date, data):
+    conn.execute('DELETE FROM market_prices WHERE date = ?', (date,))
+    conn.executemany(
+        'INSERT INTO market_prices (date, symbol, close) VALUES (?, ?, ?)',
+        [(date, symbol, close) for symbol, close in data.items() if close is not None],
+    )
+    conn.execute('''
+        INSERT INTO market_dates (date, symbols)
+        VALUES (?, ?)
+        ON CONFLICT(date) DO UPDATE SET symbols=excluded.symbols
+    ''', (date, len(data)))
 
 def write_market(date: str, data: dict) -> None:
-    data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    with get_connection() as conn:
+        _write_market(conn, date, data)
+
+def has_market(date: str) -> bool:
+    return get_connection().execute('SELECT 1 FROM market_dates WHERE date = ?', (date,)).fetchone() is not None
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    if not has_market(date):
+        return None
+    return dict(get_connection().execute('SELECT symbol, close FROM market_prices WHERE date = ?', (date,)))
+
+def read_market_price(date: str, symbol: str) -> float | None:
+    """Look up one symbol's close on one date with a primary key seek, without loading the rest of the market"""
+    row = get_connection().execute(
+        'SELECT close FROM market_prices WHERE date = ? AND symbol = ?', (date, symbol)
+    ).fetchone()
+    return row[0] if row else None
+
+def read_market_prices(date: str, symbols: list[str]) -> dict[str, float]:
+    """Look up several symbols' closes on one date in a single query"""
+    placeholders = ",".join("?" * len(symbols))
+    return dict(get_connection().execute(
+        f'SELECT symbol, close FROM market_prices WHERE date = ? AND symbol IN ({placeholders})', (date, *symbols)
+    ))
+
+def read_market_history(symbol: str, start: str | None = None, end: str | None = None) -> list[tuple[str, float]]:
+    """Read a symbol's (date, close) history across every stored date in a range, oldest first"""
+    return get_connection().execute('''
+        SELECT date, close FROM market_prices
+        WHERE symbol = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+    ''', (symbol, start or "0000-01-01", end or "9999-12-31")).fetchall()
+
+def read_market_range(start: str, end: str, symbols: list[str] | None = None) -> list[tuple[str, dict[str, float]]]:
+    """Read every stored date's closes in a range, optionally for just some symbols, as (date, {symbol: close}) oldest first"""
+    if symbols:
+        placeholders = ",".join("?" * len(symbols))
+        rows = get_connection().execute(f'''
+            SELECT date, symbol, close FROM market_prices
+            WHERE symbol IN ({placeholders}) AND date BETWEEN ? AND ?
+            ORDER BY date
+        ''', (*symbols, start, end))
+    else:
+        rows = get_connection().execute(
+            'SELECT date, symbol, close FROM market_prices WHERE date BETWEEN ? AND ? ORDER BY date', (start, end)
+        )
+    return [(date, {symbol: close for _, symbol, close in group}) for date, group in groupby(rows, key=lambda row: row[0])]
+
+def migrate_legacy_market() -> list[str]:
+    """Move any dates still stored as JSON blobs in the legacy market table into market_prices"""
+    conn = get_connection()
+    rows = conn.execute('SELECT date, data FROM market WHERE date NOT IN (SELECT date FROM market_dates)').fetchall()
+    for date, blob in rows:
+        with conn:
+            _write_market(conn, date, json.loads(blob))
+            conn.execute('DELETE FROM market WHERE date = ?', (date,))
+    return [date for date, _ in rows]
+
+
+migrate_legacy_market()
@@ -0,0 +1,124 @@
+"""
+One AsyncOpenAI client per LLM provider, each on its own long-lived HTTP connection pool, created on first
+use and shared by every trader and researcher. Connections are kept alive between requests and across
+trading cycles, and use HTTP/2 when the h2 package is installed, so agents reuse warm connections instead
+of paying for a new TCP and TLS handshake on each request.
+"""
+
+import importlib.util
+import os
+from collections.abc import Callable
+from functools import lru_cache
+import httpx
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+GROK_BASE_URL = "https://api.x.ai/v1"
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# The base URL and API key variable for each provider that rate_limits.provider_for can name
+PROVIDERS = {
+    "openai": (OPENAI_BASE_URL, "OPENAI_API_KEY"),
+    "openrouter": (OPENROUTER_BASE_URL, "OPENROUTER_API_KEY"),
+    "deepseek": (DEEPSEEK_BASE_URL, "DEEPSEEK_API_KEY"),
+    "grok": (GROK_BASE_URL, "GROK_API_KEY"),
+    "gemini": (GEMINI_BASE_URL, "GOOGLE_API_KEY"),
+}
+
+# Pool sizing per provider; idle connections are kept long enough to survive the gap between agent turns
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "300"))
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ConnectionStats:
+    """Counts requests against new connections and TLS handshakes using httpcore's trace events"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def stats(self) -> dict:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused": reused,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+        }
+
+
+connection_stats: dict[str, ConnectionStats] = {}
+# Caches elsewhere whose entries hold one of our clients, cleared along with the clients
+dependent_caches = []
+
+
+@lru_cache(maxsize=None)
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """The shared connection pool for one base URL"""
+    stats = connection_stats.setdefault(base_url, ConnectionStats())
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+        ),
+        event_hooks={"request": [stats.on_request]},
+    )
+
+
+@lru_cache(maxsize=None)
+def get_client(provider: str) -> AsyncOpenAI:
+    """The shared AsyncOpenAI client for a provider, on that provider's connection pool"""
+    base_url, api_key_variable = PROVIDERS[provider]
+    return AsyncOpenAI(base_url=base_url, api_key=os.getenv(api_key_variable), http_client=get_http_client(base_url))
+
+
+def cached_with_clients(function: Callable) -> Callable:
+    """Like lru_cache, for a function whose results hold a client: close_clients clears its cache too"""
+    cached = lru_cache(maxsize=None)(function)
+    dependent_caches.append(cached)
+    return cached
+
+
+async def close_clients():
+    for client in [get_http_client(base_url) for base_url in connection_stats]:
+        await client.aclose()
+    get_http_client.cache_clear()
+    get_client.cache_clear()
+    for cache in dependent_caches:
+        cache.cache_clear()
+    connection_stats.clear()
+
+
+def stats() -> dict[str, dict]:
+    return {base_url: stats.stats() for base_url, stats in connection_stats.items()}
+
+
+def report() -> str:
+    lines = [f"LLM connection pools (HTTP/{'2' if HTTP2_AVAILABLE else '1.1'})"]
+    for base_url, pool in stats().items():
+        lines.append(
+            f"  {base_url}: {pool['requests']} requests over {pool['connections']} connections, "
+            f"{pool['tls_handshakes']} TLS handshakes, {pool['reuse_ratio']:.0%} reused"
+        )
+    return "\n".join(lines)
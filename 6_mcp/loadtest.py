@@ -0,0 +1,358 @@
+"""
+Load test the trading floor without spending any OpenAI, Polygon, Brave or Pushover quota.
+
+Each run starts a local stub that speaks the OpenAI chat completions API, scripting every trader through
+looking up a price, trading and sending a push notification, with a configurable response latency; the
+same stub receives the push notifications. With POLYGON_API_KEY empty, the market server prices shares
+without calling Polygon, and researchers get no servers, so nothing leaves the machine. Traders run in
+the real fleet, scheduler and MCP servers against a scratch database, one process per trader count:
+
+    uv run loadtest.py --traders 4 20 50 200 --cycles 2 --latency 0.5
+
+With --crash-check, it instead kills a trader's process part way through its run, restarts it, and checks that
+the resumed run picks up from its checkpoint without repeating any tool call that had completed.
+
+Note that values in .env override these settings, so run it where .env sets no POLYGON_* or PUSHOVER_* keys.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import tempfile
+import threading
+import time
+
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 18100
+CRASH_EXIT_CODE = 17
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "SPY"]
+
+
+def _next_action(messages: list[dict]) -> tuple[str, dict] | None:
+    """The scripted tool call for the next turn of a trader's run, or None when it should reply and finish"""
+    name = re.search(r"Your account is under your name, (\w+)", messages[0]["content"] or "").group(1)
+    rebalancing = "decide if you need to rebalance" in next(m["content"] for m in messages if m["role"] == "user")
+    results = [m["content"] for m in messages if m["role"] == "tool"]
+    symbol = SYMBOLS[hash(name) % len(SYMBOLS)]
+    if rebalancing:
+        if not results:
+            return "get_holdings", {"name": name}
+        if len(results) == 1:
+            try:
+                holdings = json.loads(results[0])
+                # MCP tool output arrives as a serialized content item wrapping the tool's own JSON
+                held = list(json.loads(holdings["text"]) if "text" in holdings else holdings)
+            except (TypeError, ValueError):
+                held = []
+            if held:
+                return "sell_shares", {"name": name, "symbol": held[0], "quantity": 1, "rationale": "load test"}
+            return "push", {"args": {"message": f"{name} had nothing to rebalance"}}
+        if len(results) == 2:
+            return "push", {"args": {"message": f"{name} rebalanced"}}
+        return None
+    script = [
+        ("lookup_share_price", {"symbol": symbol}),
+        ("buy_shares", {"name": name, "symbol": symbol, "quantity": random.randint(1, 3), "rationale": "load test"}),
+        ("push", {"args": {"message": f"{name} bought {symbol}"}}),
+    ]
+    return script[len(results)] if len(results) < len(script) else None
+
+
+def stub_app(
+    latency: float, crash_after: int | None = None, issued_file: str | None = None, prefill_seconds: float = 0.0
+):
+    """
+    The stub LLM and Pushover server. With crash_after, the whole process exits when a trader's run has
+    that many tool results, as if it had crashed; issued_file gets a line for every tool call it issues.
+    prefill_seconds is added to each response's latency for every 1,000 prompt tokens, as a model takes
+    longer to read a longer prompt.
+    """
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    ids = itertools.count()
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        await asyncio.sleep(random.uniform(0.5, 1.5) * latency + prompt_tokens / 1000 * prefill_seconds)
+        if crash_after is not None and sum(m["role"] == "tool" for m in body["messages"]) >= crash_after:
+            os._exit(CRASH_EXIT_CODE)
+        action = _next_action(body["messages"])
+        if action:
+            tool_name, arguments = action
+            if issued_file:
+                with open(issued_file, "a") as issued:
+                    issued.write(f"{tool_name}\n")
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{next(ids)}",
+                    "type": "function",
+                    "function": {"name": tool_name, "arguments": json.dumps(arguments)},
+                }],
+            }
+        else:
+            message = {"role": "assistant", "content": "Trades complete; the portfolio is in line with my strategy."}
+        return JSONResponse({
+            "id": f"chatcmpl-{next(ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if action else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20},
+        })
+
+    async def pushover(request: Request):
+        return JSONResponse({"status": 1})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/pushover", pushover, methods=["POST"]),
+    ])
+
+
+def start_stub(latency: float, port: int, **options):
+    """Serve the stub from a thread with its own event loop, so it doesn't compete with the traders' loop"""
+    import uvicorn
+
+    app = stub_app(latency, **options)
+    server = uvicorn.Server(uvicorn.Config(app, host=STUB_HOST, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def _process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and all its descendants, from /proc"""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                total_kb += next((int(line.split()[1]) for line in status if line.startswith("VmRSS:")), 0)
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pending += [int(child) for child in children.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total_kb / 1024
+
+
+async def _sample_rss(peak: dict, interval: float = 0.5):
+    if not os.path.exists("/proc"):
+        return
+    while True:
+        peak["tree_mb"] = max(peak["tree_mb"], _process_tree_rss_mb(os.getpid()))
+        await asyncio.sleep(interval)
+
+
+def _write_counts() -> dict[str, int]:
+    from database import get_connection
+
+    conn = get_connection()
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("transactions", "logs", "span_metrics", "portfolio_snapshots")
+    }
+    counts["account_writes"] = conn.execute("SELECT COALESCE(SUM(version), 0) FROM account_info").fetchone()[0]
+    return counts
+
+
+async def _run_floor(traders: int, cycles: int, concurrency: int) -> dict:
+    from agents import set_default_openai_api, set_trace_processors
+    from traders import Trader
+    from tracers import LogTracer, MetricsTracer
+    from log_writer import log_writer
+    from span_metrics import metrics_writer, summarize
+    from database import read_span_metrics
+    from mcp_fleet import MCPServerFleet
+    from scheduler import TraderScheduler
+    from trading_floor import run_trading_cycle
+    from accounts_client import accounts_pool
+    import llm_clients
+
+    set_default_openai_api("chat_completions")
+    set_trace_processors([LogTracer(), MetricsTracer()])
+    floor = [Trader(f"Load{i:03d}", "Tester", "gpt-4o-mini") for i in range(traders)]
+    fleet = MCPServerFleet([trader.name for trader in floor], research=False)
+    scheduler = TraderScheduler(max_concurrency=concurrency, jitter_seconds=0)
+    peak = {"tree_mb": 0.0}
+    sampler = asyncio.create_task(_sample_rss(peak))
+    before = _write_counts()
+    cycle_seconds = []
+    try:
+        await fleet.start()
+        for _ in range(cycles):
+            start = time.perf_counter()
+            await run_trading_cycle(floor, fleet, scheduler)
+            cycle_seconds.append(time.perf_counter() - start)
+        log_writer.flush()
+        metrics_writer.flush()
+        after = _write_counts()
+        spawns = sum(server.starts for server in fleet.servers) + accounts_pool.stats()["starts"]
+        return {
+            "traders": traders,
+            "cycle_seconds": cycle_seconds,
+            "tools": fleet.tool_stats(),
+            "writes": {table: after[table] - before[table] for table in after},
+            "spawns": spawns,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "peak_tree_rss_mb": peak["tree_mb"],
+            "llm": llm_clients.stats(),
+            "models": summarize(read_span_metrics("0000-01-01 00:00:00"))["models"],
+        }
+    finally:
+        sampler.cancel()
+        await fleet.close()
+        await accounts_pool.close()
+        await llm_clients.close_clients()
+
+
+def _stub_environment(db: str, port: int):
+    os.environ.update({
+        "ACCOUNTS_DB": db,
+        "OPENAI_BASE_URL": f"http://{STUB_HOST}:{port}/v1",
+        "OPENAI_API_KEY": "loadtest",
+        "PUSHOVER_URL": f"http://{STUB_HOST}:{port}/pushover",
+        "POLYGON_API_KEY": "",
+        "POLYGON_PLAN": "",
+        "RATE_LIMIT_OPENAI_RPM": "1000000",
+        "RATE_LIMIT_OPENAI_TPM": "1000000000",
+    })
+
+
+def _run(db: str, port: int, traders: int, cycles: int, concurrency: int, latency: float, results) -> None:
+    _stub_environment(db, port)
+    server, thread = start_stub(latency, port)
+    try:
+        results.put(asyncio.run(_run_floor(traders, cycles, concurrency or traders)))
+    except Exception as e:
+        results.put({"traders": traders, "error": repr(e)})
+        raise
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def _run_one_trader() -> int:
+    from agents import set_default_openai_api, set_tracing_disabled
+    from traders import Trader
+    from mcp_fleet import MCPServerFleet
+    from accounts_client import accounts_pool
+    from database import count_transactions
+    import llm_clients
+
+    set_default_openai_api("chat_completions")
+    set_tracing_disabled(True)
+    trader = Trader("Crash", "Tester", "gpt-4o-mini")
+    fleet = MCPServerFleet([trader.name], research=False)
+    try:
+        await fleet.start()
+        await trader.run(fleet)
+        return count_transactions(trader.name)
+    finally:
+        await fleet.close()
+        await accounts_pool.close()
+        await llm_clients.close_clients()
+
+
+def _run_crashing(db: str, port: int, crash_after: int | None, issued_file: str, results) -> None:
+    _stub_environment(db, port)
+    server, thread = start_stub(0.05, port, crash_after=crash_after, issued_file=issued_file)
+    try:
+        results.put({"transactions": asyncio.run(_run_one_trader())})
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def crash_check(port: int, crash_after: int) -> bool:
+    """Kill a trader's run after crash_after tool results, run it again, and check nothing was repeated"""
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        db, issued_file = os.path.join(tmp, "crash.db"), os.path.join(tmp, "issued.txt")
+        queue = ctx.Queue()
+        crashed = ctx.Process(target=_run_crashing, args=(db, port, crash_after, issued_file, queue))
+        crashed.start()
+        crashed.join()
+        with open(issued_file) as issued:
+            before = issued.read().split()
+        resumed = ctx.Process(target=_run_crashing, args=(db, port, None, issued_file, queue))
+        resumed.start()
+        result = queue.get()
+        resumed.join()
+        with open(issued_file) as issued:
+            after = issued.read().split()[len(before):]
+    print(f"crashed run: exit code {crashed.exitcode}, issued {', '.join(before)}")
+    print(f"resumed run: issued {', '.join(after) or 'nothing'}, {result['transactions']} transactions in the ledger")
+    passed = (
+        crashed.exitcode == CRASH_EXIT_CODE
+        and len(before) == crash_after
+        and not set(before) & set(after)
+        and result["transactions"] == 1
+    )
+    print("PASS: the resumed run repeated no completed tool call" if passed else "FAIL")
+    return passed
+
+
+def report(result: dict) -> str:
+    if "error" in result:
+        return f"{result['traders']} traders: failed with {result['error']}"
+    cycles = result["cycle_seconds"]
+    lines = [
+        f"{result['traders']} traders: cycle wall time {sum(cycles) / len(cycles):.1f}s mean, {max(cycles):.1f}s max",
+        f"  SQLite writes: {', '.join(f'{count} {table}' for table, count in result['writes'].items())}",
+        f"  subprocesses spawned: {result['spawns']}",
+        f"  peak RSS: {result['peak_rss_mb']:.0f} MB trading floor, {result['peak_tree_rss_mb']:.0f} MB with MCP servers",
+    ]
+    for model, stats in result["models"].items():
+        lines.append(
+            f"  {model:>20}: {stats['calls']:5} LLM calls {stats['p50_ms']:8.1f}ms p50 {stats['p95_ms']:8.1f}ms p95, "
+            f"{stats['input_tokens']:,} in {stats['output_tokens']:,} out tokens, ${stats['cost']:.4f}"
+        )
+    for tool, stats in sorted(result["tools"].items()):
+        lines.append(
+            f"  {tool:>20}: {stats['calls']:5} calls {stats['mean_ms']:8.1f}ms mean "
+            f"{stats['p95_ms']:8.1f}ms p95 {stats['max_ms']:8.1f}ms max"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the trading floor against a local stub LLM and market")
+    parser.add_argument("--traders", type=int, nargs="+", default=[4, 20], help="trader counts to run, one run each")
+    parser.add_argument("--cycles", type=int, default=2, help="trading cycles per run")
+    parser.add_argument("--concurrency", type=int, default=0, help="traders running at once; 0 runs them all")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean stub LLM response time in seconds")
+    parser.add_argument("--port", type=int, default=STUB_PORT)
+    parser.add_argument(
+        "--crash-check", type=int, metavar="N", help="kill a trader after N tool results and check its resumed run"
+    )
+    args = parser.parse_args()
+    if args.crash_check:
+        raise SystemExit(0 if crash_check(args.port, args.crash_check) else 1)
+    ctx = multiprocessing.get_context("spawn")
+    for traders in args.traders:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = ctx.Queue()
+            process = ctx.Process(
+                target=_run,
+                args=(os.path.join(tmp, "loadtest.db"), args.port, traders, args.cycles, args.concurrency, args.latency, queue),
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+            print(report(result))
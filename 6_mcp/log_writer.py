@@ -0,0 +1,136 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from database import write_logs
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "0.5"))
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Writes log entries to the database from a background thread, so callers on the asyncio event loop
+    never wait on disk. Entries go into a bounded queue and are written with executemany whenever
+    a batch fills up or the flush interval passes. When the queue is full, entries are dropped and
+    counted, unless block is set, in which case the caller waits for room. Other tables can be batched
+    the same way by passing the function that writes a batch of their rows and queueing rows with put.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_seconds: float = LOG_FLUSH_SECONDS,
+        block: bool = False,
+        write_batch: Callable[[list[tuple]], None] = write_logs,
+    ):
+        self.write_batch = write_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.block = block
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start the background thread, or start a new one if it has died"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, name: str, type: str, message: str) -> bool:
+        """Queue a log entry, stamped now; returns False if it was dropped because the queue is full"""
+        return self.put((name, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), type, message))
+
+    def put(self, entry: tuple) -> bool:
+        """Queue a row for write_batch; returns False if it was dropped because the queue is full"""
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        try:
+            self.queue.put(entry, block=self.block)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every entry queued so far has been written; returns False if that took over timeout"""
+        if self._thread is None and self.queue.empty():
+            return True
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 5.0):
+        """Write everything still queued and stop the background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            self.write_batch(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            # Any failure costs only this batch; the thread carries on with the next
+            self.failed += len(batch)
+            print(f"Was not able to write {len(batch)} entries due to {e}")
+
+    def _run(self):
+        while True:
+            batch = []
+            markers = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if item is _STOP or isinstance(item, threading.Event):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for marker in markers:
+                if marker is _STOP:
+                    return
+                marker.set()
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.close)
@@ -1,9 +1,12 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
 import os
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 import random
-from database import write_market, read_market
+from database import write_market, has_market, read_market_price, read_market_prices
 from functools import lru_cache
 from datetime import timezone
 
@@ -15,16 +18,163 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# How long a looked-up price stays fresh: end of day prices until the date changes, the paid plan's
+# 15 minute delayed snapshot for a minute, and realtime prices for a few seconds
+if is_realtime_polygon:
+    PRICE_CACHE_SECONDS = float(os.getenv("PRICE_CACHE_SECONDS", "5"))
+elif is_paid_polygon:
+    PRICE_CACHE_SECONDS = float(os.getenv("PRICE_CACHE_SECONDS", "60"))
+else:
+    PRICE_CACHE_SECONDS = None
+# A symbol with no price, looked up as 0.0, is looked up again after this long instead of when a price would
+# expire, so a typo or a symbol missing from the day's closes doesn't read as 0.0 until midnight
+PRICE_MISS_CACHE_SECONDS = float(os.getenv("PRICE_MISS_CACHE_SECONDS", "60"))
+
+
+class PriceCache:
+    """
+    A process-wide cache of share prices. Entries expire after ttl_seconds, or at midnight when ttl_seconds
+    is None, except that symbols without a price expire after miss_ttl_seconds. Concurrent lookups of the
+    same symbol are coalesced so only one of them calls the loader.
+    """
+
+    def __init__(self, ttl_seconds: float | None, miss_ttl_seconds: float = PRICE_MISS_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.unknown = 0
+        self._entries: dict[str, tuple[float, float]] = {}
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _expires_at(self, price: float) -> float:
+        if not price:
+            self.unknown += 1
+            return time.time() + self.miss_ttl_seconds
+        if self.ttl_seconds is not None:
+            return time.time() + self.ttl_seconds
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    def get(self, symbol: str, loader) -> float:
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry and entry[1] > time.time():
+                self.hits += 1
+                return entry[0]
+            future = self._inflight.get(symbol)
+            leader = future is None
+            if leader:
+                future = self._inflight[symbol] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            price = loader(symbol)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[symbol]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[symbol] = (price, self._expires_at(price))
+            del self._inflight[symbol]
+        future.set_result(price)
+        return price
+
+    def get_many(self, symbols: list[str], loader) -> dict[str, float]:
+        """
+        Like get, for a basket: every symbol that is neither cached nor already being looked up
+        is passed to one call of loader, which takes a list of symbols and returns a dict of prices.
+        """
+        prices = {}
+        waiting = {}
+        mine = {}
+        with self._lock:
+            now = time.time()
+            for symbol in dict.fromkeys(symbols):
+                entry = self._entries.get(symbol)
+                if entry and entry[1] > now:
+                    self.hits += 1
+                    prices[symbol] = entry[0]
+                elif symbol in self._inflight:
+                    self.coalesced += 1
+                    waiting[symbol] = self._inflight[symbol]
+                else:
+                    self.misses += 1
+                    mine[symbol] = self._inflight[symbol] = Future()
+        if mine:
+            try:
+                loaded = loader(list(mine))
+            except Exception as e:
+                with self._lock:
+                    self.errors += len(mine)
+                    for symbol in mine:
+                        del self._inflight[symbol]
+                for future in mine.values():
+                    future.set_exception(e)
+                raise
+            with self._lock:
+                for symbol in mine:
+                    price = loaded.get(symbol, 0.0)
+                    self._entries[symbol] = (price, self._expires_at(price))
+                    del self._inflight[symbol]
+            for symbol, future in mine.items():
+                prices[symbol] = loaded.get(symbol, 0.0)
+                future.set_result(prices[symbol])
+        for symbol, future in waiting.items():
+            prices[symbol] = future.result()
+        return prices
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "unknown": self.unknown,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (
+            f"Price cache: {stats['entries']} prices, {stats['hit_rate']:.0%} of lookups served from the cache "
+            f"({stats['hits']} hits, {stats['coalesced']} coalesced, {stats['misses']} loaded), "
+            f"{stats['unknown']} without a price, {stats['errors']} errors"
+        )
+
+
+price_cache = PriceCache(PRICE_CACHE_SECONDS)
+
+
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    """One Polygon client per process, so its HTTP connection pool is reused across lookups"""
+    return RESTClient(polygon_api_key)
+
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
+    client = get_client()
     market_status = client.get_market_status()
     return market_status.market == "open"
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -34,28 +184,38 @@ def get_all_share_prices_polygon_eod() -> dict[str, float]:
 
 
 @lru_cache(maxsize=2)
-def get_market_for_prior_date(today):
-    market_data = read_market(today)
-    if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
-    return market_data
+def load_market_for_prior_date(today) -> None:
+    if not has_market(today):
+        write_market(today, get_all_share_prices_polygon_eod())
 
 
 def get_share_price_polygon_eod(symbol) -> float:
     today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    load_market_for_prior_date(today)
+    return read_market_price(today, symbol) or 0.0
+
+
+def get_share_prices_polygon_eod(symbols: list[str]) -> dict[str, float]:
+    today = datetime.now().date().strftime("%Y-%m-%d")
+    load_market_for_prior_date(today)
+    return read_market_prices(today, symbols)
 
 
 def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
+    client = get_client()
     result = client.get_snapshot_ticker("stocks", symbol)
     return result.min.close or result.prev_day.close
 
 
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    """One snapshot request for the whole basket"""
+    client = get_client()
+    results = client.get_snapshot_all("stocks", tickers=symbols)
+    return {result.ticker: (result.min.close or result.prev_day.close) for result in results}
+
+
 def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
+    if is_paid_polygon or is_realtime_polygon:
         return get_share_price_polygon_min(symbol)
     else:
         return get_share_price_polygon_eod(symbol)
@@ -64,7 +224,26 @@ def get_share_price_polygon(symbol) -> float:
 def get_share_price(symbol) -> float:
     if polygon_api_key:
         try:
-            return get_share_price_polygon(symbol)
+            return price_cache.get(symbol, get_share_price_polygon)
         except Exception as e:
             print(f"Was not able to use the polygon API due to {e}; using a random number")
     return float(random.randint(1, 100))
+
+
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    if is_paid_polygon or is_realtime_polygon:
+        return get_share_prices_polygon_min(symbols)
+    else:
+        return get_share_prices_polygon_eod(symbols)
+
+
+def get_share_prices(symbols: list[str]) -> dict[str, float]:
+    """Price a basket of symbols with at most one cache fill or API round trip; unknown symbols are 0.0"""
+    if not symbols:
+        return {}
+    if polygon_api_key:
+        try:
+            return price_cache.get_many(symbols, get_share_prices_polygon)
+        except Exception as e:
+            print(f"Was not able to use the polygon API due to {e}; using random numbers")
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
@@ -1,5 +1,8 @@
+import asyncio
+import json
 from mcp.server.fastmcp import FastMCP
-from market import get_share_price
+from util import serve
+from market import get_share_price, get_share_prices, price_cache
 
 mcp = FastMCP("market_server")
 
@@ -10,7 +13,23 @@ async def lookup_share_price(symbol: str) -> float:
     Args:
         symbol: the symbol of the stock
     """
-    return get_share_price(symbol)
+    # Off the event loop, so concurrent lookups of the same symbol share one upstream call
+    return await asyncio.to_thread(get_share_price, symbol)
+
+@mcp.tool()
+async def lookup_share_prices(symbols: list[str]) -> dict[str, float]:
+    """This tool provides the current prices of several stock symbols in one call.
+    Use it instead of repeated lookup_share_price calls when you need prices for a basket of stocks.
+
+    Args:
+        symbols: the symbols of the stocks
+    """
+    return await asyncio.to_thread(get_share_prices, symbols)
+
+@mcp.resource("market://price_cache")
+async def read_price_cache_resource() -> str:
+    """Hit, miss and unknown-symbol counts for this server's price cache"""
+    return json.dumps(price_cache.stats())
 
 if __name__ == "__main__":
-    mcp.run(transport='stdio')
\ No newline at end of file
+    serve(mcp)
\ No newline at end of file
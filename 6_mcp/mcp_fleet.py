@@ -0,0 +1,219 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from agents.mcp import MCPServerStdio, MCPServerStreamableHttp
+from mcp_params import (
+    is_read_only_tool,
+    is_server_failure,
+    trader_mcp_server_params,
+    researcher_shared_mcp_server_params,
+    researcher_memory_mcp_server_params,
+)
+
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+# Latest call durations kept per tool for the latency percentiles
+TOOL_LATENCY_SAMPLES = 1000
+
+
+class FleetServerMixin:
+    """
+    An MCP server connection that stays up across trading cycles and is shared by every agent that uses it.
+    The transport is opened and closed by one owner task, as anyio requires, so any trader's task can ask
+    for a restart. Tool calls are timed and counted. A call to a server found dead restarts it first; a call
+    that fails because the server died or stopped answering restarts it too, and is retried once if the tool
+    only reads.
+    """
+
+    def __init__(self, params, name: str):
+        super().__init__(
+            params, cache_tools_list=True, name=name, client_session_timeout_seconds=CLIENT_SESSION_TIMEOUT_SECONDS
+        )
+        self.calls = 0
+        self.errors = 0
+        self.starts = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.tool_seconds: dict[str, deque] = defaultdict(lambda: deque(maxlen=TOOL_LATENCY_SAMPLES))
+        self._owner = None
+        self._stop = None
+        self._restart_lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._owner is not None and not self._owner.done()
+
+    async def healthy(self) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), HEALTH_CHECK_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def start(self):
+        ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._owner = asyncio.create_task(self._own(ready))
+        self.starts += 1
+        await ready.wait()
+        if self.session is None:
+            raise ConnectionError(f"MCP server {self.name} failed to start")
+
+    async def _own(self, ready: asyncio.Event):
+        try:
+            await self.connect()
+            ready.set()
+            await self._stop.wait()
+        except Exception as e:
+            print(f"MCP server {self.name} stopped due to {e}")
+        finally:
+            ready.set()
+            await self.cleanup()
+
+    async def stop(self):
+        if self._owner is not None:
+            self._stop.set()
+            await self._owner
+            self._owner = None
+
+    async def restart(self, dead_session=None):
+        """Restart the server, unless another caller already replaced the session that failed"""
+        async with self._restart_lock:
+            if dead_session is not None and self.session is not dead_session and self.alive:
+                return
+            self.restarts += 1
+            await self.stop()
+            self.invalidate_tools_cache()
+            await self.start()
+
+    async def list_tools(self):
+        if not self.alive:
+            await self.restart(self.session)
+        return await super().list_tools()
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            if not self.alive:
+                await self.restart(self.session)
+            try:
+                return await super().call_tool(tool_name, arguments)
+            except Exception as e:
+                # A hung or dead server is restarted; the tool's own errors go back to the agent as they are
+                if not is_server_failure(e):
+                    raise
+                await self.restart(self.session)
+                # A write like buy_shares may have gone through before the server died, so it isn't repeated
+                if not is_read_only_tool(tool_name):
+                    raise
+                return await super().call_tool(tool_name, arguments)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.tool_seconds[tool_name].append(elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "mean_ms": 1000 * self.total_seconds / self.calls if self.calls else 0.0,
+            "max_ms": 1000 * self.max_seconds,
+        }
+
+    def tool_stats(self) -> dict[str, dict]:
+        stats = {}
+        for tool_name, samples in self.tool_seconds.items():
+            ordered = sorted(samples)
+            stats[tool_name] = {
+                "calls": len(ordered),
+                "mean_ms": 1000 * sum(ordered) / len(ordered),
+                "p95_ms": 1000 * ordered[int(len(ordered) * 0.95)],
+                "max_ms": 1000 * ordered[-1],
+            }
+        return stats
+
+
+class FleetServer(FleetServerMixin, MCPServerStdio):
+    pass
+
+
+class FleetHttpServer(FleetServerMixin, MCPServerStreamableHttp):
+    pass
+
+
+def fleet_server(params, name: str | None = None) -> FleetServerMixin:
+    """A fleet server over streamable HTTP for params with a url, otherwise a child process over stdio"""
+    if "url" in params:
+        return FleetHttpServer(params, name or params["url"])
+    return FleetServer(params, name or " ".join([params["command"], *params.get("args", [])])[-40:])
+
+
+class MCPServerFleet:
+    """
+    The long-lived MCP servers for the whole trading floor. Accounts, push, market, fetch and search are
+    stateless, so one of each serves every trader; each trader keeps its own warm memory server.
+    """
+
+    def __init__(self, trader_names: list[str], research: bool = True):
+        self.trader = [fleet_server(params) for params in trader_mcp_server_params]
+        # Without research, researchers get no servers and the fetch, search and memory servers aren't started
+        self.researcher = (
+            [fleet_server(params) for params in researcher_shared_mcp_server_params] if research else []
+        )
+        self.memory = {
+            name: fleet_server(researcher_memory_mcp_server_params(name), f"memory {name}")
+            for name in (trader_names if research else [])
+        }
+
+    @property
+    def servers(self) -> list[FleetServerMixin]:
+        return self.trader + self.researcher + list(self.memory.values())
+
+    async def start(self):
+        """Start every server; any that fail are retried by the next health_check"""
+        results = await asyncio.gather(*[server.start() for server in self.servers], return_exceptions=True)
+        for server, result in zip(self.servers, results):
+            if isinstance(result, Exception):
+                print(f"MCP server {server.name} failed to start: {result}")
+
+    async def health_check(self):
+        """Ping every server and restart any that have died since the last cycle"""
+        healthy = await asyncio.gather(*[server.healthy() for server in self.servers])
+        dead = [server for server, ok in zip(self.servers, healthy) if not ok]
+        results = await asyncio.gather(*[server.restart() for server in dead], return_exceptions=True)
+        for server, result in zip(dead, results):
+            if isinstance(result, Exception):
+                print(f"MCP server {server.name} failed to restart: {result}")
+
+    async def close(self):
+        await asyncio.gather(*[server.stop() for server in self.servers], return_exceptions=True)
+
+    def trader_servers(self) -> list[FleetServerMixin]:
+        return self.trader
+
+    def researcher_servers(self, name: str) -> list[FleetServerMixin]:
+        return self.researcher + ([self.memory[name]] if name in self.memory else [])
+
+    def stats(self) -> dict[str, dict]:
+        return {server.name: server.stats() for server in self.servers}
+
+    def tool_stats(self) -> dict[str, dict]:
+        return {tool: stats for server in self.servers for tool, stats in server.tool_stats().items()}
+
+    def report(self) -> str:
+        lines = [
+            f"{name:>40}: {s['calls']:5} calls {s['errors']:3} errors {s['restarts']:2} restarts "
+            f"{s['mean_ms']:8.1f}ms mean {s['max_ms']:8.1f}ms max"
+            for name, s in self.stats().items()
+        ]
+        return "\n".join(lines)
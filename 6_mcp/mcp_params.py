@@ -1,12 +1,50 @@
 import os
+import httpx
 from dotenv import load_dotenv
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
 from market import is_paid_polygon, is_realtime_polygon
+from util import mcp_url
 
 load_dotenv(override=True)
 
+# With MCP_TRANSPORT=streamable-http, traders connect to our own servers already running over HTTP
+# (start each with --transport streamable-http) instead of spawning a child process per client
+use_http_servers = os.getenv("MCP_TRANSPORT", "stdio") == "streamable-http"
+
 brave_env = {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY")}
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 
+# MCP child processes only inherit a minimal environment, so pass on the settings our own servers read,
+# keeping them on the same database, market data and push target as the trading floor that spawns them
+SERVER_ENV_VARS = [
+    "ACCOUNTS_DB", "POLYGON_API_KEY", "POLYGON_PLAN", "PUSHOVER_URL", "PUSHOVER_USER", "PUSHOVER_TOKEN", "PUSH_SINK_FILE"
+]
+server_env = {name: os.environ[name] for name in SERVER_ENV_VARS if name in os.environ}
+
+# Tools that only read, so a call that failed because its server died can be repeated on a fresh server.
+# Any other tool, like buy_shares or create_entities, may have taken effect before the connection dropped,
+# so its failure is raised rather than risk doing it twice. The prefixes cover our own servers' reads and
+# those of the Polygon, Brave Search and Memory servers.
+READ_ONLY_TOOL_PREFIXES = ("get_", "list_", "lookup_", "search_", "read_", "open_")
+READ_ONLY_TOOLS = {"fetch", "brave_web_search", "brave_local_search"}
+
+
+def is_read_only_tool(tool_name: str) -> bool:
+    return tool_name in READ_ONLY_TOOLS or tool_name.startswith(READ_ONLY_TOOL_PREFIXES)
+
+
+# The McpError codes the client session raises itself when a server stops answering or its connection drops;
+# any other McpError is the server's own answer, like an unknown tool or invalid arguments
+SERVER_FAILURE_CODES = {httpx.codes.REQUEST_TIMEOUT, CONNECTION_CLOSED}
+
+
+def is_server_failure(error: Exception) -> bool:
+    """Whether an error from an MCP request means the server is hung or dead and should be restarted"""
+    if isinstance(error, McpError):
+        return error.error.code in SERVER_FAILURE_CODES
+    return True
+
 # The MCP server for the Trader to read Market Data
 
 if is_paid_polygon or is_realtime_polygon:
@@ -15,32 +53,47 @@ if is_paid_polygon or is_realtime_polygon:
         "args": ["--from", "git+https://github.com/polygon-io/mcp_polygon@v0.1.0", "mcp_polygon"],
         "env": {"POLYGON_API_KEY": polygon_api_key},
     }
+elif use_http_servers:
+    market_mcp = {"url": mcp_url("market_server")}
 else:
-    market_mcp = {"command": "uv", "args": ["run", "market_server.py"]}
+    market_mcp = {"command": "uv", "args": ["run", "market_server.py"], "env": server_env}
 
 
 # The full set of MCP servers for the trader: Accounts, Push Notification and the Market
 
-trader_mcp_server_params = [
-    {"command": "uv", "args": ["run", "accounts_server.py"]},
-    {"command": "uv", "args": ["run", "push_server.py"]},
-    market_mcp,
-]
+if use_http_servers:
+    trader_mcp_server_params = [
+        {"url": mcp_url("accounts_server")},
+        {"url": mcp_url("push_server")},
+        market_mcp,
+    ]
+else:
+    trader_mcp_server_params = [
+        {"command": "uv", "args": ["run", "accounts_server.py"], "env": server_env},
+        {"command": "uv", "args": ["run", "push_server.py"], "env": server_env},
+        market_mcp,
+    ]
 
 # The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
+# Fetch and Brave Search are stateless and can be shared; each trader has its own Memory
+
+researcher_shared_mcp_server_params = [
+    {"command": "uvx", "args": ["mcp-server-fetch"]},
+    {
+        "command": "npx",
+        "args": ["-y", "@modelcontextprotocol/server-brave-search"],
+        "env": brave_env,
+    },
+]
+
+
+def researcher_memory_mcp_server_params(name: str):
+    return {
+        "command": "npx",
+        "args": ["-y", "mcp-memory-libsql"],
+        "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
+    }
 
 
 def researcher_mcp_server_params(name: str):
-    return [
-        {"command": "uvx", "args": ["mcp-server-fetch"]},
-        {
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": brave_env,
-        },
-        {
-            "command": "npx",
-            "args": ["-y", "mcp-memory-libsql"],
-            "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
-        },
-    ]
+    return researcher_shared_mcp_server_params + [researcher_memory_mcp_server_params(name)]
@@ -0,0 +1,41 @@
+import argparse
+from database import DB, migrate_legacy_accounts, read_account_names
+
+
+def migrate(drop_legacy: bool):
+    migrated = migrate_legacy_accounts(drop_legacy=drop_legacy)
+    if migrated:
+        print(f"Migrated {len(migrated)} accounts in {DB}: {', '.join(migrated)}")
+    else:
+        print(f"No legacy accounts left to migrate in {DB}")
+
+
+def verify(rebuild: bool):
+    from accounts import Account
+
+    for name in read_account_names():
+        account = Account.get(name)
+        if account.verify_aggregates():
+            print(f"{name}: running aggregates match the ledger")
+        elif rebuild:
+            account.rebuild_aggregates()
+            print(f"{name}: running aggregates drifted from the ledger and were rebuilt")
+        else:
+            print(f"{name}: running aggregates drifted from the ledger, rerun with --rebuild to fix")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert JSON accounts into the transactions, holdings and portfolio_snapshots tables"
+    )
+    parser.add_argument(
+        "--drop-legacy", action="store_true", help="delete the legacy JSON rows once they are migrated"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="check each account's running P&L aggregates against its ledger"
+    )
+    parser.add_argument("--rebuild", action="store_true", help="with --verify, rebuild any aggregates that drifted")
+    args = parser.parse_args()
+    migrate(args.drop_legacy)
+    if args.verify:
+        verify(args.rebuild)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import time
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+PUSHOVER_URL = os.getenv("PUSHOVER_URL", "https://api.pushover.net/1/messages.json")
+# Messages arriving within this many seconds of the first are sent together as one digest
+PUSH_WINDOW_SECONDS = float(os.getenv("PUSH_WINDOW_SECONDS", "2"))
+# At most one delivery per destination in this many seconds
+PUSH_MIN_INTERVAL_SECONDS = float(os.getenv("PUSH_MIN_INTERVAL_SECONDS", "5"))
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "1000"))
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "5"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "1"))
+# When set, deliveries are appended to this file as JSON lines instead of being sent, e.g. for tests
+PUSH_SINK_FILE = os.getenv("PUSH_SINK_FILE")
+# Pushover rejects messages longer than this
+MAX_MESSAGE_LENGTH = 1024
+
+_STOP = object()
+
+
+def digest(messages: list[str]) -> str:
+    if len(messages) == 1:
+        return messages[0][:MAX_MESSAGE_LENGTH]
+    text = f"{len(messages)} updates:\n" + "\n".join(f"- {message}" for message in messages)
+    return text if len(text) <= MAX_MESSAGE_LENGTH else text[: MAX_MESSAGE_LENGTH - 3] + "..."
+
+
+class PushQueue:
+    """
+    Delivers push notifications from a background task, so the push tool returns as soon as a message is
+    queued. Messages that arrive within a short window are merged into one digest, deliveries to the
+    destination are spaced at least min_interval apart, and failed sends are retried with exponential
+    backoff on a pooled HTTP client. When the queue is full, messages are dropped and counted.
+
+    The worker runs on the event loop of the first push. If that loop exits first, as it does when the
+    server stops, the worker goes with it; close() from another loop then sends whatever it left behind.
+    """
+
+    def __init__(
+        self,
+        url: str = PUSHOVER_URL,
+        user: str | None = None,
+        token: str | None = None,
+        window_seconds: float = PUSH_WINDOW_SECONDS,
+        min_interval_seconds: float = PUSH_MIN_INTERVAL_SECONDS,
+        max_queue: int = PUSH_QUEUE_SIZE,
+        max_retries: int = PUSH_MAX_RETRIES,
+        sink_file: str | None = PUSH_SINK_FILE,
+    ):
+        self.url = url
+        self.user = user
+        self.token = token
+        self.window_seconds = window_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.sink_file = sink_file
+        self.queued = 0
+        self.delivered = 0
+        self.merged = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+        self.queue = None
+        self._client = None
+        self._worker = None
+        self._loop = None
+        self._batch = []
+        self._last_sent = 0.0
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_keepalive_connections=2))
+
+    def _start(self):
+        # Messages left by a worker whose loop has exited are carried over, ahead of new ones
+        leftovers = self._leftovers()
+        self._loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        for message in leftovers[: self.max_queue]:
+            self.queue.put_nowait(message)
+        self.dropped += max(0, len(leftovers) - self.max_queue)
+        self._client = self._new_client()
+        self._worker = asyncio.create_task(self._run(self._client))
+
+    def _running(self) -> bool:
+        return self._worker is not None and not self._worker.done() and self._loop is asyncio.get_running_loop()
+
+    def push(self, message: str) -> bool:
+        """Queue a message without waiting; returns False if it was dropped because the queue is full"""
+        if not self._running():
+            self._start()
+        try:
+            self.queue.put_nowait(message)
+            self.queued += 1
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def _drain(self, batch: list) -> bool:
+        """Move everything already queued into batch; returns True if the stop marker was among it"""
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    def _leftovers(self) -> list[str]:
+        """Take the batch the worker was sending, if it didn't finish, and everything still queued"""
+        batch, self._batch = self._batch, []
+        if self.queue is not None:
+            while not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is not _STOP:
+                    batch.append(item)
+        return batch
+
+    async def _run(self, client: httpx.AsyncClient):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is _STOP:
+                return
+            batch = self._batch = [first]
+            deadline = loop.time() + self.window_seconds
+            while not stopping and (remaining := deadline - loop.time()) > 0:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            wait = self._last_sent + self.min_interval_seconds - time.monotonic()
+            if wait > 0 and not stopping:
+                await asyncio.sleep(wait)
+            stopping = self._drain(batch) or stopping
+            self.merged += len(batch) - 1
+            await self._deliver(client, digest(batch))
+            self._batch = []
+
+    async def _deliver(self, client: httpx.AsyncClient, message: str):
+        self._last_sent = time.monotonic()
+        if self.sink_file:
+            with open(self.sink_file, "a") as sink:
+                sink.write(json.dumps({"time": time.time(), "message": message}) + "\n")
+            self.delivered += 1
+            return
+        payload = {"user": self.user, "token": self.token, "message": message}
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(self.url, data=payload)
+                # Client errors other than rate limiting won't succeed on a retry
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    self.delivered += 1
+                    return
+            except httpx.HTTPStatusError as e:
+                print(f"Push notification rejected: {e}")
+                self.failed += 1
+                return
+            except httpx.HTTPError as e:
+                print(f"Push notification failed: {e}")
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(PUSH_BACKOFF_SECONDS * 2**attempt)
+        self.failed += 1
+
+    async def close(self):
+        """
+        Deliver everything still queued, skipping the window and spacing, and stop the worker. Safe to call
+        more than once, concurrently, or after the worker's event loop has exited
+        """
+        worker, client = self._worker, self._client
+        if worker is None:
+            return
+        same_loop = self._loop is asyncio.get_running_loop()
+        if same_loop and not worker.done():
+            await self.queue.put(_STOP)
+            # A cancelled close leaves the worker to finish what it has
+            await asyncio.shield(worker)
+        if self._worker is not worker:
+            # Another close got here first, or a push has started a new worker with its own client
+            if same_loop:
+                await client.aclose()
+            return
+        self._worker = self._client = None
+        # Messages pushed while the worker was stopping, or left behind when its loop exited mid-batch
+        leftovers = self._leftovers()
+        if not same_loop:
+            # The worker's client belongs to the exited loop, so it is left for the process to drop
+            client = self._new_client() if leftovers else None
+        try:
+            if leftovers:
+                await self._deliver(client, digest(leftovers))
+        finally:
+            if client is not None:
+                await client.aclose()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self.queued,
+            "delivered": self.delivered,
+            "merged": self.merged,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
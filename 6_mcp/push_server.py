@@ -1,15 +1,17 @@
+import asyncio
 import os
 from dotenv import load_dotenv
-import requests
 from pydantic import BaseModel, Field
 from mcp.server.fastmcp import FastMCP
+from push_queue import PushQueue
+from util import serve
 
 load_dotenv(override=True)
 
 pushover_user = os.getenv("PUSHOVER_USER")
 pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_url = "https://api.pushover.net/1/messages.json"
 
+push_queue = PushQueue(user=pushover_user, token=pushover_token)
 
 mcp = FastMCP("push_server")
 
@@ -19,13 +21,16 @@ class PushModelArgs(BaseModel):
 
 
 @mcp.tool()
-def push(args: PushModelArgs):
+async def push(args: PushModelArgs):
     """Send a push notification with this brief message"""
     print(f"Push: {args.message}")
-    payload = {"user": pushover_user, "token": pushover_token, "message": args.message}
-    requests.post(pushover_url, data=payload)
+    push_queue.push(args.message)
     return "Push notification sent"
 
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    try:
+        serve(mcp)
+    finally:
+        # Deliver anything still queued once the server has stopped, rather than as each HTTP session ends
+        asyncio.run(push_queue.close())
@@ -0,0 +1,190 @@
+"""
+Per-provider rate limiting for the traders' LLM calls. Each provider gets a token bucket for requests per
+minute and another for tokens per minute; every model request waits its turn on both, and a 429 is retried
+with exponential backoff after pausing the whole provider, so one trader's rate limit slows every trader
+on that provider instead of setting off a storm of retries.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from openai import RateLimitError
+from agents import Model
+
+# Requests and tokens per minute for each provider; raise them to match your account's tier with
+# RATE_LIMIT_<PROVIDER>_RPM and RATE_LIMIT_<PROVIDER>_TPM, e.g. RATE_LIMIT_GEMINI_RPM=1000
+PROVIDER_LIMITS = {
+    "openai": (500, 200_000),
+    "deepseek": (120, 1_000_000),
+    "gemini": (60, 1_000_000),
+    "grok": (60, 500_000),
+    "openrouter": (200, 1_000_000),
+}
+MAX_RATE_LIMIT_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+# Reserved for the reply when estimating a request's tokens up front; settled against actual usage after
+ESTIMATED_OUTPUT_TOKENS = 1_000
+
+# The trader whose run the current task belongs to, so throttling can be attributed per trader
+current_trader: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_trader", default=None)
+
+
+def provider_for(model_name: str) -> str:
+    if "/" in model_name:
+        return "openrouter"
+    for provider in ("deepseek", "grok", "gemini"):
+        if provider in model_name:
+            return provider
+    return "openai"
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute's worth; acquire waits until enough is available"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Waiters queue on a lock so they are served in order; the lock belongs to the loop that made it
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until amount tokens are available and take them; returns the seconds spent waiting"""
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        async with self._get_lock():
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+        return time.monotonic() - started
+
+    def consume(self, amount: float):
+        """Take tokens without waiting, going into debt if need be, e.g. to settle an estimate against usage"""
+        self._refill()
+        self.tokens -= amount
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class ProviderLimiter:
+    def __init__(self, provider: str):
+        requests_per_minute, tokens_per_minute = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["openai"])
+        prefix = f"RATE_LIMIT_{provider.upper()}"
+        self.provider = provider
+        self.requests = TokenBucket(float(os.getenv(f"{prefix}_RPM", requests_per_minute)))
+        self.tokens = TokenBucket(float(os.getenv(f"{prefix}_TPM", tokens_per_minute)))
+        self.calls = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        waited = await self.requests.acquire(1)
+        waited += await self.tokens.acquire(estimated_tokens)
+        self.calls += 1
+        self.throttled_seconds += waited
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def pause(self):
+        """After a 429, stop every caller on this provider until the buckets refill"""
+        self.rate_limited += 1
+        self.requests.drain()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+        }
+
+
+limiters: dict[str, ProviderLimiter] = {}
+# Seconds each trader spent waiting on the limiters and how many of its requests hit a 429
+trader_stats: dict[str, dict[str, float]] = defaultdict(lambda: {"throttled_seconds": 0.0, "rate_limited": 0})
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    if provider not in limiters:
+        limiters[provider] = ProviderLimiter(provider)
+    return limiters[provider]
+
+
+def estimate_tokens(system_instructions: str | None, input) -> int:
+    """A rough count at 4 characters a token, plus room for the reply"""
+    text = input if isinstance(input, str) else json.dumps(input, default=str)
+    return (len(system_instructions or "") + len(text)) // 4 + ESTIMATED_OUTPUT_TOKENS
+
+
+def backoff_seconds(attempt: int, error: RateLimitError | None = None) -> float:
+    """Exponential backoff with jitter, or the provider's Retry-After if it sent one"""
+    retry_after = error.response.headers.get("retry-after") if error is not None else None
+    try:
+        return min(float(retry_after), BACKOFF_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return min(BACKOFF_BASE_SECONDS * 2**attempt, BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.5)
+
+
+class RateLimitedModel(Model):
+    """Wraps a model so that every request waits on its provider's limits and retries when rate limited"""
+
+    def __init__(self, model: Model, provider: str):
+        self.model = model
+        self.provider = provider
+
+    def _record(self, field: str, amount: float):
+        trader = current_trader.get()
+        if trader:
+            trader_stats[trader][field] += amount
+
+    async def get_response(self, system_instructions, input, *args, **kwargs):
+        limiter = get_limiter(self.provider)
+        estimate = estimate_tokens(system_instructions, input)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self._record("throttled_seconds", await limiter.acquire(estimate))
+            try:
+                response = await self.model.get_response(system_instructions, input, *args, **kwargs)
+            except RateLimitError as e:
+                limiter.pause()
+                self._record("rate_limited", 1)
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                await asyncio.sleep(backoff_seconds(attempt, e))
+                continue
+            limiter.settle(estimate, response.usage.total_tokens)
+            return response
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        # A stream can't be replayed once it has started, so it is throttled but not retried
+        limiter = get_limiter(self.provider)
+        self._record("throttled_seconds", await limiter.acquire(estimate_tokens(system_instructions, input)))
+        async for event in self.model.stream_response(system_instructions, input, *args, **kwargs):
+            yield event
+
+
+def stats() -> dict[str, dict]:
+    return {provider: limiter.stats() for provider, limiter in limiters.items()}
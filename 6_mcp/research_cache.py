@@ -0,0 +1,252 @@
+"""
+A research cache shared by every trader's Researcher tool. Traders often ask for the same market news within
+minutes of each other; a question that matches one answered within the last RESEARCH_CACHE_TTL_MINUTES gets
+the earlier answer instead of a new Researcher run with its LLM calls, searches and fetches.
+
+Questions are matched on a normalized form: lower case, without punctuation or filler words, in any word
+order. The tickers a question names are symbols written with a $, like $NVDA, and capitalized words that are
+symbols the traders hold or have traded; other capitalized words, like EPS, SEC or NYSE, are just words.
+Near-duplicates match too, when they name the same tickers and share most of their words; without
+tickers, one differing word can be the whole question, as in tech versus bank stocks, so questions that
+name no tickers only match exactly. Entries are grouped into time buckets of one TTL each, so lookups only
+scan the current and previous bucket and expired entries are evicted a whole bucket at a time. Questions
+asked while the same research is running wait for its answer rather than starting another run.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections.abc import Callable
+from agents import Agent, Runner, RunContextWrapper, ItemHelpers, FunctionTool, function_tool
+from database import read_traded_symbols
+
+RESEARCH_CACHE_TTL_MINUTES = float(os.getenv("RESEARCH_CACHE_TTL_MINUTES", "30"))
+# The share of words two questions about the same tickers must have in common to count as the same question
+RESEARCH_CACHE_SIMILARITY = float(os.getenv("RESEARCH_CACHE_SIMILARITY", "0.6"))
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "500"))
+# How often the symbols the traders hold or have traded are read again, to recognize bare tickers
+RESEARCH_SYMBOLS_REFRESH_SECONDS = float(os.getenv("RESEARCH_SYMBOLS_REFRESH_SECONDS", "60"))
+
+STOPWORDS = {
+    "a", "about", "also", "an", "and", "any", "are", "as", "at", "be", "by", "can", "could", "do", "does", "for",
+    "from", "get", "give", "how", "i", "in", "into", "is", "it", "its", "latest", "look", "me", "now", "of", "on",
+    "or", "please", "recent", "research", "s", "some", "tell", "that", "the", "their", "there", "this", "to",
+    "today", "todays", "up", "what", "whats", "which", "with", "would", "you", "your",
+}
+TICKER = re.compile(r"\$([A-Za-z]{1,5})\b|\b([A-Z]{1,5})\b")
+
+
+def words(query: str) -> frozenset[str]:
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in re.findall(r"[a-z0-9]+", query.lower())
+        if word not in STOPWORDS
+    )
+
+
+def tickers(query: str, known: frozenset[str] = frozenset()) -> frozenset[str]:
+    """The symbols written with a $ in a query, and its capitalized words that are known symbols"""
+    return frozenset(
+        marked.upper() if marked else word for marked, word in TICKER.findall(query) if marked or word in known
+    )
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class ResearchAbandoned(Exception):
+    """Set on an entry whose research was cancelled, so its waiters look the question up again"""
+
+
+class ResearchEntry:
+    def __init__(self, words: frozenset[str], tickers: frozenset[str]):
+        self.words = words
+        self.tickers = tickers
+        self.created = time.time()
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.llm_calls = 0
+
+    def matches(self, words: frozenset[str], tickers: frozenset[str], threshold: float) -> bool:
+        return bool(tickers) and tickers == self.tickers and similarity(words, self.words) >= threshold
+
+
+class ResearchCache:
+    """
+    Answers to research questions for ttl_seconds, looked up by normalized question and near-duplicate
+    match, with concurrent askers of the same question sharing one Researcher run
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESEARCH_CACHE_TTL_MINUTES * 60,
+        threshold: float = RESEARCH_CACHE_SIMILARITY,
+        max_entries: int = RESEARCH_CACHE_MAX_ENTRIES,
+        symbols: Callable[[], set[str]] | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.symbols = symbols
+        self._symbols_read: asyncio.Task | None = None
+        self._symbols_read_at = 0.0
+        self._buckets: dict[int, dict[frozenset[str], ResearchEntry]] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.near_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.errors = 0
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+
+    async def _read_symbols(self) -> frozenset[str]:
+        try:
+            return frozenset(await asyncio.to_thread(self.symbols))
+        except Exception as e:
+            print(f"Research cache could not read the traded symbols: {e}")
+            return frozenset()
+
+    async def _known_symbols(self) -> frozenset[str]:
+        """
+        The symbols that count as tickers without a $, read again every RESEARCH_SYMBOLS_REFRESH_SECONDS;
+        questions asked during a read wait for it, so they are all keyed the same way
+        """
+        if self.symbols is None:
+            return frozenset()
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        read = self._symbols_read
+        stale = now - self._symbols_read_at > RESEARCH_SYMBOLS_REFRESH_SECONDS
+        if read is None or read.get_loop() is not loop or stale:
+            self._symbols_read_at = now
+            read = self._symbols_read = loop.create_task(self._read_symbols())
+        return await asyncio.shield(read)
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.ttl_seconds)
+
+    def _evict(self, now: float):
+        current = self._bucket(now)
+        for bucket in [bucket for bucket in self._buckets if bucket < current - 1]:
+            del self._buckets[bucket]
+        while sum(len(entries) for entries in self._buckets.values()) > self.max_entries:
+            oldest = self._buckets[min(self._buckets)]
+            del oldest[next(iter(oldest))]
+            if not oldest:
+                del self._buckets[min(self._buckets)]
+
+    def _find(self, key: frozenset[str], query_tickers: frozenset[str], now: float) -> tuple[ResearchEntry | None, bool]:
+        """The freshest live entry for a question, and whether it was an exact match"""
+        current = self._bucket(now)
+        live = [
+            entries for bucket, entries in sorted(self._buckets.items(), reverse=True) if bucket >= current - 1
+        ]
+        for entries in live:
+            entry = entries.get(key)
+            if entry and now - entry.created < self.ttl_seconds:
+                return entry, True
+        for entries in live:
+            for entry in reversed(entries.values()):
+                if now - entry.created < self.ttl_seconds and entry.matches(key, query_tickers, self.threshold):
+                    return entry, False
+        return None, False
+
+    async def get(self, query: str, research) -> str:
+        """The answer to a question, from the cache or by awaiting research(query), which returns (answer, llm_calls)"""
+        if self.ttl_seconds <= 0:
+            answer, llm_calls = await research(query)
+            self.misses += 1
+            self.llm_calls += llm_calls
+            return answer
+        key, query_tickers = words(query), tickers(query, await self._known_symbols())
+        while True:
+            now = time.time()
+            self._evict(now)
+            entry, exact = self._find(key, query_tickers, now)
+            if entry is None:
+                return await self._research(query, key, query_tickers, now, research)
+            if not entry.result.done():
+                self.coalesced += 1
+            elif exact:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            try:
+                answer = await asyncio.shield(entry.result)
+            except ResearchAbandoned:
+                # The run this question joined was cancelled; look again, and run it here if nobody else has
+                self.coalesced -= 1
+                continue
+            self.llm_calls_saved += entry.llm_calls
+            return answer
+
+    async def _research(
+        self, query: str, key: frozenset[str], query_tickers: frozenset[str], now: float, research
+    ) -> str:
+        """Run the research for a question nobody has asked, as the entry its near-duplicates wait on"""
+        entry = ResearchEntry(key, query_tickers)
+        self._buckets.setdefault(self._bucket(now), {})[key] = entry
+        self.misses += 1
+        try:
+            answer, entry.llm_calls = await research(query)
+        except Exception as e:
+            self.errors += 1
+            self._buckets.get(self._bucket(now), {}).pop(key, None)
+            entry.result.set_exception(e)
+            # Waiters see the exception; mark it retrieved so an entry nobody waited on doesn't warn
+            entry.result.exception()
+            raise
+        except BaseException:
+            # Cancelling this trader says nothing about the question, so rather than cancel its waiters too,
+            # the entry is dropped and one of them runs the research instead
+            self._buckets.get(self._bucket(now), {}).pop(key, None)
+            entry.result.set_exception(ResearchAbandoned())
+            entry.result.exception()
+            raise
+        self.llm_calls += entry.llm_calls
+        entry.result.set_result(answer)
+        return answer
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.coalesced + self.misses
+        return {
+            "entries": sum(len(entries) for entries in self._buckets.values()),
+            "lookups": lookups,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.near_hits + self.coalesced) / lookups if lookups else 0.0,
+            "llm_calls": self.llm_calls,
+            "llm_calls_saved": self.llm_calls_saved,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (
+            f"Research cache: {stats['lookups']} questions, {stats['hit_rate']:.0%} answered from the cache "
+            f"({stats['hits']} exact, {stats['near_hits']} near-duplicate, {stats['coalesced']} joined a running "
+            f"search), {stats['llm_calls']} LLM calls made and {stats['llm_calls_saved']} saved"
+        )
+
+
+research_cache = ResearchCache(symbols=read_traded_symbols)
+
+
+def cached_research_tool(researcher: Agent, tool_name: str, tool_description: str) -> FunctionTool:
+    """Like researcher.as_tool, with answers shared through research_cache"""
+
+    @function_tool(name_override=tool_name, description_override=tool_description)
+    async def run_researcher(context: RunContextWrapper, input: str) -> str:
+        async def research(query: str) -> tuple[str, int]:
+            output = await Runner.run(starting_agent=researcher, input=query, context=context.context)
+            return ItemHelpers.text_message_outputs(output.new_items), len(output.raw_responses)
+
+        return await research_cache.get(input, research)
+
+    return run_researcher
@@ -0,0 +1,82 @@
+import argparse
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from database import (
+    DB,
+    read_log_names,
+    read_log_expiry_id,
+    read_logs_up_to,
+    delete_logs,
+    delete_span_metrics,
+    incremental_vacuum,
+)
+
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "14"))
+LOG_RETENTION_ROWS = int(os.getenv("LOG_RETENTION_ROWS", "100000"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "archive/logs")
+SPAN_METRICS_RETENTION_DAYS = int(os.getenv("SPAN_METRICS_RETENTION_DAYS", "30"))
+BATCH_SIZE = 5_000
+
+
+def archive(rows: list[tuple], archive_dir: str) -> None:
+    """Append log rows to gzipped JSONL files partitioned by the date they were written"""
+    by_date = defaultdict(list)
+    for id, name, when, type, message in rows:
+        record = {"id": id, "name": name, "datetime": when, "type": type, "message": message}
+        by_date[(when or "unknown")[:10]].append(json.dumps(record))
+    os.makedirs(archive_dir, exist_ok=True)
+    for date, lines in by_date.items():
+        # Appending adds a new gzip member to the file, which gzip readers treat as one stream
+        with gzip.open(os.path.join(archive_dir, f"{date}.jsonl.gz"), "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def prune_logs(max_age_days: int | None, max_rows: int | None, archive_dir: str | None, batch_size: int = BATCH_SIZE):
+    """
+    Apply the log retention policy to every trader: archive expired rows, then delete them in batches
+    so writers are never locked out for long. Rows are archived before they are deleted, so an interrupted
+    run can at worst archive a batch twice, never lose it.
+    """
+    before = None
+    if max_age_days is not None:
+        before = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+    total = 0
+    for name in read_log_names():
+        expiry_id = read_log_expiry_id(name, before, max_rows)
+        pruned = 0
+        while expiry_id:
+            rows = read_logs_up_to(name, expiry_id, batch_size)
+            if not rows:
+                break
+            if archive_dir:
+                archive(rows, archive_dir)
+            pruned += delete_logs(name, rows[0][0], rows[-1][0])
+        if pruned:
+            print(f"{name}: pruned {pruned:,} log entries")
+        total += pruned
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Archive and prune old log entries in {DB}")
+    parser.add_argument("--max-age-days", type=int, default=LOG_RETENTION_DAYS, help="keep this many days of logs")
+    parser.add_argument("--max-rows", type=int, default=LOG_RETENTION_ROWS, help="keep this many rows per trader")
+    parser.add_argument("--archive-dir", default=LOG_ARCHIVE_DIR, help="where to write date-partitioned .jsonl.gz files")
+    parser.add_argument("--no-archive", action="store_true", help="delete expired rows without archiving them")
+    parser.add_argument(
+        "--span-metrics-days", type=int, default=SPAN_METRICS_RETENTION_DAYS, help="keep this many days of span metrics"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows deleted per transaction")
+    args = parser.parse_args()
+    total = prune_logs(
+        args.max_age_days, args.max_rows, None if args.no_archive else args.archive_dir, args.batch_size
+    )
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.span_metrics_days)
+    spans = delete_span_metrics(cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+    if spans:
+        print(f"Pruned {spans:,} span metrics")
+    full = incremental_vacuum()
+    print(f"Pruned {total:,} log entries; {'converted to incremental vacuum' if full else 'freed unused pages'}")
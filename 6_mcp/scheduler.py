@@ -0,0 +1,69 @@
+"""
+Runs each trading cycle's traders through a bounded pool of workers instead of starting them all at once.
+Traders are taken in priority order, each start is jittered so runs don't hit the providers in lockstep,
+and per-provider rate limits are applied to every LLM request by the models from traders.get_model.
+"""
+
+import asyncio
+import os
+import random
+import time
+import rate_limits
+from rate_limits import current_trader, trader_stats
+
+MAX_CONCURRENT_TRADERS = int(os.getenv("MAX_CONCURRENT_TRADERS", "4"))
+TRADER_START_JITTER_SECONDS = float(os.getenv("TRADER_START_JITTER_SECONDS", "5"))
+
+
+class TraderScheduler:
+    def __init__(
+        self, max_concurrency: int = MAX_CONCURRENT_TRADERS, jitter_seconds: float = TRADER_START_JITTER_SECONDS
+    ):
+        self.max_concurrency = max_concurrency
+        self.jitter_seconds = jitter_seconds
+        self.metrics: dict[str, dict[str, float]] = {}
+
+    async def run_cycle(self, traders, fleet=None):
+        """Run every trader once, lowest priority value first, with at most max_concurrency running at a time"""
+        queue = asyncio.PriorityQueue()
+        for index, trader in enumerate(traders):
+            queue.put_nowait((getattr(trader, "priority", 0), index, trader))
+        enqueued = time.monotonic()
+        workers = min(self.max_concurrency, len(traders))
+        await asyncio.gather(*(self._worker(queue, fleet, enqueued) for _ in range(workers)))
+
+    async def _worker(self, queue: asyncio.PriorityQueue, fleet, enqueued: float):
+        while not queue.empty():
+            _, _, trader = queue.get_nowait()
+            await asyncio.sleep(random.uniform(0, self.jitter_seconds))
+            started = time.monotonic()
+            throttled = trader_stats[trader.name]["throttled_seconds"]
+            rate_limited = trader_stats[trader.name]["rate_limited"]
+            token = current_trader.set(trader.name)
+            try:
+                await trader.run(fleet)
+            finally:
+                current_trader.reset(token)
+            metrics = self.metrics.setdefault(trader.name, {"runs": 0})
+            metrics["runs"] += 1
+            metrics["queue_wait_seconds"] = started - enqueued
+            metrics["run_seconds"] = time.monotonic() - started
+            metrics["throttled_seconds"] = trader_stats[trader.name]["throttled_seconds"] - throttled
+            metrics["rate_limited"] = trader_stats[trader.name]["rate_limited"] - rate_limited
+
+    def stats(self) -> dict:
+        return {"traders": self.metrics, "providers": rate_limits.stats()}
+
+    def report(self) -> str:
+        lines = [f"Scheduler: up to {self.max_concurrency} traders at once"]
+        for name, metrics in self.metrics.items():
+            lines.append(
+                f"  {name}: waited {metrics['queue_wait_seconds']:.1f}s in queue, ran {metrics['run_seconds']:.1f}s, "
+                f"throttled {metrics['throttled_seconds']:.1f}s, rate limited {metrics['rate_limited']:.0f}x"
+            )
+        for provider, stats in rate_limits.stats().items():
+            lines.append(
+                f"  {provider}: {stats['calls']} calls, {stats['rate_limited']} rate limited, "
+                f"throttled {stats['throttled_seconds']}s"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,165 @@
+"""
+Where the traders spend their time, tokens and money, from the span metrics recorded by tracers.MetricsTracer.
+
+Every finished trace and span of a trader's run is written to the span_metrics table in the background:
+its duration, the model and token usage of LLM requests, the tool and MCP server of function calls,
+and any error. Reports aggregate them into p50/p95 latencies and costs per trader, per model and per tool:
+
+    uv run span_metrics.py --hours 24
+    uv run span_metrics.py --hours 1 --trader warren
+"""
+
+import argparse
+import atexit
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from database import TIMESTAMP_FORMAT, read_span_metrics, write_span_metrics
+from log_writer import LogWriter
+
+# Spans of one LLM request: "generation" from the Chat Completions API and "response" from the Responses API
+LLM_SPAN_TYPES = ("generation", "response")
+# USD per million input and output tokens; models are matched on the longest prefix, ignoring any
+# OpenRouter provider prefix, and models without a price are counted with no cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "deepseek-chat": (0.27, 1.10),
+    "gemini-2.5-flash": (0.15, 0.60),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "grok-3-mini": (0.30, 0.50),
+    "grok-3": (3.00, 15.00),
+}
+SPAN_METRICS_HOURS = float(os.getenv("SPAN_METRICS_HOURS", "24"))
+
+metrics_writer = LogWriter(write_batch=write_span_metrics)
+atexit.register(metrics_writer.close)
+
+
+def price_for(model: str | None) -> tuple[float, float] | None:
+    if not model:
+        return None
+    model = model.rsplit("/", 1)[-1]
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def cost(model: str | None, input_tokens: int | None, output_tokens: int | None) -> float | None:
+    price = price_for(model)
+    if price is None:
+        return None
+    return ((input_tokens or 0) * price[0] + (output_tokens or 0) * price[1]) / 1_000_000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The nearest-rank percentile, or 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def _latency(durations: list[float]) -> dict:
+    return {"p50_ms": percentile(durations, 50), "p95_ms": percentile(durations, 95)}
+
+
+def summarize(rows: list[dict]) -> dict[str, dict]:
+    """Aggregate span metrics rows into per-trader, per-model and per-tool latency, token and cost figures"""
+    runs = defaultdict(list)
+    generations = defaultdict(list)
+    tools = defaultdict(list)
+    errors = defaultdict(int)
+    for row in rows:
+        if row["error"]:
+            errors[row["name"]] += 1
+        if row["type"] == "trace":
+            runs[row["name"]].append(row)
+        elif row["type"] in LLM_SPAN_TYPES:
+            generations[row["name"]].append(row)
+        elif row["type"] in ("function", "mcp_tools"):
+            tools[(row["label"] or row["type"], row["server"])].append(row)
+
+    traders = {}
+    for name in sorted(set(runs) | set(generations)):
+        spent = [row["cost"] or 0.0 for row in generations[name]]
+        run_count = len(runs[name]) or len({row["trace_id"] for row in generations[name]})
+        traders[name] = {
+            "runs": run_count,
+            **_latency([row["duration_ms"] for row in runs[name]]),
+            "llm_calls": len(generations[name]),
+            "input_tokens": sum(row["input_tokens"] or 0 for row in generations[name]),
+            "output_tokens": sum(row["output_tokens"] or 0 for row in generations[name]),
+            "cost": sum(spent),
+            "cost_per_run": sum(spent) / run_count if run_count else 0.0,
+            "errors": errors[name],
+        }
+
+    by_model = defaultdict(list)
+    for row in (row for rows in generations.values() for row in rows):
+        by_model[row["model"] or "unknown"].append(row)
+    models = {
+        model: {
+            "calls": len(rows),
+            **_latency([row["duration_ms"] for row in rows]),
+            "input_tokens": sum(row["input_tokens"] or 0 for row in rows),
+            "output_tokens": sum(row["output_tokens"] or 0 for row in rows),
+            "cost": sum(row["cost"] or 0.0 for row in rows),
+            "errors": sum(1 for row in rows if row["error"]),
+        }
+        for model, rows in sorted(by_model.items())
+    }
+
+    tool_stats = {
+        f"{label} ({server})" if server else label: {
+            "calls": len(rows),
+            **_latency([row["duration_ms"] for row in rows]),
+            "total_ms": sum(row["duration_ms"] for row in rows),
+            "errors": sum(1 for row in rows if row["error"]),
+        }
+        for (label, server), rows in sorted(tools.items(), key=lambda item: -sum(r["duration_ms"] for r in item[1]))
+    }
+    return {"traders": traders, "models": models, "tools": tool_stats}
+
+
+def since_hours(hours: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(TIMESTAMP_FORMAT)
+
+
+def report(since: str | None = None, name: str | None = None) -> str:
+    """A table of the span metrics recorded since a UTC timestamp, by default the last SPAN_METRICS_HOURS"""
+    since = since or since_hours(SPAN_METRICS_HOURS)
+    summary = summarize(read_span_metrics(since, name))
+    lines = [f"Span metrics since {since} UTC"]
+    lines.append("  Traders")
+    for trader, stats in summary["traders"].items():
+        lines.append(
+            f"    {trader:>12}: {stats['runs']:4} runs {stats['p50_ms'] / 1000:7.1f}s p50 {stats['p95_ms'] / 1000:7.1f}s p95, "
+            f"{stats['llm_calls']:5} LLM calls, {stats['input_tokens']:9,} in {stats['output_tokens']:8,} out tokens, "
+            f"${stats['cost']:.4f} (${stats['cost_per_run']:.4f}/run), {stats['errors']} errors"
+        )
+    lines.append("  Models")
+    for model, stats in summary["models"].items():
+        lines.append(
+            f"    {model:>30}: {stats['calls']:5} calls {stats['p50_ms']:8.0f}ms p50 {stats['p95_ms']:8.0f}ms p95, "
+            f"{stats['input_tokens']:9,} in {stats['output_tokens']:8,} out tokens, ${stats['cost']:.4f}, "
+            f"{stats['errors']} errors"
+        )
+    lines.append("  Tools, by total time")
+    for tool, stats in summary["tools"].items():
+        lines.append(
+            f"    {tool:>40}: {stats['calls']:5} calls {stats['p50_ms']:8.0f}ms p50 {stats['p95_ms']:8.0f}ms p95, "
+            f"{stats['total_ms'] / 1000:7.1f}s total, {stats['errors']} errors"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, token and cost report from the traders' span metrics")
+    parser.add_argument("--hours", type=float, default=SPAN_METRICS_HOURS, help="report on this many past hours")
+    parser.add_argument("--trader", help="only this trader's runs")
+    args = parser.parse_args()
+    print(report(since_hours(args.hours), args.trader))
@@ -47,6 +47,15 @@ After you've completed trading, send a push notification with a brief summary of
 Your goal is to maximize your profits according to your strategy.
 """
 
+def account_summary(summary: str, changes: str | None) -> str:
+    section = f"""{summary}
+This summary lists only your most recent transactions; use your list_transactions tool if you need the full history."""
+    if changes:
+        section += f"""
+Changes since your last run:
+{changes}"""
+    return section
+
 def trade_message(name, strategy, account):
     return f"""Based on your investment strategy, you should now look for new opportunities.
 Use the research tool to find news and opportunities consistent with your strategy.
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+import pytest
+from pathlib import Path
+
+# The trading floor's modules sit flat in 6_mcp, and database opens the file named by ACCOUNTS_DB on import,
+# so make them importable and point them at a scratch database before any test imports them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ["ACCOUNTS_DB"] = os.path.join(tempfile.mkdtemp(), "accounts.db")
+
+PRICES = {"AAPL": 200.0, "MSFT": 400.0, "NVDA": 100.0}
+
+
+@pytest.fixture
+def prices(monkeypatch) -> dict[str, float]:
+    """Price shares from a dict the test can change, instead of Polygon or random numbers"""
+    import accounts
+
+    prices = dict(PRICES)
+    monkeypatch.setattr(accounts, "get_share_price", lambda symbol: prices.get(symbol, 0.0))
+    monkeypatch.setattr(
+        accounts, "get_share_prices", lambda symbols: {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+    )
+    return prices
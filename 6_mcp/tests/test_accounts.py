@@ -0,0 +1,180 @@
+import json
+import random
+import threading
+import pytest
+import accounts
+from accounts import Account, record_portfolio_values
+from database import StaleAccountError, get_connection, migrate_legacy_accounts, read_transactions, write_account
+
+
+def rows(table: str, name: str) -> int:
+    return get_connection().execute(f"SELECT COUNT(*) FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+
+def test_a_trade_appends_one_ledger_row(prices):
+    account = Account.get("ledger")
+    account.reset("Hold")
+    account.buy_shares("AAPL", 3, "Testing")
+    account.buy_shares("NVDA", 2, "Testing")
+    account.sell_shares("AAPL", 1, "Testing")
+    assert rows("transactions", "ledger") == 3
+    assert rows("holdings", "ledger") == 2
+
+    reloaded = Account.get("ledger")
+    assert reloaded.holdings == {"AAPL": 2, "NVDA": 2}
+    assert reloaded.balance == account.balance
+    assert [(t.symbol, t.quantity) for t in reloaded.transactions] == [("AAPL", 3), ("NVDA", 2), ("AAPL", -1)]
+
+
+def test_legacy_account_is_migrated_on_first_use():
+    legacy = {
+        "name": "legacy",
+        "balance": 9_000.0,
+        "strategy": "Buy the dip",
+        "holdings": {"MSFT": 2},
+        "transactions": [
+            {"symbol": "MSFT", "quantity": 2, "price": 500.0, "timestamp": "2025-01-02 10:00:00", "rationale": "Dip"}
+        ],
+        "portfolio_value_time_series": [["2025-01-02 10:00:00", 10_000.0]],
+    }
+    with get_connection() as conn:
+        conn.execute("INSERT INTO accounts (name, account) VALUES (?, ?)", ("legacy", json.dumps(legacy)))
+
+    account = Account.get("legacy")
+    assert (account.balance, account.strategy, account.holdings) == (9_000.0, "Buy the dip", {"MSFT": 2})
+    assert account.net_invested == 1_000.0
+    assert [t["price"] for t in read_transactions("legacy")] == [500.0]
+    assert account.portfolio_value_time_series == [("2025-01-02 10:00:00", 10_000.0)]
+
+    # Migrating again, as migrate.py does, copies nothing twice
+    assert "legacy" not in migrate_legacy_accounts()
+    assert rows("transactions", "legacy") == 1
+
+
+def test_running_aggregates_match_a_replay_of_the_ledger(prices):
+    account = Account.get("aggregates")
+    account.reset("Trade")
+    account.buy_shares("AAPL", 4, "Testing")
+    prices["AAPL"] = 250.0
+    account.buy_shares("AAPL", 4, "Testing")
+    account.sell_shares("AAPL", 2, "Testing")
+    account.buy_shares("NVDA", 5, "Testing")
+    account.sell_shares("NVDA", 5, "Testing")
+
+    assert account.verify_aggregates()
+    assert account.cost_basis.keys() == {"AAPL"}
+    assert account.cost_basis["AAPL"] == pytest.approx(225.0 * 1.002)
+    realized = 2 * (250.0 * 0.998 - 225.0 * 1.002) + 5 * (100.0 * 0.998 - 100.0 * 1.002)
+    assert account.realized_pnl == pytest.approx(realized)
+    assert Account.get("aggregates").verify_aggregates()
+
+
+def test_rebuild_aggregates_repairs_drifted_totals(prices):
+    account = Account.get("drifted")
+    account.reset("Trade")
+    account.buy_shares("MSFT", 2, "Testing")
+    account.sell_shares("MSFT", 1, "Testing")
+    account.net_invested += 123.0
+    account.cost_basis["MSFT"] = 1.0
+    account.save()
+
+    drifted = Account.get("drifted")
+    assert not drifted.verify_aggregates()
+    drifted.rebuild_aggregates()
+    assert drifted.verify_aggregates()
+    assert Account.get("drifted").cost_basis == {"MSFT": pytest.approx(400.0 * 1.002)}
+
+
+def test_report_writes_nothing(prices):
+    account = Account.get("reporter")
+    account.reset("Hold")
+    account.buy_shares("AAPL", 1, "Testing")
+    snapshots, version = rows("portfolio_snapshots", "reporter"), account._version
+    for _ in range(3):
+        report = json.loads(account.report())
+    assert report["holdings"] == {"AAPL": 1}
+    assert rows("portfolio_snapshots", "reporter") == snapshots
+    assert Account.get("reporter")._version == version
+
+
+def test_portfolio_values_are_recorded_at_most_once_per_interval(prices):
+    account = Account.get("snapshots")
+    account.reset("Hold")
+    assert account.record_portfolio_value()
+    assert not account.record_portfolio_value()
+    assert record_portfolio_values(["snapshots"]) == 0
+    assert account.record_portfolio_value(force=True)
+    assert rows("portfolio_snapshots", "snapshots") == 2
+
+
+def test_vectorized_valuation_matches_a_loop_over_holdings(monkeypatch):
+    rng = random.Random(11)
+    symbols = [f"S{i:03d}" for i in range(300)]
+    prices = {symbol: round(rng.uniform(1, 500), 2) for symbol in symbols}
+    lookups = []
+
+    def get_share_prices(requested):
+        lookups.append(requested)
+        return {symbol: prices[symbol] for symbol in requested}
+
+    monkeypatch.setattr(accounts, "get_share_prices", get_share_prices)
+    account = Account(
+        name="vectorized",
+        balance=1_234.5,
+        strategy="",
+        holdings={symbol: rng.randint(1, 1_000) for symbol in symbols},
+        cost_basis={symbol: round(rng.uniform(1, 500), 2) for symbol in symbols[::2]},
+    )
+
+    value = account.balance + sum(quantity * prices[symbol] for symbol, quantity in account.holdings.items())
+    unrealized = {
+        symbol: (prices[symbol] - account.cost_basis.get(symbol, 0.0)) * quantity
+        for symbol, quantity in account.holdings.items()
+    }
+    assert account.calculate_portfolio_value() == pytest.approx(value)
+    assert account.calculate_unrealized_profit_loss() == pytest.approx(unrealized)
+    assert len(lookups) == 2 and lookups[0] == symbols
+
+
+def test_a_write_from_a_stale_read_is_refused():
+    Account.get("versioned").reset("Hold")
+    first, second = Account.get("versioned"), Account.get("versioned")
+    first.deposit(100)
+    with pytest.raises(StaleAccountError):
+        write_account("versioned", second.state(), second._version)
+
+
+def test_a_trade_priced_on_a_stale_read_is_reapplied_to_the_fresh_account(prices):
+    Account.get("contended").reset("Hold")
+    first, second = Account.get("contended"), Account.get("contended")
+    first.buy_shares("AAPL", 2, "Testing")
+    second.buy_shares("AAPL", 3, "Testing")
+    second.sell_shares("AAPL", 4, "Testing")
+
+    account = Account.get("contended")
+    assert account.holdings == {"AAPL": 1}
+    assert account.balance == pytest.approx(10_000.0 - 5 * 200.0 * 1.002 + 4 * 200.0 * 0.998)
+    assert rows("transactions", "contended") == 3
+    assert account.verify_aggregates()
+
+
+def test_concurrent_writers_lose_no_update(prices):
+    Account.get("busy").reset("Hold")
+
+    def trade():
+        # Each thread holds its own copy, as each accounts server process does
+        account = Account.get("busy")
+        for _ in range(10):
+            account.buy_shares("NVDA", 1, "Testing")
+            account.deposit(1)
+
+    threads = [threading.Thread(target=trade) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    account = Account.get("busy")
+    assert account.holdings == {"NVDA": 40}
+    assert account.balance == pytest.approx(10_000.0 - 40 * 100.0 * 1.002 + 40)
+    assert rows("transactions", "busy") == 40
@@ -0,0 +1,80 @@
+import asyncio
+import httpx
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import INVALID_PARAMS, ErrorData
+from accounts_client import MCPSessionPool, params
+from mcp_params import is_read_only_tool
+
+TIMEOUT = McpError(ErrorData(code=httpx.codes.REQUEST_TIMEOUT, message="Timed out while waiting for response"))
+INVALID = McpError(ErrorData(code=INVALID_PARAMS, message="Unknown account"))
+
+
+class FakeServer:
+    def __init__(self):
+        self.session = object()
+        self.alive = True
+
+    async def close(self):
+        self.alive = False
+
+
+@pytest.mark.parametrize("tool", ["get_balance", "get_holdings", "list_transactions", "lookup_share_price", "fetch"])
+def test_read_only_tools(tool):
+    assert is_read_only_tool(tool)
+
+
+@pytest.mark.parametrize("tool", ["buy_shares", "sell_shares", "change_strategy", "push", "create_entities"])
+def test_write_tools(tool):
+    assert not is_read_only_tool(tool)
+
+
+def run_failing_once(failure: Exception, retry: bool) -> tuple[list, object, MCPSessionPool]:
+    """Run an operation whose first attempt fails with failure; returns the attempts, the result and the pool"""
+    pool = MCPSessionPool(params)
+    attempts = []
+
+    async def server(index):
+        if pool.servers[index] is None:
+            pool.servers[index] = FakeServer()
+        return pool.servers[index]
+
+    async def operation(session):
+        attempts.append(session)
+        if len(attempts) == 1:
+            raise failure
+        return "done"
+
+    async def run():
+        pool._bind_to_loop()
+        pool._server = server
+        return await pool.run(operation, retry=retry)
+
+    try:
+        return attempts, asyncio.run(run()), pool
+    except Exception as e:
+        return attempts, e, pool
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("server died"), TIMEOUT])
+def test_retries_when_safe(failure):
+    attempts, result, pool = run_failing_once(failure, retry=True)
+    assert result == "done"
+    assert len(attempts) == 2
+    assert attempts[0] is not attempts[1]
+    assert pool.restarts == 1
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("server died"), TIMEOUT])
+def test_restarts_but_raises_without_retry(failure):
+    attempts, result, pool = run_failing_once(failure, retry=False)
+    assert result is failure
+    assert len(attempts) == 1
+    assert pool.restarts == 1
+
+
+def test_tool_errors_are_raised_without_a_restart():
+    attempts, result, pool = run_failing_once(INVALID, retry=True)
+    assert result is INVALID
+    assert len(attempts) == 1
+    assert pool.restarts == 0
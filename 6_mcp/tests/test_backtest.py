@@ -0,0 +1,51 @@
+import pytest
+from backtest import Backtest, Order, Recorded, buy_and_hold
+from database import get_connection, write_market
+
+DAYS = {
+    "2024-06-03": {"AAA": 10.0, "BBB": 20.0},
+    "2024-06-04": {"AAA": 12.0, "BBB": 18.0},
+    "2024-06-05": {"AAA": 9.0},
+    "2024-06-06": {"AAA": 15.0, "BBB": 25.0},
+}
+
+
+@pytest.fixture(scope="module")
+def results():
+    for date, closes in DAYS.items():
+        write_market(date, closes)
+    recorded = Recorded({
+        "2024-06-03": [Order("AAA", 100)],
+        "2024-06-04": [Order("AAA", -50)],
+        "2024-06-05": [Order("BBB", 10)],
+        "2024-06-06": [Order("AAA", -100)],
+    })
+    strategies = {"recorded": recorded, "buy and hold": buy_and_hold(["AAA", "BBB"])}
+    return Backtest(strategies, "2024-06-01", "2024-06-30").run()
+
+
+def test_recorded_orders_replay_at_the_stored_closes(results):
+    result = results["recorded"]
+    balance = 10_000.0 - 100 * 10.0 * 1.002 + 50 * 12.0 * 0.998
+    values = [10_000.0 - 100 * 10.0 * 1.002 + 100 * 10.0, balance + 50 * 12.0, balance + 50 * 9.0, balance + 50 * 15.0]
+    assert [date for date, _ in result.values] == list(DAYS)
+    assert [value for _, value in result.values] == pytest.approx(values)
+    assert result.total_return == pytest.approx(values[-1] / 10_000.0 - 1)
+    assert result.max_drawdown == pytest.approx(1 - values[2] / values[1])
+    # A buy with no close that day and a sale of more than is held are rejected rather than filled
+    assert (result.trades, result.rejected) == (2, 2)
+
+
+def test_holdings_without_a_close_are_valued_at_their_last_close(results):
+    result = results["buy and hold"]
+    assert (result.trades, result.rejected) == (2, 0)
+    cash = 10_000.0 - 495 * 10.0 * 1.002 - 247 * 20.0 * 1.002
+    assert result.values[2][1] == pytest.approx(cash + 495 * 9.0 + 247 * 18.0)
+    assert result.end_value == pytest.approx(cash + 495 * 15.0 + 247 * 25.0)
+
+
+def test_backtest_trades_never_touch_the_ledger(results):
+    names = ("recorded", "buy and hold")
+    assert get_connection().execute(
+        "SELECT COUNT(*) FROM transactions WHERE name IN (?, ?)", names
+    ).fetchone()[0] == 0
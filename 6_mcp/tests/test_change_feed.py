@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+from accounts import Account
+from change_feed import ChangeFeed
+from database import write_log, write_portfolio_snapshot
+from log_writer import log_writer
+
+
+@pytest.fixture
+def feed():
+    for name in ("watched", "unwatched"):
+        Account.get(name)
+    # Trade logs queued by other tests would otherwise commit while the feed is meant to be idle
+    log_writer.flush()
+    feed = ChangeFeed(["Watched"], poll_seconds=0.01)
+    published = []
+    feed.add_listener(published.append)
+    feed.published = published
+    feed.start()
+    # The first poll only takes the baseline the feed compares against, so let it finish before writing
+    while feed.polls < 2:
+        time.sleep(0.005)
+    yield feed
+    feed.stop()
+
+
+def next_change(feed: ChangeFeed, write) -> dict[str, set[str]]:
+    """Make a write from this thread and wait for the feed's thread to publish it"""
+
+    async def run():
+        revision = feed.revision
+        write()
+        await asyncio.wait_for(feed.wait(revision), timeout=2)
+        return feed.changes_since(revision)
+
+    return asyncio.run(run())
+
+
+def test_each_write_marks_only_the_panel_it_changed(feed):
+    assert next_change(feed, lambda: Account.get("watched").deposit(10)) == {"watched": {"account"}}
+    assert next_change(feed, lambda: write_log("watched", "account", "Testing")) == {"watched": {"logs"}}
+    assert next_change(feed, lambda: write_portfolio_snapshot("watched", "2030-01-01 00:00:00", 1.0)) == {
+        "watched": {"portfolio"}
+    }
+    assert feed.published == [{"watched": {"account"}}, {"watched": {"logs"}}, {"watched": {"portfolio"}}]
+
+
+def test_idle_feed_only_checks_the_data_version(feed):
+    time.sleep(0.05)
+    stats = feed.stats()
+    Account.get("unwatched").deposit(10)
+    time.sleep(0.05)
+    after = feed.stats()
+    # The commit costs one marker read, which finds nothing changed for the accounts it watches
+    assert after["polls"] > stats["polls"] + 2
+    assert after["reads"] == stats["reads"] + 1
+    assert (after["events"], feed.published) == (0, [])
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import pytest
+from agents import Agent, Model, ModelResponse, RunConfig, Runner, Usage, function_tool
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+from checkpoints import CheckpointedModel, CheckpointHooks, RunCheckpoint
+
+# The tool calls the stub model makes, one list per turn; the first turn's two lookups run in parallel
+TURNS = [
+    [("lookup_share_price", {"symbol": "NVDA"}), ("lookup_share_price", {"symbol": "AAPL"})],
+    [("buy_shares", {"symbol": "NVDA", "quantity": 3})],
+    [("push", {"message": "Bought NVDA"})],
+]
+ALL_CALLS = sorted(f"{name} {arguments}" for turn in TURNS for name, arguments in turn)
+
+
+class Crash(BaseException):
+    """The trading floor process dying part way through a run"""
+
+
+class ScriptedModel(Model):
+    """Makes the TURNS tool calls that haven't returned yet, a turn at a time, then replies"""
+
+    async def get_response(self, system_instructions, input, *args, **kwargs):
+        items = [item for item in input if isinstance(item, dict)]
+        returned = {item["call_id"] for item in items if item.get("type") == "function_call_output"}
+        done = {
+            (item["name"], item["arguments"])
+            for item in items
+            if item.get("type") == "function_call" and item["call_id"] in returned
+        }
+        for turn in TURNS:
+            calls = [(name, json.dumps(arguments)) for name, arguments in turn]
+            remaining = [call for call in calls if call not in done]
+            if remaining:
+                output = [
+                    ResponseFunctionToolCall(
+                        id=f"fc_{len(returned)}_{index}", call_id=f"call_{len(returned)}_{index}", name=name,
+                        arguments=arguments, type="function_call", status="completed",
+                    )
+                    for index, (name, arguments) in enumerate(remaining)
+                ]
+                return ModelResponse(output=output, usage=Usage(), response_id=None)
+        text = ResponseOutputText(text="Done", type="output_text", annotations=[])
+        message = ResponseOutputMessage(id="msg", content=[text], role="assistant", status="completed", type="message")
+        return ModelResponse(output=[message], usage=Usage(), response_id=None)
+
+    def stream_response(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class CrashingHooks(CheckpointHooks):
+    """Kills the run as soon as crash_after tool results have been checkpointed"""
+
+    def __init__(self, checkpoint: RunCheckpoint, crash_after: int):
+        super().__init__(checkpoint)
+        self.crash_after = crash_after
+        self.results = 0
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        await super().on_tool_end(context, agent, tool, result)
+        self.results += 1
+        if self.results == self.crash_after:
+            raise Crash()
+
+
+def make_tools(issued: list[str]):
+    """Tools that record each call once it completes; the AAPL lookup is slow, so it is still running at a crash"""
+
+    @function_tool
+    async def lookup_share_price(symbol: str) -> float:
+        await asyncio.sleep(0.2 if symbol == "AAPL" else 0)
+        issued.append(f"lookup_share_price {({'symbol': symbol})}")
+        return 100.0
+
+    @function_tool
+    async def buy_shares(symbol: str, quantity: int) -> str:
+        issued.append(f"buy_shares {({'symbol': symbol, 'quantity': quantity})}")
+        return f"Bought {quantity} {symbol}"
+
+    @function_tool
+    async def push(message: str) -> str:
+        issued.append(f"push {({'message': message})}")
+        return "Push notification sent"
+
+    return [lookup_share_price, buy_shares, push]
+
+
+async def run(checkpoint: RunCheckpoint, issued: list[str], crash_after: int | None = None):
+    """A trader run as Trader.run_agent does it: from the checkpoint's transcript, if it has one"""
+    input = checkpoint.transcript() if checkpoint.turns else "Trade"
+    agent = Agent(name="warren", model=CheckpointedModel(ScriptedModel(), checkpoint), tools=make_tools(issued))
+    hooks = CrashingHooks(checkpoint, crash_after) if crash_after else CheckpointHooks(checkpoint)
+    result = await Runner.run(agent, input, hooks=hooks, run_config=RunConfig(tracing_disabled=True))
+    await checkpoint.clear()
+    return result
+
+
+@pytest.mark.parametrize("crash_after", [1, 2, 3])
+def test_resumed_run_repeats_no_tool_call(crash_after):
+    issued = []
+    with pytest.raises(Crash):
+        asyncio.run(run(RunCheckpoint("warren", "trade"), issued, crash_after))
+    assert len(issued) == crash_after
+
+    checkpoint = RunCheckpoint.load("warren")
+    assert checkpoint is not None and checkpoint.resumes == 1
+    result = asyncio.run(run(checkpoint, issued))
+
+    assert result.final_output == "Done"
+    assert sorted(issued) == ALL_CALLS
+    assert RunCheckpoint.load("warren") is None
+
+
+def test_finished_run_leaves_no_checkpoint():
+    issued = []
+    result = asyncio.run(run(RunCheckpoint("warren", "trade"), issued))
+    assert result.final_output == "Done"
+    assert sorted(issued) == ALL_CALLS
+    assert RunCheckpoint.load("warren") is None
@@ -0,0 +1,70 @@
+import json
+import threading
+import database
+from database import (
+    has_market,
+    read_market,
+    read_market_history,
+    read_market_price,
+    read_market_prices,
+    read_market_range,
+    write_market,
+)
+
+
+def on_new_database(path, check):
+    """Run check(conn) on a new thread's connection, which get_connection opens on the database at path"""
+    result = {}
+
+    def run():
+        original = database.DB
+        database.DB = str(path)
+        try:
+            result["value"] = check(database.get_connection())
+        finally:
+            database.DB = original
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+def test_new_database_uses_wal_and_incremental_auto_vacuum(tmp_path):
+    def pragmas(conn):
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0], conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    assert on_new_database(tmp_path / "new.db", pragmas) == (2, "wal")
+
+
+def test_incremental_vacuum_on_a_new_database_skips_the_full_vacuum(tmp_path):
+    def vacuum(conn):
+        conn.execute("CREATE TABLE filler (data TEXT)")
+        with conn:
+            conn.executemany("INSERT INTO filler VALUES (?)", [("x" * 1000,)] * 200)
+        with conn:
+            conn.execute("DELETE FROM filler")
+        return database.incremental_vacuum()
+
+    assert on_new_database(tmp_path / "new.db", vacuum) is False
+
+
+def test_market_closes_are_read_by_date_symbol_and_range():
+    write_market("2025-04-01", {"AAPL": 220.0, "NVDA": 110.0, "MSFT": 390.0})
+    write_market("2025-04-02", {"AAPL": 225.0, "NVDA": 105.0})
+    assert has_market("2025-04-01") and not has_market("2025-04-03")
+    assert read_market_price("2025-04-02", "AAPL") == 225.0
+    assert read_market_price("2025-04-02", "MSFT") is None
+    assert read_market_prices("2025-04-01", ["AAPL", "NVDA", "NVDAX"]) == {"AAPL": 220.0, "NVDA": 110.0}
+    assert read_market_history("NVDA", "2025-04-01", "2025-04-30") == [("2025-04-01", 110.0), ("2025-04-02", 105.0)]
+    assert read_market_range("2025-04-01", "2025-04-02", ["MSFT"]) == [("2025-04-01", {"MSFT": 390.0})]
+    assert read_market("2025-04-02") == {"AAPL": 225.0, "NVDA": 105.0}
+
+
+def test_legacy_market_blobs_are_moved_into_rows():
+    with database.get_connection() as conn:
+        conn.execute("INSERT INTO market (date, data) VALUES (?, ?)", ("2025-05-01", json.dumps({"TSLA": 300.0})))
+    assert database.migrate_legacy_market() == ["2025-05-01"]
+    assert read_market_price("2025-05-01", "TSLA") == 300.0
+    assert database.migrate_legacy_market() == []
+    assert database.get_connection().execute("SELECT COUNT(*) FROM market").fetchone()[0] == 0
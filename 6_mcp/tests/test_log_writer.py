@@ -0,0 +1,67 @@
+import threading
+import accounts
+from accounts import Account
+from log_writer import LogWriter
+
+
+def test_keeps_writing_after_a_failed_batch():
+    written = []
+
+    def write_batch(batch):
+        if batch[0] == "bad":
+            raise ValueError("not a row")
+        written.extend(batch)
+
+    writer = LogWriter(write_batch=write_batch, flush_seconds=0.01)
+    writer.put("bad")
+    assert writer.flush()
+    writer.put("good")
+    assert writer.flush()
+    assert written == ["good"]
+    assert writer.stats()["failed"] == 1
+    writer.close()
+
+
+def test_restarts_a_dead_thread():
+    written = []
+    writer = LogWriter(write_batch=written.extend, flush_seconds=0.01)
+    writer.put("one")
+    writer.close()
+    writer._thread = threading.Thread(target=lambda: None)
+    writer._thread.start()
+    writer._thread.join()
+    writer.put("two")
+    assert writer.flush()
+    assert written == ["one", "two"]
+    writer.close()
+
+
+def test_flush_gives_up_when_the_queue_stays_full():
+    blocked = threading.Event()
+    writer = LogWriter(max_queue=1, write_batch=lambda batch: blocked.wait(), flush_seconds=0.01)
+    writer.put("one")
+    writer.put("two")
+    assert not writer.flush(timeout=0.2)
+    blocked.set()
+    assert writer.flush()
+    writer.close()
+
+
+def test_account_logs_go_through_the_log_writer(monkeypatch):
+    written = []
+    writer = LogWriter(write_batch=written.extend, flush_seconds=0.01)
+    monkeypatch.setattr(accounts, "log_writer", writer)
+    monkeypatch.setattr(accounts, "get_share_price", lambda symbol: 100.0)
+    account = Account.get("logger")
+    account.buy_shares("NVDA", 2, "Testing")
+    account.sell_shares("NVDA", 1, "Testing")
+    account.change_strategy("Buy low")
+    account.get_strategy()
+    assert writer.flush()
+    assert [(name, type, message) for name, _, type, message in written] == [
+        ("logger", "account", "Bought 2 of NVDA"),
+        ("logger", "account", "Sold 1 of NVDA"),
+        ("logger", "account", "Changed strategy"),
+        ("logger", "account", "Retrieved strategy"),
+    ]
+    writer.close()
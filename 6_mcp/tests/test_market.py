@@ -0,0 +1,61 @@
+import asyncio
+import json
+import time
+from market import PriceCache
+
+
+class Loader:
+    """Prices NVDA at 120.0 and knows no other symbol, counting the symbols it is asked for"""
+
+    def __init__(self):
+        self.asked = []
+
+    def one(self, symbol: str) -> float:
+        self.asked.append(symbol)
+        return 120.0 if symbol == "NVDA" else 0.0
+
+    def many(self, symbols: list[str]) -> dict[str, float]:
+        self.asked.extend(symbols)
+        return {symbol: 120.0 for symbol in symbols if symbol == "NVDA"}
+
+
+def test_prices_are_cached_until_they_expire():
+    cache, loader = PriceCache(ttl_seconds=None), Loader()
+    assert [cache.get("NVDA", loader.one) for _ in range(3)] == [120.0] * 3
+    assert loader.asked == ["NVDA"]
+    assert cache.stats()["hits"] == 2
+
+
+def test_unknown_symbols_are_looked_up_again_after_the_miss_ttl():
+    cache, loader = PriceCache(ttl_seconds=None, miss_ttl_seconds=0.05), Loader()
+    assert cache.get("NVDAX", loader.one) == 0.0
+    assert cache.get("NVDAX", loader.one) == 0.0
+    assert loader.asked == ["NVDAX"]
+    time.sleep(0.06)
+    assert cache.get("NVDAX", loader.one) == 0.0
+    assert loader.asked == ["NVDAX", "NVDAX"]
+    assert cache.stats()["unknown"] == 2
+
+
+def test_baskets_only_keep_known_prices_until_they_expire():
+    cache, loader = PriceCache(ttl_seconds=None, miss_ttl_seconds=0.05), Loader()
+    assert cache.get_many(["NVDA", "NVDAX"], loader.many) == {"NVDA": 120.0, "NVDAX": 0.0}
+    time.sleep(0.06)
+    assert cache.get_many(["NVDA", "NVDAX"], loader.many) == {"NVDA": 120.0, "NVDAX": 0.0}
+    assert loader.asked == ["NVDA", "NVDAX", "NVDAX"]
+
+
+def test_report_counts_hits_and_unknown_symbols():
+    cache, loader = PriceCache(ttl_seconds=None), Loader()
+    for symbol in ["NVDA", "NVDA", "NVDAX"]:
+        cache.get(symbol, loader.one)
+    assert cache.report() == (
+        "Price cache: 2 prices, 33% of lookups served from the cache (1 hits, 0 coalesced, 2 loaded), "
+        "1 without a price, 0 errors"
+    )
+
+
+def test_market_server_serves_price_cache_stats():
+    from market_server import mcp
+    contents = asyncio.run(mcp.read_resource("market://price_cache"))
+    assert set(json.loads(contents[0].content)) >= {"hits", "misses", "unknown", "hit_rate"}
@@ -0,0 +1,67 @@
+import asyncio
+import httpx
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, INVALID_PARAMS, ErrorData
+from mcp_fleet import FleetServerMixin
+
+TIMEOUT = McpError(ErrorData(code=httpx.codes.REQUEST_TIMEOUT, message="Timed out while waiting for response"))
+CLOSED = McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed"))
+INVALID = McpError(ErrorData(code=INVALID_PARAMS, message="Unknown symbol"))
+
+
+class FailingServer:
+    """An MCP server whose first tool call fails with the given error"""
+
+    def __init__(self, params, **kwargs):
+        self.session = object()
+        self.attempts = []
+        self.failure = ConnectionError("server died")
+
+    async def call_tool(self, tool_name, arguments):
+        self.attempts.append(self.session)
+        if len(self.attempts) == 1:
+            raise self.failure
+        return "done"
+
+
+class FakeFleetServer(FleetServerMixin, FailingServer):
+    @property
+    def alive(self) -> bool:
+        return True
+
+    async def restart(self, dead_session=None):
+        self.restarts += 1
+        self.session = object()
+
+
+def fleet_server(failure: Exception) -> FakeFleetServer:
+    server = FakeFleetServer({}, "accounts")
+    server.failure = failure
+    return server
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("server died"), TIMEOUT, CLOSED])
+def test_read_is_retried_on_a_fresh_server(failure):
+    server = fleet_server(failure)
+    assert asyncio.run(server.call_tool("get_holdings", {"name": "warren"})) == "done"
+    assert len(server.attempts) == 2
+    assert server.attempts[0] is not server.attempts[1]
+    assert (server.restarts, server.errors) == (1, 0)
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("server died"), TIMEOUT, CLOSED])
+def test_write_restarts_the_server_but_is_not_retried(failure):
+    server = fleet_server(failure)
+    with pytest.raises(type(failure)):
+        asyncio.run(server.call_tool("buy_shares", {"name": "warren", "symbol": "AAPL", "quantity": 1}))
+    assert len(server.attempts) == 1
+    assert (server.restarts, server.errors) == (1, 1)
+
+
+def test_tool_errors_are_raised_without_a_restart():
+    server = fleet_server(INVALID)
+    with pytest.raises(McpError):
+        asyncio.run(server.call_tool("lookup_share_price", {"symbol": "NOPE"}))
+    assert len(server.attempts) == 1
+    assert (server.restarts, server.errors) == (0, 1)
@@ -0,0 +1,49 @@
+from datetime import datetime
+from database import compact_portfolio_snapshots, get_connection, read_portfolio_snapshots, write_portfolio_snapshot
+
+NOW = datetime(2025, 3, 1, 12, 0)
+POINTS = [
+    ("2025-01-10 09:00:00", 50.0),
+    ("2025-01-10 15:30:00", 70.0),
+    ("2025-02-20 10:01:00", 100.0),
+    ("2025-02-20 10:02:00", 120.0),
+    ("2025-02-20 10:04:00", 90.0),
+    ("2025-03-01 11:00:00", 105.0),
+]
+
+
+def write(name: str):
+    for timestamp, value in POINTS:
+        write_portfolio_snapshot(name, timestamp, value)
+
+
+def buckets(name: str) -> list[tuple]:
+    return get_connection().execute(
+        "SELECT resolution, start, open, high, low, close FROM portfolio_buckets WHERE name = ? ORDER BY start",
+        (name,),
+    ).fetchall()
+
+
+def test_series_is_read_by_range_and_resolution():
+    write("ranged")
+    assert read_portfolio_snapshots("ranged", start="2025-02-01 00:00:00", end="2025-02-28 23:59:59") == [
+        ("2025-02-20 10:01:00", 100.0), ("2025-02-20 10:02:00", 120.0), ("2025-02-20 10:04:00", 90.0)
+    ]
+    assert read_portfolio_snapshots("ranged", resolution_seconds=86_400) == [
+        ("2025-01-10 15:30:00", 70.0), ("2025-02-20 10:04:00", 90.0), ("2025-03-01 11:00:00", 105.0)
+    ]
+
+
+def test_old_points_are_compacted_into_five_minute_then_daily_buckets():
+    write("tiered")
+    compact_portfolio_snapshots(NOW)
+    assert buckets("tiered") == [
+        ("1d", "2025-01-10 00:00:00", 50.0, 70.0, 50.0, 70.0),
+        ("5min", "2025-02-20 10:00:00", 100.0, 120.0, 90.0, 90.0),
+    ]
+    assert read_portfolio_snapshots("tiered") == [
+        ("2025-01-10 00:00:00", 70.0), ("2025-02-20 10:00:00", 90.0), ("2025-03-01 11:00:00", 105.0)
+    ]
+    # Compacting again finds nothing new to fold in
+    compact_portfolio_snapshots(NOW)
+    assert len(buckets("tiered")) == 2
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import pytest
+from push_queue import PushQueue
+
+
+@pytest.fixture
+def sink(tmp_path):
+    return tmp_path / "push.jsonl"
+
+
+def delivered(sink) -> list[str]:
+    if not sink.exists():
+        return []
+    with open(sink) as lines:
+        return [json.loads(line)["message"] for line in lines]
+
+
+def make_queue(sink) -> PushQueue:
+    return PushQueue(window_seconds=60, min_interval_seconds=0, sink_file=str(sink))
+
+
+def test_close_delivers_queued_messages(sink):
+    queue = make_queue(sink)
+
+    async def run():
+        queue.push("one")
+        queue.push("two")
+        await queue.close()
+
+    asyncio.run(run())
+    assert delivered(sink) == ["2 updates:\n- one\n- two"]
+
+
+def test_close_is_idempotent_and_concurrent_safe(sink):
+    queue = make_queue(sink)
+
+    async def run():
+        queue.push("one")
+        await asyncio.gather(queue.close(), queue.close())
+        await queue.close()
+
+    asyncio.run(run())
+    assert delivered(sink) == ["one"]
+
+
+def test_close_after_the_workers_loop_exits(sink):
+    queue = make_queue(sink)
+
+    async def push():
+        queue.push("one")
+        queue.push("two")
+        # Let the worker take the messages into its window before the loop exits and cancels it
+        await asyncio.sleep(0.05)
+
+    asyncio.run(push())
+    assert delivered(sink) == []
+    asyncio.run(queue.close())
+    assert delivered(sink) == ["2 updates:\n- one\n- two"]
+
+
+def test_push_on_a_new_loop_carries_leftovers_over(sink):
+    queue = make_queue(sink)
+
+    async def push(message: str):
+        queue.push(message)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(push("one"))
+
+    async def push_and_close():
+        queue.push("two")
+        await queue.close()
+
+    asyncio.run(push_and_close())
+    assert delivered(sink) == ["2 updates:\n- one\n- two"]
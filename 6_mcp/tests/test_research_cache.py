@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from research_cache import ResearchCache, tickers, words
+
+HELD = {"AAPL", "MSFT", "NVDA"}
+
+
+def ask(*questions: str) -> tuple[list[str], ResearchCache]:
+    """Ask each question in turn; research answers with the question it was asked"""
+    cache = ResearchCache(ttl_seconds=600, threshold=0.6, symbols=lambda: HELD)
+
+    async def research(query: str) -> tuple[str, int]:
+        return query, 1
+
+    async def run():
+        return [await cache.get(question, research) for question in questions]
+
+    return asyncio.run(run()), cache
+
+
+def test_words_strip_one_plural_s():
+    assert words("stocks") == words("stock")
+    assert "earning" in words("earnings")
+
+
+def test_words_keep_double_s():
+    assert words("business news") == frozenset({"business", "new"})
+    assert words("class") != words("cla")
+
+
+def test_tickers_are_marked_or_known_symbols():
+    query = "NVDA Q3 EPS vs $amd after the SEC filing, per NYSE data"
+    assert tickers(query, frozenset(HELD)) == frozenset({"NVDA", "AMD"})
+    assert tickers(query) == frozenset({"AMD"})
+
+
+def test_capitalized_words_do_not_split_questions_about_one_stock():
+    answers, cache = ask("NVDA Q3 EPS and guidance outlook", "NVDA Q3 guidance outlook")
+    assert answers[1] == answers[0]
+    assert cache.near_hits == 1
+
+
+def test_exact_match_in_any_order():
+    answers, cache = ask("What is the latest news on Tesla?", "tesla news, latest")
+    assert answers == ["What is the latest news on Tesla?"] * 2
+    assert cache.hits == 1
+
+
+def test_near_duplicate_with_the_same_tickers():
+    answers, cache = ask("AAPL earnings outlook and analyst views", "AAPL earnings, analyst views and guidance")
+    assert answers[1] == answers[0]
+    assert cache.near_hits == 1
+
+
+def test_different_tickers_do_not_match():
+    answers, cache = ask("AAPL earnings outlook", "MSFT earnings outlook")
+    assert cache.misses == 2
+
+
+def test_questions_without_tickers_only_match_exactly():
+    answers, cache = ask("best tech stocks to buy now", "best bank stocks to buy now")
+    assert answers == ["best tech stocks to buy now", "best bank stocks to buy now"]
+    assert cache.misses == 2
+    assert cache.near_hits == 0
+
+
+def test_cancelled_leader_hands_the_question_to_a_waiter():
+    cache = ResearchCache(ttl_seconds=600)
+    runs = []
+
+    async def research(query: str) -> tuple[str, int]:
+        runs.append(query)
+        await asyncio.sleep(0.05)
+        return f"answer {len(runs)}", 1
+
+    async def run():
+        leader = asyncio.create_task(cache.get("NVDA news", research))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get("NVDA news", research))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == "answer 2"
+    assert len(runs) == 2
+    assert cache.stats()["errors"] == 0
+    # The waiter ran the research itself, so it counts as a miss rather than as joining a search
+    assert (cache.misses, cache.coalesced) == (2, 0)
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+import pytest
+from agents.tracing.span_data import GenerationSpanData, ResponseSpanData
+from agents.tracing.spans import SpanImpl
+from openai.types.responses import Response, ResponseUsage
+from database import SPAN_METRIC_COLUMNS
+from span_metrics import cost, summarize
+from tracers import MetricsTracer, make_trace_id
+
+
+def record_span(span_data) -> dict:
+    """Run one span of warren's through a MetricsTracer and return the span metrics row it writes"""
+    with patch("tracers.metrics_writer") as writer:
+        span = SpanImpl(make_trace_id("warren"), None, None, MetricsTracer(), span_data)
+        span.start()
+        span.finish()
+    writer.put.assert_called_once()
+    return dict(zip(SPAN_METRIC_COLUMNS, writer.put.call_args.args[0]))
+
+
+def row(type: str, **fields) -> dict:
+    row = dict.fromkeys(SPAN_METRIC_COLUMNS)
+    row.update(name="warren", trace_id="trace_1", type=type, duration_ms=100.0)
+    row.update(fields)
+    return row
+
+
+def test_response_span():
+    usage = ResponseUsage.model_construct(input_tokens=1200, output_tokens=300)
+    response = Response.model_construct(id="resp_1", model="gpt-4o-mini", usage=usage)
+    recorded = record_span(ResponseSpanData(response=response))
+    assert (recorded["name"], recorded["type"], recorded["model"]) == ("warren", "response", "gpt-4o-mini")
+    assert (recorded["input_tokens"], recorded["output_tokens"]) == (1200, 300)
+    assert recorded["cost"] == pytest.approx(cost("gpt-4o-mini", 1200, 300))
+
+
+def test_response_span_without_response():
+    recorded = record_span(ResponseSpanData())
+    assert recorded["type"] == "response"
+    assert recorded["model"] is None
+    assert recorded["input_tokens"] is None
+    assert recorded["cost"] is None
+
+
+def test_generation_span():
+    usage = {"input_tokens": 1000, "output_tokens": 100}
+    recorded = record_span(GenerationSpanData(model="deepseek-chat", usage=usage))
+    assert recorded["model"] == "deepseek-chat"
+    assert recorded["input_tokens"] == 1000
+    assert recorded["cost"] == pytest.approx(cost("deepseek-chat", 1000, 100))
+
+
+def test_summarize_counts_responses_and_generations_as_llm_calls():
+    rows = [
+        row("trace", duration_ms=5000.0),
+        row("response", model="gpt-4o-mini", input_tokens=1000, output_tokens=200, cost=0.01),
+        row("generation", model="deepseek-chat", input_tokens=500, output_tokens=100, cost=0.02),
+        row("function", label="lookup_share_price", server="market"),
+    ]
+    summary = summarize(rows)
+    trader = summary["traders"]["warren"]
+    assert trader["llm_calls"] == 2
+    assert (trader["input_tokens"], trader["output_tokens"]) == (1500, 300)
+    assert trader["cost"] == pytest.approx(0.03)
+    assert set(summary["models"]) == {"gpt-4o-mini", "deepseek-chat"}
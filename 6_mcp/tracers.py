@@ -1,7 +1,11 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from log_writer import log_writer
+from span_metrics import metrics_writer, cost
+from database import TIMESTAMP_FORMAT
+from datetime import datetime, timezone
 import secrets
 import string
+import time
 
 ALPHANUM = string.ascii_lowercase + string.digits 
 
@@ -15,25 +19,29 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+def trader_name(trace_or_span: Trace | Span) -> str | None:
+    """The trader a trace belongs to, from the tag make_trace_id put in its id"""
+    trace_id = trace_or_span.trace_id
+    name = trace_id.split("_")[1]
+    if '0' in name:
+        return name.split("0")[0]
+    else:
+        return None
+
 class LogTracer(TracingProcessor):
 
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
-        trace_id = trace_or_span.trace_id
-        name = trace_id.split("_")[1]
-        if '0' in name:
-            return name.split("0")[0]
-        else:
-            return None
+        return trader_name(trace_or_span)
 
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            log_writer.write(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            log_writer.write(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -49,7 +57,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            log_writer.write(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -66,10 +74,83 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            log_writer.write(name, type, message)
 
     def force_flush(self) -> None:
+        log_writer.flush()
+
+    def shutdown(self) -> None:
+        log_writer.close()
+
+
+def model_usage(data) -> tuple[str | None, int | None, int | None]:
+    """
+    The model and input and output tokens of an LLM span: a generation span from the Chat Completions API,
+    or a response span from the Responses API, which carries them on the response it records
+    """
+    if data.type == "response":
+        response = getattr(data, "response", None)
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return getattr(response, "model", None), None, None
+        return response.model, usage.input_tokens, usage.output_tokens
+    model = getattr(data, "model", None)
+    usage = getattr(data, "usage", None) or {}
+    return str(model) if model else None, usage.get("input_tokens"), usage.get("output_tokens")
+
+
+class MetricsTracer(TracingProcessor):
+    """
+    Records the duration of every trader run and span in the span_metrics table, with the model, token usage
+    and cost of LLM generations and responses and the tool and MCP server of function calls, for span_metrics.report
+    """
+
+    def __init__(self):
+        self.trace_starts: dict[str, tuple[str, float]] = {}
+
+    def on_trace_start(self, trace) -> None:
+        if trader_name(trace):
+            self.trace_starts[trace.trace_id] = (datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT), time.monotonic())
+
+    def on_trace_end(self, trace) -> None:
+        name = trader_name(trace)
+        started = self.trace_starts.pop(trace.trace_id, None)
+        if name and started:
+            started_at, start = started
+            duration_ms = (time.monotonic() - start) * 1000
+            metrics_writer.put(
+                (name, trace.trace_id, started_at, "trace", trace.name, None, None, duration_ms, None, None, None, None)
+            )
+
+    def on_span_start(self, span) -> None:
         pass
 
+    def on_span_end(self, span) -> None:
+        name = trader_name(span)
+        if not name or not span.span_data or not span.started_at or not span.ended_at:
+            return
+        data = span.span_data
+        started_at = datetime.fromisoformat(span.started_at)
+        duration_ms = (datetime.fromisoformat(span.ended_at) - started_at).total_seconds() * 1000
+        model, input_tokens, output_tokens = model_usage(data)
+        mcp_data = getattr(data, "mcp_data", None) or {}
+        metrics_writer.put((
+            name,
+            span.trace_id,
+            started_at.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT),
+            data.type,
+            getattr(data, "name", None),
+            mcp_data.get("server") or getattr(data, "server", None),
+            model,
+            duration_ms,
+            input_tokens,
+            output_tokens,
+            cost(model, input_tokens, output_tokens) if input_tokens is not None else None,
+            span.error["message"] if span.error else None,
+        ))
+
+    def force_flush(self) -> None:
+        metrics_writer.flush()
+
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        metrics_writer.close()
@@ -1,52 +1,48 @@
+import asyncio
 from contextlib import AsyncExitStack
-from accounts_client import read_accounts_resource, read_strategy_resource
+from accounts_client import read_accounts_resource, read_summary_resource, read_strategy_resource
 from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
-from openai import AsyncOpenAI
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, OpenAIProvider, trace
 from dotenv import load_dotenv
 import os
 import json
-from agents.mcp import MCPServerStdio
+from agents.mcp import MCPServerStdio, MCPServerStreamableHttp
 from templates import (
     researcher_instructions,
     trader_instructions,
     trade_message,
     rebalance_message,
     research_tool,
+    account_summary,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+from rate_limits import RateLimitedModel, provider_for
+from llm_clients import get_client, cached_with_clients
+from research_cache import cached_research_tool
+from checkpoints import RunCheckpoint, CheckpointedModel, CheckpointHooks
 
 load_dotenv(override=True)
 
-deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-google_api_key = os.getenv("GOOGLE_API_KEY")
-grok_api_key = os.getenv("GROK_API_KEY")
-openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
-
-DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
-GROK_BASE_URL = "https://api.x.ai/v1"
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
-
 MAX_TURNS = 30
-
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+# "summary" gives the trader a compact account summary and what changed since its last run; "full" gives
+# the whole account report, including every transaction, as before
+ACCOUNT_PROMPT = os.getenv("ACCOUNT_PROMPT", "summary")
 
 
+@cached_with_clients
 def get_model(model_name: str):
-    if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
-    elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
-    elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
-    elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+    """
+    The model for a name, built once and shared by every agent that uses it. Requests go through the
+    provider's pooled client from llm_clients and are throttled to the provider's rate limits; the model
+    is built again on a new client after llm_clients.close_clients.
+    """
+    provider = provider_for(model_name)
+    client = get_client(provider)
+    if provider == "openai":
+        model = OpenAIProvider(openai_client=client).get_model(model_name)
     else:
-        return model_name
+        model = OpenAIChatCompletionsModel(model=model_name, openai_client=client)
+    return RateLimitedModel(model, provider)
 
 
 async def get_researcher(mcp_servers, model_name) -> Agent:
@@ -61,23 +57,53 @@ async def get_researcher(mcp_servers, model_name) -> Agent:
 
 async def get_researcher_tool(mcp_servers, model_name) -> Tool:
     researcher = await get_researcher(mcp_servers, model_name)
-    return researcher.as_tool(tool_name="Researcher", tool_description=research_tool())
+    return cached_research_tool(researcher, tool_name="Researcher", tool_description=research_tool())
+
+
+def mcp_server(params):
+    server_class = MCPServerStreamableHttp if "url" in params else MCPServerStdio
+    return server_class(params, client_session_timeout_seconds=120)
+
+
+def account_changes(previous: dict | None, current: dict) -> str | None:
+    """Describe how an account summary has changed since the previous one, or None on the first run"""
+    if previous is None:
+        return None
+    lines = [
+        f"Portfolio value {previous['total_portfolio_value']:,.2f} -> {current['total_portfolio_value']:,.2f} "
+        f"({current['total_portfolio_value'] - previous['total_portfolio_value']:+,.2f})",
+        f"Cash {previous['cash']:,.2f} -> {current['cash']:,.2f}",
+    ]
+    before, after = previous["holdings"], current["holdings"]
+    for symbol in sorted(before.keys() | after.keys()):
+        was = before.get(symbol, {}).get("quantity", 0)
+        now = after.get(symbol, {}).get("quantity", 0)
+        if was != now:
+            lines.append(f"{symbol} {was} -> {now} shares")
+    trades = current["transaction_count"] - previous["transaction_count"]
+    lines.append(f"{trades} transactions" if trades else "No transactions")
+    return "\n".join(lines)
 
 
 class Trader:
-    def __init__(self, name: str, lastname="Trader", model_name="gpt-4o-mini"):
+    def __init__(self, name: str, lastname="Trader", model_name="gpt-4o-mini", priority: int = 0):
         self.name = name
         self.lastname = lastname
         self.agent = None
         self.model_name = model_name
         self.do_trade = True
+        self.last_summary = None
+        self.checkpoint = None
+        # The scheduler starts lower values first
+        self.priority = priority
 
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
         tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
+        model = get_model(self.model_name)
         self.agent = Agent(
             name=self.name,
             instructions=trader_instructions(self.name),
-            model=get_model(self.model_name),
+            model=CheckpointedModel(model, self.checkpoint) if self.checkpoint else model,
             tools=[tool],
             mcp_servers=trader_mcp_servers,
         )
@@ -89,43 +115,71 @@ class Trader:
         account_json.pop("portfolio_value_time_series", None)
         return json.dumps(account_json)
 
-    async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
-        self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
-        account = await self.get_account_report()
+    async def get_account_summary(self) -> str:
+        summary = await read_summary_resource(self.name)
+        current = json.loads(summary)
+        changes = account_changes(self.last_summary, current)
+        self.last_summary = current
+        return account_summary(summary, changes)
+
+    async def get_message(self) -> str:
+        if ACCOUNT_PROMPT == "full":
+            account = await self.get_account_report()
+        else:
+            account = await self.get_account_summary()
         strategy = await read_strategy_resource(self.name)
-        message = (
+        return (
             trade_message(self.name, strategy, account)
             if self.do_trade
             else rebalance_message(self.name, strategy, account)
         )
-        await Runner.run(self.agent, message, max_turns=MAX_TURNS)
+
+    async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
+        if self.checkpoint.turns:
+            print(f"Resuming {self.name}'s {self.checkpoint.mode} run after turn {self.checkpoint.turns}")
+            input = self.checkpoint.transcript()
+        else:
+            input = await self.get_message()
+        self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
+        await Runner.run(
+            self.agent,
+            input,
+            max_turns=max(MAX_TURNS - self.checkpoint.turns, 1),
+            hooks=CheckpointHooks(self.checkpoint),
+        )
+        await self.checkpoint.clear()
 
     async def run_with_mcp_servers(self):
         async with AsyncExitStack() as stack:
             trader_mcp_servers = [
-                await stack.enter_async_context(
-                    MCPServerStdio(params, client_session_timeout_seconds=120)
-                )
+                await stack.enter_async_context(mcp_server(params))
                 for params in trader_mcp_server_params
             ]
             async with AsyncExitStack() as stack:
                 researcher_mcp_servers = [
-                    await stack.enter_async_context(
-                        MCPServerStdio(params, client_session_timeout_seconds=120)
-                    )
+                    await stack.enter_async_context(mcp_server(params))
                     for params in researcher_mcp_server_params(self.name)
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_trace(self, fleet=None):
+        # Pick up a run that died part way through, in the mode it was started in
+        self.checkpoint = await asyncio.to_thread(RunCheckpoint.load, self.name)
+        if self.checkpoint:
+            self.do_trade = self.checkpoint.mode == "trade"
+        else:
+            self.checkpoint = RunCheckpoint(self.name, "trade" if self.do_trade else "rebalance")
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
         with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
+            if fleet:
+                await self.run_agent(fleet.trader_servers(), fleet.researcher_servers(self.name))
+            else:
+                await self.run_with_mcp_servers()
 
-    async def run(self):
+    async def run(self, fleet=None):
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(fleet)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
         self.do_trade = not self.do_trade
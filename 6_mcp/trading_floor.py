@@ -1,9 +1,18 @@
 from traders import Trader
 from typing import List
 import asyncio
-from tracers import LogTracer
+from tracers import LogTracer, MetricsTracer
 from agents import add_trace_processor
-from market import is_market_open
+from market import is_market_open, price_cache
+from accounts import record_portfolio_values
+from mcp_fleet import MCPServerFleet
+from scheduler import TraderScheduler
+import llm_clients
+import span_metrics
+from span_metrics import metrics_writer
+from research_cache import research_cache
+from database import compact_portfolio_snapshots, TIMESTAMP_FORMAT
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import os
 
@@ -38,15 +47,39 @@ def create_traders() -> List[Trader]:
     return traders
 
 
+async def run_trading_cycle(traders: List[Trader], fleet: MCPServerFleet, scheduler: TraderScheduler):
+    await fleet.health_check()
+    await scheduler.run_cycle(traders, fleet)
+    await asyncio.to_thread(record_portfolio_values, [trader.name for trader in traders])
+
+
 async def run_every_n_minutes():
     add_trace_processor(LogTracer())
+    add_trace_processor(MetricsTracer())
     traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    fleet = MCPServerFleet([trader.name for trader in traders])
+    scheduler = TraderScheduler()
+    await fleet.start()
+    try:
+        while True:
+            if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
+                cycle_start = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+                await run_trading_cycle(traders, fleet, scheduler)
+                await asyncio.to_thread(metrics_writer.flush)
+                print(fleet.report())
+                print(scheduler.report())
+                print(llm_clients.report())
+                print(span_metrics.report(since=cycle_start))
+                print(research_cache.report())
+                print(price_cache.report())
+                research_cache.reset_stats()
+            else:
+                print("Market is closed, skipping run")
+            await asyncio.to_thread(compact_portfolio_snapshots)
+            await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    finally:
+        await fleet.close()
+        await llm_clients.close_clients()
 
 
 if __name__ == "__main__":
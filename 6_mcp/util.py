@@ -1,4 +1,34 @@
 from enum import Enum
+import argparse
+import os
+
+# Where each of our MCP servers listens when it runs with the streamable HTTP transport
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_HTTP_PORTS = {"accounts_server": 8001, "market_server": 8002, "push_server": 8003}
+
+
+def mcp_url(server_name: str) -> str:
+    return f"http://{MCP_HOST}:{MCP_HTTP_PORTS[server_name]}/mcp"
+
+
+def serve(mcp):
+    """
+    Run one of our MCP servers over stdio, as a child process of a single client, or over streamable HTTP,
+    where one process serves many concurrent sessions. The transport comes from --transport or MCP_TRANSPORT.
+    """
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name} MCP server")
+    parser.add_argument(
+        "--transport", choices=["stdio", "streamable-http"], default=os.getenv("MCP_TRANSPORT", "stdio")
+    )
+    parser.add_argument("--host", default=MCP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_HTTP_PORTS[mcp.name])
+    args = parser.parse_args()
+    if args.transport == "streamable-http":
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        print(f"Serving {mcp.name} at http://{args.host}:{args.port}{mcp.settings.streamable_http_path}")
+    mcp.run(transport=args.transport)
+
 
 css = """
 .positive-pnl {